@@ -5,14 +5,17 @@ from streamlit_option_menu import option_menu
 # Import necessary utilities and functions from local modules
 from utils.help_texts import help_dict
 from utils.interface import (
+    PREVIEW_CHAR_LIMIT,
     display_input_files,
     display_template,
     display_xlsx_frame,
     load_css,
     run_output_procedure,
+    run_preview_procedure,
     select_xml_validation_file,
     show_beautify_option,
 )
+from utils.procesor import PREVIEW_RECORD_LIMIT
 
 # Set the configuration for the Streamlit page
 st.set_page_config(
@@ -49,10 +52,14 @@ with st.sidebar:
     output_filename = st.text_input('Optional Output Filename:', placeholder='Output',
                                     help=help_dict["output_filename"])
     if template_file and input_files:
+        if st.button('Preview Output', use_container_width=True, help=help_dict["preview_output"]):
+            st.session_state['menu_index'] = "Output"
+            run_preview_procedure(input_files, template_file, beautify_output)
         if st.button('Generate Output', use_container_width=True):
             st.session_state['menu_index'] = "Output"
             run_output_procedure(input_files, template_file, output_filename, validation_file, beautify_output)
     else:
+        st.button('Preview Output', disabled=True, use_container_width=True)
         st.button('Generate Output', disabled=True, use_container_width=True)
 
 # Define the main menu to allow the user navigation through input files, templates, and output sections
@@ -81,30 +88,41 @@ elif main_menu == "Template":
         display_template(template_file)
 
 elif main_menu == "Output":
-    PREVIEW_CHAR_LIMIT = 35000  # Maximum number of text characters to be displayed in output previews
     if not st.session_state['output_state']:
         st.info(
-            "Output has not been generated yet. Please use the **Generate Output** button in the sidebar on the left "
-            "to initiate the generation process.", icon="ℹ️")
+            "Output has not been generated yet. Please use the **Preview Output** button in the sidebar on the left "
+            "to quickly preview the output, or the **Generate Output** button to initiate the generation process.",
+            icon="ℹ️")
     if st.session_state['output_state']:
-        output, extension, validation_status, beautify_output, prettified_status = st.session_state['output_state']
+        output, extension, validation_status, beautify_output, prettified_status, preview_complete = \
+            st.session_state['output_state']
+        if output is not None and preview_complete is not None:  # A preview rendered from the first records
+            st.info(f"**Preview**:\n Displaying the output rendered from the first {PREVIEW_RECORD_LIMIT} records of "
+                    f"every input file the template loops over (the other input files are complete), limited to "
+                    f"{PREVIEW_CHAR_LIMIT} characters. Please use the **Generate Output** button to generate and "
+                    f"download the whole output.")
+            if not preview_complete and extension != '.xlsx':
+                output += "..."
         if output and extension != '.xlsx':
-            st.success("**Success**:\n The output hss been generated successfully.")
-            st.info(f"**Info**: Previewing output file and displaying the first {PREVIEW_CHAR_LIMIT} characters.")
+            if preview_complete is None:
+                st.success("**Success**:\n The output hss been generated successfully.")
+                st.info(f"**Info**: Previewing output file and displaying the first {PREVIEW_CHAR_LIMIT} characters.")
             if validation_status:
                 if validation_status.type == 'KO':
                     st.error(f"**{validation_status.msg}**:\n\n {validation_status.log}")
                 else:
                     st.success(f"**{validation_status.msg}**:\n {validation_status.log}")
             if beautify_output:
-                if prettified_status:
+                if prettified_status is True:
                     st.success("**Success**:\n The output has been beautified successfully.")
                 else:
-                    st.error("**Error**:\n The output could not be beautified. The original output remains unchanged.")
+                    st.error("**Error**:\n The output could not be beautified. The original output remains unchanged."
+                             + (f"\n\n{prettified_status}" if prettified_status else ""))
             if len(output) > PREVIEW_CHAR_LIMIT:
                 output = output[:PREVIEW_CHAR_LIMIT] + "..."
             st.code(output, language=extension[1:], line_numbers=True)
         elif output and extension == '.xlsx':
-            st.success("**Success**:\n The output has been generated successfully.")
-            st.info("**Info**: Previewing outputfile and displaying the first 250 rows.")
+            if preview_complete is None:
+                st.success("**Success**:\n The output has been generated successfully.")
+                st.info("**Info**: Previewing outputfile and displaying the first 250 rows.")
             display_xlsx_frame(output)
@@ -1,10 +1,35 @@
 import argparse
+import contextlib
 import io
+import json
+import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import yaml
 
-from .utils.procesor import generate_output, prettify_output, validate_xml
+from .utils.incremental_renderer import save_state
+from .utils.procesor import (
+    LOAD_THREADS,
+    generate_incremental_output,
+    generate_output,
+    generate_output_stream,
+    load_data,
+    merge_data,
+    prettify_output,
+    validate_xml,
+)
+from .utils.profiler import Profiler, is_profiling, profile_phase, profile_stream
+from .utils.schema_cache import preload_schemas
+from .utils.xml_prettifier import prettify_xml_stream
+from .utils.xml_validation import StreamingXmlValidator
+
+WRITE_BUFFER_SIZE = 1024 * 1024  # Size of the write buffer (in bytes) used when streaming the output to a file
+SUMMARY_FILE = 'jinjaxcat_summary.json'  # Default name of the summary written by the batch mode next to the config
+
+_batch_state = {}  # The jobs and their loaded inputs in a worker process of the batch mode, set by its initializer
 
 
 class CustomUploadedFile(io.BytesIO):
@@ -12,9 +37,10 @@ class CustomUploadedFile(io.BytesIO):
      A custom file object extending io.BytesIO to store additional file metadata.
      """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, encoding=None):
         """
         Initializes the object, loading the file content and metadata.
+        If the encoding is provided, it is used instead of detecting the encoding of the file.
         """
         with open(file_path, 'rb') as file:
             super().__init__(file.read())
@@ -22,11 +48,13 @@ class CustomUploadedFile(io.BytesIO):
         self.name = os.path.basename(file_path)
         self.type = os.path.splitext(file_path)[1]
         self.size = os.path.getsize(file_path)
+        self.encoding = encoding
 
 
 def load_config(config_path):
     """
     Load the configuration from a YAML file. Checks for mandatory keys and reports if any are missing.
+    A configuration with a list of jobs is checked job by job (see get_jobs).
     """
     mandatory_keys = ['input_files', 'template_file', 'output_file']
     with open(config_path) as stream:
@@ -35,18 +63,41 @@ def load_config(config_path):
         except yaml.YAMLError as exc:
             print(f"Failed to load the YAML configuration: {exc}")
             return None
-        missing_keys = [key for key in mandatory_keys if key not in cfg]
-        if missing_keys:
-            print(f"Missing mandatory key(s) in configuration: {', '.join(missing_keys)}")
-            return None
+        for job in get_jobs(cfg):
+            missing_keys = [key for key in mandatory_keys if key not in job]
+            if missing_keys:
+                print(f"Missing mandatory key(s) in configuration: {', '.join(missing_keys)}")
+                return None
         return cfg
 
 
-def prepare_files(file_paths):
+def get_jobs(config):
+    """
+    Returns the jobs of a configuration. A configuration having the 'jobs' key defines a list of jobs, every job is
+    a mapping of parameters overriding the other (shared) parameters of the configuration.
+    Any other configuration is a single job.
+    """
+    if 'jobs' not in config:
+        return [config]
+    defaults = {key: value for key, value in config.items() if key != 'jobs'}
+    return [{**defaults, **job} for job in config['jobs']]
+
+
+def prepare_file(file_entry):
     """
-    Prepare a list of CustomUploadedFile objects from the given file paths.
+    Prepare a CustomUploadedFile object from a file entry of the configuration.
+    The entry is either a file path or a mapping with a 'path' and an optional 'encoding' key.
     """
-    return [CustomUploadedFile(file_path) for file_path in file_paths]
+    if isinstance(file_entry, dict):
+        return CustomUploadedFile(file_entry['path'], encoding=file_entry.get('encoding'))
+    return CustomUploadedFile(file_entry)
+
+
+def prepare_files(file_entries):
+    """
+    Prepare a list of CustomUploadedFile objects from the given file paths (or file entries of the configuration).
+    """
+    return [prepare_file(file_entry) for file_entry in file_entries]
 
 
 def write_output(output_content, file_path):
@@ -57,32 +108,324 @@ def write_output(output_content, file_path):
         f.write(output_content)
 
 
+def write_output_stream(output_stream, file_path):
+    """
+    Writes the given output chunks to the specified file path as they are produced.
+    """
+    with open(file_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+        for chunk in output_stream:
+            f.write(chunk)
+
+
 def run_jinaxcat(config_path):
     # Load config file
     config = load_config(config_path)
     if not config:
         exit("Failed to load the configuration file.")
+    for job in get_jobs(config):
+        run_job(job)
+
+
+def run_job(config, input_data=None):
+    """
+    Runs a single job: generates the output of the configuration, optionally beautifies and validates it, and writes
+    it to the output file.
+
+    :param config: The configuration of the job.
+    :param input_data: Data already loaded from the input files of the job. If given, the files are not loaded.
+    :return: Dictionary with the duration of the phases of the job in seconds (the duration of writing a streamed
+             output is included in its rendering).
+    """
+    timings = {}
+    started = time.perf_counter()
+    incremental = config.get('incremental')
+    if incremental:
+        _check_incremental(incremental)  # Before anything is rendered or written
 
     # Prepare the input files and template file
-    input_files = prepare_files(config['input_files'])
-    template_file = CustomUploadedFile(config['template_file'])
+    input_files = prepare_files(config['input_files']) if input_data is None else []
+    template_file = prepare_file(config['template_file'])
+
+    lazy_input = config.get('lazy_input', False)
+    parallel_loop = config.get('parallel_loop')
+    if input_data is None and is_profiling():
+        # While profiling, the inputs are loaded before the rendering, so their parsing is a phase of its own
+        with profile_phase('load inputs'):
+            input_data = load_data(input_files, lazy=lazy_input)
+        input_files = []  # The data is passed to the rendering already loaded
+        timings['load'] = _elapsed(started, timings)
+
+    delta_output = state = None
 
-    # Generate the output, optionally beautify it, and validate it against the schema if provided
-    output = generate_output(input_files, template_file, key_mapping={})
+    if incremental:
+        # Render only the changed rows of the data source, and the delta document if a delta template is provided
+        delta_template_file = prepare_file(incremental['delta_template']) if 'delta_template' in incremental else None
+        with profile_phase('render'):
+            output, delta_output, state = generate_incremental_output(
+                input_files, template_file, key_mapping={}, loop_source=incremental['loop'],
+                record_key=incremental['key'], state_file=incremental['state_file'],
+                delta_template_file=delta_template_file, lazy_input=lazy_input, input_data=input_data)
+        timings['render'] = _elapsed(started, timings)
+    elif config.get('stream_output', False) and not parallel_loop and not template_file.name.endswith(".xlsx"):
+        # Stream text-based outputs directly to the output file, so the whole document is never held in memory
+        # The phases of the stream run when the next chunk is written, so they are profiled chunk by chunk
+        output_stream = profile_stream('render', generate_output_stream(
+            input_files, template_file, key_mapping={}, lazy_input=lazy_input, input_data=input_data))
+        if config.get('beautify_output', False) and template_file.name.endswith(".xml"):
+            output_stream = profile_stream('prettify', prettify_xml_stream(output_stream))  # Indent while rendered
+        if config.get('schema_file'):
+            # Validate the output while it is rendered, the rendering stops once the output is known to be invalid
+            validator = StreamingXmlValidator(config['schema_file'], max_errors=config.get('max_validation_errors'))
+            try:
+                with profile_phase('write'):
+                    write_output_stream(profile_stream('validate', validator.validate(output_stream)),
+                                        config['output_file'])
+            except BaseException:
+                validator.abort()  # Ends the background thread of the validation, the output is incomplete
+                raise
+            timings['render'] = _elapsed(started, timings)
+            with profile_phase('validate'):
+                _report_validation(validator.close())
+            timings['validate'] = _elapsed(started, timings)
+            if validator.interrupted:
+                raise Exception(f"The rendering was stopped by the validation, {config['output_file']} is incomplete.")
+            timings['total'] = time.perf_counter() - started
+            return timings
+        with profile_phase('write'):
+            write_output_stream(output_stream, config['output_file'])
+        timings['render'] = _elapsed(started, timings)
+        timings['total'] = time.perf_counter() - started
+        return timings
+    else:
+        # Generate the output, optionally beautify it, and validate it against the schema if provided
+        with profile_phase('render'):
+            output = generate_output(input_files, template_file, key_mapping={}, lazy_input=lazy_input,
+                                     parallel_loop=parallel_loop, render_workers=config.get('render_workers'),
+                                     input_data=input_data)
+        timings['render'] = _elapsed(started, timings)
     if config.get('beautify_output', False):
         extension = template_file.name[template_file.name.rfind("."):]
-        output = prettify_output(output, extension)
+        with profile_phase('prettify'):
+            output = prettify_output(output, extension)
+            if delta_output is not None:
+                delta_output = prettify_output(delta_output, extension)
+        timings['beautify'] = _elapsed(started, timings)
     if schema_path := config.get('schema_file'):
-        validate_xml(output.encode(), schema_path)
+        with profile_phase('validate'):
+            _report_validation(validate_xml(output.encode(), schema_path))
+        timings['validate'] = _elapsed(started, timings)
 
     # Write the output to file
-    write_output(output, config['output_file'])
+    with profile_phase('write'):
+        write_output(output, config['output_file'])
+        if delta_output is not None:
+            write_output(delta_output, incremental['delta_output_file'])
+        if state is not None:
+            save_state(incremental['state_file'], state)  # Only once the outputs are written
+    timings['write'] = _elapsed(started, timings)
+    timings['total'] = time.perf_counter() - started
+    return timings
+
+
+def _report_validation(result):
+    """
+    Logs the result of the validation of an output.
+    """
+    if result.type == "OK":
+        logging.info(result.log)
+    else:
+        logging.warning(f"{result.msg}: {result.log}")
+
+
+def _check_incremental(incremental):
+    """
+    Checks that the incremental mapping of a job has the mandatory keys, and the delta output file if a delta template
+    is given.
+
+    :raises ValueError: If a key is missing.
+    """
+    mandatory_keys = ['loop', 'key', 'state_file'] + (['delta_output_file'] if 'delta_template' in incremental else [])
+    missing_keys = [key for key in mandatory_keys if key not in incremental]
+    if missing_keys:
+        raise ValueError(f"Missing mandatory key(s) in the incremental configuration: {', '.join(missing_keys)}")
+
+
+def _elapsed(started, timings):
+    """
+    Returns the duration of the current phase of a job, i.e. the time elapsed since the end of the previous phase.
+    """
+    return time.perf_counter() - started - sum(timings.values())
+
+
+def run_batch(config_paths, workers=None, summary_path=None):
+    """
+    Runs the jobs of several configurations (and of configurations having a list of jobs).
+    Every distinct input file is loaded once and shared by all the jobs using it, the jobs are run by a pool of
+    worker processes. A failed job does not stop the others, its error is reported in the summary.
+
+    :param config_paths: Paths to the configuration files.
+    :param workers: Number of worker processes running the jobs, the number of CPUs by default.
+    :param summary_path: Path to the JSON file where the summary of the jobs (status and timings) is written,
+                         SUMMARY_FILE in the directory of the first configuration file by default.
+    :return: The summary of the jobs.
+    """
+    started = time.perf_counter()
+    jobs = []
+    for config_path in config_paths:
+        config = load_config(config_path)
+        if not config:
+            exit(f"Failed to load the configuration file {config_path}.")
+        jobs += [(str(config_path), number, job) for number, job in enumerate(get_jobs(config))]
+
+    # Load every distinct input file once, the input files are identified by their path, encoding and loading mode
+    input_keys = list(dict.fromkeys(key for _, _, job in jobs for key in _get_input_keys(job)))
+    schema_paths = list(dict.fromkeys(job['schema_file'] for _, _, job in jobs if job.get('schema_file')))
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    load_threads = min(LOAD_THREADS, len(input_keys) or 1)
+    if is_profiling():  # The jobs and the input files are run one by one in this process, so they can be measured
+        workers = load_threads = 1
+    with ThreadPoolExecutor(max_workers=load_threads) as executor:
+        # The schemas used by the jobs run in this process are compiled once, while the inputs are loaded
+        preloaded_schemas = executor.submit(_preload_schemas, schema_paths) if workers <= 1 else None
+        loaded_inputs = dict(zip(input_keys, executor.map(_load_input, input_keys)))
+        if preloaded_schemas:
+            preloaded_schemas.result()
+
+    if workers <= 1:
+        results = [_run_batch_job(job, loaded_inputs) for job in jobs]
+    else:
+        # The loaded inputs are sent to every worker process once, by the initializer of the pool, which also compiles
+        # the schemas once per worker process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_batch_worker, initargs=(loaded_inputs, schema_paths)) as executor:
+            results = list(executor.map(_run_batch_job, jobs))
+
+    summary = {
+        'inputs': [{'path': key[0], 'seconds': seconds, 'error': error}
+                   for key, (_, error, seconds) in loaded_inputs.items()],
+        'jobs': results,
+        'failed': sum(result['status'] != 'ok' for result in results),
+        'seconds': time.perf_counter() - started,
+    }
+    with open(summary_path or get_summary_path(config_paths), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def get_summary_path(config_paths):
+    """
+    Returns the default path of the summary of the batch mode, SUMMARY_FILE in the directory of the first
+    configuration file.
+    """
+    return os.path.join(os.path.dirname(config_paths[0]), SUMMARY_FILE)
+
+
+def _get_input_keys(job):
+    """
+    Returns the keys (path, encoding, lazy) identifying the input files of a job.
+    """
+    keys = []
+    for file_entry in job['input_files']:
+        path, encoding = (file_entry['path'], file_entry.get('encoding')) if isinstance(file_entry, dict) \
+            else (file_entry, None)
+        keys.append((os.path.abspath(path), encoding, bool(job.get('lazy_input', False))))
+    return keys
+
+
+def _load_input(key):
+    """
+    Loads an input file of the batch mode.
+
+    :param key: The key (path, encoding, lazy) of the input file.
+    :return: Tuple (data, error message, duration in seconds), the data is None if the file could not be loaded.
+    """
+    started = time.perf_counter()
+    path, encoding, lazy = key
+    try:
+        data, error = load_data([CustomUploadedFile(path, encoding=encoding)], lazy=lazy), None
+    except Exception as e:
+        data, error = None, f"{type(e).__name__}: {e}"
+    return data, error, time.perf_counter() - started
+
+
+def _preload_schemas(schema_paths):
+    """
+    Compiles the schemas used by the jobs of the batch mode into the schema cache. A schema that can not be compiled
+    is left to the validation of the jobs using it, which reports the error.
+    """
+    for schema_path in schema_paths:
+        try:
+            preload_schemas([schema_path])
+        except Exception as e:
+            logging.warning(f"Failed to preload the schema {schema_path}: {type(e).__name__}: {e}")
+
+
+def _init_batch_worker(loaded_inputs, schema_paths=()):
+    """
+    Initializes a worker process of the batch mode with the loaded inputs and preloads the schemas used by the jobs.
+    """
+    _batch_state['loaded_inputs'] = loaded_inputs
+    _preload_schemas(schema_paths)
+
+
+def _run_batch_job(job, loaded_inputs=None):
+    """
+    Runs a job of the batch mode with its loaded inputs and returns its summary.
+    """
+    config_path, number, config = job
+    loaded_inputs = loaded_inputs if loaded_inputs is not None else _batch_state['loaded_inputs']
+    result = {'config': config_path, 'job': number, 'name': config.get('name'), 'output_file': config['output_file']}
+    try:
+        input_keys = _get_input_keys(config)
+        input_data = merge_data([os.path.basename(key[0]) for key in input_keys],
+                                (_get_loaded_input(loaded_inputs, key) for key in input_keys))
+        with profile_phase('job', f"{os.path.basename(config_path)}#{number}"):
+            timings = run_job(config, input_data=input_data)
+        result.update(status='ok', error=None, timings=timings)
+    except Exception as e:
+        result.update(status='failed', error=f"{type(e).__name__}: {e}", timings=None)
+    logging.info(f"Job {number} of {config_path}: {result['status']}")
+    return result
+
+
+def _get_loaded_input(loaded_inputs, key):
+    """
+    Returns the data of a loaded input file of the batch mode, or raises the error of its loading.
+    """
+    data, error, _ = loaded_inputs[key]
+    if error:
+        raise Exception(f"Failed to load the input file {key[0]}: {error}")
+    return data
 
 
 if __name__ == '__main__':
     # Set up argument parsing for command line usage
     parser = argparse.ArgumentParser(description="Process input and template files according to the config file")
-    parser.add_argument('config', type=str, help="Path to the configuration yaml file")
+    parser.add_argument('config', type=str, nargs='+', help="Path to the configuration yaml file(s)")
+    parser.add_argument('--workers', type=int, help="Number of worker processes running the jobs of the batch mode")
+    parser.add_argument('--summary', type=str,
+                        help=f"Path to the JSON summary of the jobs written by the batch mode, {SUMMARY_FILE} next to "
+                             f"the first configuration file by default")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print the wall time, CPU time and peak memory of every phase of the run")
+    parser.add_argument('--profile-report', type=str,
+                        help="Path to the JSON report of the profile written with --profile")
     args = parser.parse_args()
 
-    run_jinaxcat(args.config)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")  # Report e.g. the used CSV engines
+    profiler = Profiler() if args.profile else None
+    batch_summary = None
+    try:
+        with profiler or contextlib.nullcontext():
+            if len(args.config) == 1 and 'jobs' not in (load_config(args.config[0]) or {}):
+                run_jinaxcat(args.config[0])
+            else:  # Batch mode: several configurations, or a configuration with a list of jobs
+                batch_summary = run_batch(args.config, workers=args.workers, summary_path=args.summary)
+    finally:
+        if profiler:  # Also report the profile of a failed run
+            print(profiler.format_table())
+            if args.profile_report:
+                profiler.write_report(args.profile_report)
+    if batch_summary and batch_summary['failed']:
+        exit(f"{batch_summary['failed']} of {len(batch_summary['jobs'])} jobs failed, "
+             f"see {args.summary or get_summary_path(args.config)}.")
@@ -0,0 +1,147 @@
+"""
+This module provides the artifact cache of the web interface. The data loaded from the input files is kept on the disk
+under a key computed from the content of the files and of the source code of the application, so the same upload of
+the same files is not loaded again, even in another session or after a restart, while an upgraded application loads
+them again. The cache is bounded by a byte budget (see ARTIFACT_CACHE_MAX_BYTES_ENV), the least recently used
+artifacts are evicted first. The last used artifacts are also kept in memory, to save reading them from the disk.
+The rendered outputs may depend on more than the files (e.g. on the current date), they are only kept in memory for
+TRANSIENT_ARTIFACT_TTL seconds, which spares rendering them again on every rerun of the Streamlit script.
+
+Like the values cached by Streamlit, the artifacts are stored pickled and every call returns a new copy of the artifact,
+so a session changing the returned data does not change the data of the other sessions. The artifacts on the disk are
+signed (see the signing module), an artifact whose signature does not match is never unpickled.
+"""
+
+# Standard library imports
+import functools
+import logging
+import os
+import pickle
+import threading
+
+# Third party imports
+import cachetools
+
+# Local application/library specific imports
+from .cache_dir import get_cache_dir
+from .data_sources import compute_fingerprint
+from .disk_cache import DiskCache
+from .signing import get_signing_key, sign, verify
+
+ARTIFACT_CACHE_MAX_BYTES_ENV = 'JINJAXCAT_ARTIFACT_CACHE_MAX_BYTES'  # Environment variable overriding the budget
+DEFAULT_ARTIFACT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # Default maximum size of the artifacts on the disk
+ARTIFACT_MEMORY_MAX_BYTES = 256 * 1024 * 1024  # Maximum size of the artifacts kept in memory
+TRANSIENT_ARTIFACT_TTL = 60  # Seconds the artifacts which are not persistent (the outputs) are kept in memory
+ARTIFACT_VERSION = '2'  # Version of the format of the artifacts, artifacts of other versions are not reused
+UNCACHED_INPUT_TYPES = ('.rest',)  # Inputs whose data changes without their file changing, e.g. REST endpoints
+# Directory of the source code of the application, whose fingerprint is part of the keys of the artifacts
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+_memory_artifacts = cachetools.LRUCache(maxsize=ARTIFACT_MEMORY_MAX_BYTES, getsizeof=len)
+_transient_artifacts = cachetools.TTLCache(maxsize=ARTIFACT_MEMORY_MAX_BYTES, ttl=TRANSIENT_ARTIFACT_TTL, getsizeof=len)
+_memory_artifacts_lock = threading.Lock()
+
+
+@functools.cache
+def get_artifact_cache() -> DiskCache | None:
+    """
+    Returns the artifact cache on the disk, created on the first call.
+    :return: The DiskCache object, or None if the cache directory or the signing key is not available.
+    """
+    directory = get_cache_dir('artifacts')
+    max_bytes = int(os.environ.get(ARTIFACT_CACHE_MAX_BYTES_ENV) or DEFAULT_ARTIFACT_CACHE_MAX_BYTES)
+    return DiskCache(directory, max_bytes) if directory and max_bytes > 0 and get_signing_key() else None
+
+
+@functools.cache
+def get_code_fingerprint() -> str:
+    """
+    Returns the fingerprint of the source code of the application (the modules of the utils package, including the
+    Jinja2 extensions), so the artifacts built by another version of the code are not reused.
+    :return: Hexadecimal digest of the paths and the content of the modules.
+    """
+    parts = []
+    for directory, subdirectories, filenames in os.walk(SOURCE_DIRECTORY):
+        subdirectories[:] = sorted(name for name in subdirectories if name != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(directory, filename)
+                with open(path, 'rb') as file:
+                    parts += [os.path.relpath(path, SOURCE_DIRECTORY), file.read()]
+    return compute_fingerprint(*parts)
+
+
+def get_files_key(files) -> str | None:
+    """
+    Returns the key identifying the content of the uploaded files, or None if an artifact built from the files can not
+    be cached, because the data of some files (e.g. REST inputs) can change while the file stays the same.
+
+    :param files: List of the uploaded files.
+    :return: Hexadecimal digest identifying the names, the declared encodings and the content of the files.
+    """
+    if any(file.name.lower().endswith(UNCACHED_INPUT_TYPES) for file in files):
+        return None
+    return compute_fingerprint(*(part for file in files
+                                 for part in (file.name, getattr(file, 'encoding', None) or '', file.getvalue())))
+
+
+def get_artifact(kind: str, key_parts, build, persistent: bool = True):
+    """
+    Returns the cached artifact, building and storing it if it is not in the cache yet.
+
+    :param kind: The kind of the artifact, e.g. 'data' or 'output'.
+    :param key_parts: The parts of the key identifying the artifact (strings), e.g. the key of the input files.
+                      If a part is None, the artifact is not cached.
+    :param build: Function building the artifact, its result must be picklable.
+    :param persistent: If False, the artifact is not stored on the disk and is kept in memory for
+                       TRANSIENT_ARTIFACT_TTL seconds only.
+    :return: The artifact.
+    """
+    if any(part is None for part in key_parts):
+        return build()
+    key = compute_fingerprint(ARTIFACT_VERSION, get_code_fingerprint(), kind, *key_parts)
+    memory_artifacts = _memory_artifacts if persistent else _transient_artifacts
+    with _memory_artifacts_lock:
+        pickled = memory_artifacts.get(key)
+    disk_cache = get_artifact_cache() if persistent else None
+    if disk_cache is not None:
+        if pickled is None:
+            pickled = _verify(disk_cache.get(key), kind)
+        else:
+            disk_cache.touch(key)  # Keep the artifact used from memory from being evicted on the disk
+    if pickled is not None:
+        try:
+            artifact = pickle.loads(pickled)
+        except Exception as e:  # A damaged artifact is only built again
+            logger.warning(f"The cached {kind} can not be loaded, building it again: {e}")
+        else:
+            _remember(memory_artifacts, key, pickled)
+            return artifact
+
+    artifact = build()
+    pickled = pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL)
+    if disk_cache is not None:
+        disk_cache.set(key, sign(pickled))
+    _remember(memory_artifacts, key, pickled)
+    return artifact
+
+
+def _verify(signed: bytes | None, kind: str) -> bytes | None:
+    """
+    Returns the pickled artifact of an entry of the disk cache if its signature matches, None otherwise.
+    """
+    pickled = verify(signed)
+    if signed is not None and pickled is None:
+        logger.warning(f"The cached {kind} has an invalid signature, building it again")
+    return pickled
+
+
+def _remember(memory_artifacts: cachetools.Cache, key: str, pickled: bytes):
+    """
+    Keeps the pickled artifact in memory, unless it is bigger than the whole memory budget.
+    """
+    if len(pickled) <= ARTIFACT_MEMORY_MAX_BYTES:
+        with _memory_artifacts_lock:
+            memory_artifacts[key] = pickled
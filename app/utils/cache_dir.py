@@ -0,0 +1,51 @@
+"""
+This module provides the location of the persistent caches of JinjaXcat.
+The caches are stored in ~/.cache/jinjaxcat unless the JINJAXCAT_CACHE_DIR environment variable points elsewhere.
+The caches hold e.g. the responses of authenticated REST requests, so their directories are created accessible by the
+owner only. An existing cache directory is made private as well, and it is not used if it belongs to another user.
+"""
+
+# Standard library imports
+import os
+import stat
+
+CACHE_DIR_ENV = 'JINJAXCAT_CACHE_DIR'  # Environment variable overriding the default cache directory
+CACHE_DIR_MODE = 0o700  # Permissions of the created cache directories
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'jinjaxcat')
+
+
+def get_cache_dir(name: str) -> str | None:
+    """
+    Returns the directory of the cache with the given name, creating it if it does not exist yet.
+
+    :param name: Name of the cache, used as the name of its subdirectory.
+    :return: Path to the cache directory, or None if the directory can not be created (e.g. on a read-only disk).
+    """
+    root_directory = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+    directory = os.path.join(root_directory, name)
+    try:
+        for path in (root_directory, directory):
+            os.makedirs(path, mode=CACHE_DIR_MODE, exist_ok=True)
+            if not _make_private(path):
+                return None
+    except OSError:
+        return None
+    return directory
+
+
+def _make_private(directory: str) -> bool:
+    """
+    Removes the permissions of the group and the others from a directory of the current user, e.g. of a
+    JINJAXCAT_CACHE_DIR created before.
+
+    :param directory: Path to the directory.
+    :return: False if the directory belongs to another user, True otherwise.
+    """
+    if not hasattr(os, 'getuid'):  # The owner and the mode are not checked on Windows
+        return True
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        return False
+    if stat.S_IMODE(status.st_mode) & ~CACHE_DIR_MODE:
+        os.chmod(directory, stat.S_IMODE(status.st_mode) & CACHE_DIR_MODE)
+    return True
@@ -0,0 +1,364 @@
+"""
+This module provides the CSV reading helpers and the data sources for JinjaXcat.
+Tables (CSV files and Excel sheets) are stored column by column in a RecordTable, whose rows can be used in templates
+like dictionaries. A lazy data source can be used the same way, but its rows are read in chunks from the underlying
+file every time the data source is iterated.
+Every loaded data source carries a fingerprint of its content, computed once at load time.
+"""
+
+# Standard library imports
+import csv
+import hashlib
+import io
+import logging
+import pickle
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CSV_CHUNK_SIZE = 10000  # Number of rows read from the underlying CSV file at once
+
+# Parser settings (engine, quoting) tried one after another when a CSV file is read. The fast C engine is tried first,
+# the python engine is kept as a fallback for malformed files and, as a last resort, the file is read ignoring quotes.
+CSV_READ_ATTEMPTS = (
+    ('c', csv.QUOTE_MINIMAL),
+    ('python', csv.QUOTE_MINIMAL),
+    ('python', csv.QUOTE_NONE),
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintedList(list):
+    """
+    A list (e.g. the records of an input file) carrying the fingerprint of the content it was loaded from.
+    """
+    __slots__ = ('fingerprint',)
+
+
+class FingerprintedDict(dict):
+    """
+    A dictionary (e.g. the object of a JSON input file) carrying the fingerprint of the content it was loaded from.
+    """
+    __slots__ = ('fingerprint',)
+
+
+def compute_fingerprint(*parts: bytes | str) -> str:
+    """
+    Computes the fingerprint of the content of a data source, e.g. of the bytes of the file and the settings
+    used to parse it.
+
+    :param parts: The content and the settings, as bytes or strings.
+    :return: Hexadecimal digest identifying the content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        part = part.encode() if isinstance(part, str) else part
+        digest.update(len(part).to_bytes(8, 'little'))  # Keeps the boundaries of the parts unambiguous
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def with_fingerprint(data, fingerprint: str):
+    """
+    Attaches the fingerprint to the loaded data. Lists and dictionaries are wrapped in their fingerprinted
+    subclasses, other values (e.g. numbers loaded from a JSON file) are returned as they are.
+
+    :param data: The loaded data.
+    :param fingerprint: The fingerprint of the content the data was loaded from.
+    :return: The data carrying the fingerprint.
+    """
+    if isinstance(data, list):
+        data = FingerprintedList(data)
+    elif isinstance(data, dict):
+        data = FingerprintedDict(data)
+    else:
+        return data
+    data.fingerprint = fingerprint
+    return data
+
+
+def get_fingerprint(data) -> str:
+    """
+    Returns the fingerprint of a data source. The fingerprint computed at load time is returned right away,
+    the fingerprint of other data (e.g. a part of a data source, or a list created in a template) is computed
+    from its content, which also works for nested data.
+
+    :param data: The data source.
+    :return: Hexadecimal digest identifying the content.
+    """
+    fingerprint = getattr(data, 'fingerprint', None)
+    return fingerprint or compute_fingerprint(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class RecordTable(Sequence):
+    """
+    A table of records stored column by column. Every column keeps each of its distinct values once and an array
+    with the index of the value of every row, so the repeated column names and values of a list of dictionaries
+    do not take any memory. The rows are returned as Row views, which behave like read-only dictionaries.
+    The table is read-only as well: it supports the operations of a sequence, slicing (which returns a table) and the
+    concatenation with lists (which returns a list), use list(table) to get a list that can be modified.
+    """
+    __slots__ = ('columns', '_columns', '_length', 'fingerprint')
+
+    def __init__(self, columns: dict, length: int, fingerprint: str | None = None):
+        """
+        :param columns: Dictionary {column name: (array of value indexes, list of distinct values)}.
+        :param length: Number of rows.
+        :param fingerprint: The fingerprint of the content the table was loaded from, see get_fingerprint.
+        """
+        self.columns = list(columns)
+        self._columns = columns
+        self._length = length
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_dataframe(cls, df: 'pd.DataFrame', fingerprint: str | None = None) -> 'RecordTable':
+        """
+        Creates a table from the columns of a DataFrame.
+
+        :param df: The DataFrame, e.g. a CSV file loaded with read_csv.
+        :param fingerprint: The fingerprint of the content the DataFrame was loaded from.
+        :return: The RecordTable object.
+        """
+        import pandas as pd
+
+        columns = {}
+        for name in df.columns:
+            codes, uniques = pd.factorize(df[name])  # Index of the distinct value of every row, distinct values
+            values = uniques.tolist()
+            columns[name] = (array('i', codes.astype('int32').tobytes()), values)
+        return cls(columns, len(df), fingerprint)
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """
+        Returns the table as a DataFrame.
+        """
+        import pandas as pd
+
+        return pd.DataFrame({name: pd.Series(values, dtype=object).take(list(codes)).to_numpy()
+                             for name, (codes, values) in self._columns.items()}, columns=self.columns)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            # The slice shares the distinct values of the columns, its fingerprint is derived from the one of the table
+            columns = {name: (codes[index], values) for name, (codes, values) in self._columns.items()}
+            fingerprint = self.fingerprint and compute_fingerprint(self.fingerprint, f"{start}:{stop}:{step}")
+            return RecordTable(columns, len(range(start, stop, step)), fingerprint)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('RecordTable index out of range')
+        return Row(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield Row(self, index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RecordTable | list | tuple):
+            return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+        return NotImplemented
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def __radd__(self, other) -> list:
+        return list(other) + list(self)
+
+    def copy(self) -> list:
+        """
+        Returns the rows as a list, same as the copy of a list of dictionaries.
+        """
+        return list(self)
+
+    __hash__ = None  # Mutable containers are not hashable, same as lists
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._length} rows, columns={self.columns!r})"
+
+
+class Row(Mapping):
+    """
+    A read-only dictionary-like view of a row of a RecordTable, supporting row['COLUMN'], row.get('COLUMN'),
+    row.items(), row.keys(), row.values(), 'COLUMN' in row and the iteration over the column names. row.copy() and
+    the merge with a dictionary (row | {...}) return dictionaries, which can be modified. A row is pickled (e.g. to
+    compute its fingerprint) as a dictionary, without its table.
+    """
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: RecordTable, index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, column):
+        codes, values = self._table._columns[column]
+        return values[codes[self._index]]
+
+    def __contains__(self, column) -> bool:
+        return column in self._table._columns
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self) -> int:
+        return len(self._table.columns)
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __or__(self, other) -> dict:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return {**self, **other}
+
+    def __ror__(self, other) -> dict:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return {**other, **self}
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def read_csv(bytes_object: bytes, encoding: str, delimiter: str, file_name: str = '',
+             nrows: int | None = None) -> 'pd.DataFrame':
+    """
+    Reads a CSV file into a DataFrame of strings, trying the parser settings from CSV_READ_ATTEMPTS in order.
+    The used engine and the reason of every fallback are logged.
+
+    :param bytes_object: The content of the CSV file.
+    :param encoding: The encoding of the CSV file.
+    :param delimiter: The delimiter of the CSV file.
+    :param file_name: Name of the CSV file, used in the log messages.
+    :param nrows: Maximum number of rows read, all rows are read if None.
+    :return: DataFrame with the content of the CSV file, empty cells are filled with empty strings.
+    """
+    import pandas as pd
+
+    for attempt, (engine, quoting) in enumerate(CSV_READ_ATTEMPTS, start=1):
+        try:
+            df = pd.read_csv(io.BytesIO(bytes_object), dtype=str, sep=delimiter, engine=engine, encoding=encoding,
+                             quoting=quoting, nrows=nrows)
+        except pd.errors.ParserError as e:
+            if attempt == len(CSV_READ_ATTEMPTS):
+                raise
+            logger.warning("Falling back from the %s engine for '%s': %s", engine, file_name, e)
+        else:
+            logger.info("Loaded '%s' using the %s engine%s", file_name, engine,
+                        " (ignoring quotes)" if quoting == csv.QUOTE_NONE else "")
+            return df.fillna('')
+
+
+class LazyCsvSource:
+    """
+    A CSV data source that reads its rows in chunks instead of materializing them as a list of dictionaries.
+    The data source can be iterated repeatedly (e.g. {% for article in articles_csv %}) and supports len()
+    (e.g. {{ articles_csv|length }}). Rows are yielded as dictionaries, same as for eagerly loaded CSV files.
+    Nothing is parsed before the data source is used: the rows are counted while they are iterated, so only len()
+    called before the first iteration reads the file one more time. The rows of a file having a path are read from the
+    disk, the data source keeps only the content of an uploaded file. The content is still read whole once, to detect
+    the encoding and compute the fingerprint, and it stays in memory as long as the input file object (e.g. a
+    CustomUploadedFile of the CLI) is kept.
+    """
+
+    def __init__(self, file, encoding: str, delimiter: str, chunk_size: int = CSV_CHUNK_SIZE,
+                 fingerprint: str | None = None):
+        """
+        Initializes the data source. The file is not parsed until the data source is used.
+
+        :param file: The input file. If it has a file_path attribute, the rows are read from the disk and the data
+                     source does not keep the content of the file object.
+        :param encoding: The encoding of the CSV file.
+        :param delimiter: The delimiter of the CSV file.
+        :param chunk_size: Number of rows read from the file at once.
+        :param fingerprint: The fingerprint of the content of the file, see get_fingerprint.
+        """
+        self.name = file.name
+        self.file_path = getattr(file, 'file_path', None)
+        self._content = None if self.file_path else file.getvalue()  # Kept only for uploads without a path
+        self.fingerprint = fingerprint
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.chunk_size = chunk_size
+        self.engine, self._quoting = CSV_READ_ATTEMPTS[0]  # Parser settings, replaced if the file is malformed
+        self._length = None  # Number of rows, known once the file was read completely
+        self._columns = None  # Names of the columns, read from the header on the first use
+
+    def __iter__(self):
+        """
+        Yields the rows of the CSV file as dictionaries, reading the file chunk by chunk.
+        """
+        length = 0
+        for chunk in self._read_chunks():
+            length += len(chunk)
+            yield from chunk.to_dict('records')
+        self._length = length
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows in the CSV file without keeping the rows in memory.
+        """
+        if self._length is None:
+            self._length = sum(len(chunk) for chunk in self._read_chunks())
+        return self._length
+
+    @property
+    def columns(self) -> list:
+        """
+        The names of the columns, read from the header of the file.
+        """
+        if self._columns is None:
+            import pandas as pd
+
+            self._columns = list(pd.read_csv(self._get_source(), dtype=str, sep=self.delimiter, engine=self.engine,
+                                             encoding=self.encoding, quoting=self._quoting, nrows=0).columns)
+        return self._columns
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r})"
+
+    def _read_chunks(self):
+        """
+        Yields the CSV file as pandas DataFrames having at most chunk_size rows. If the file is malformed, the next
+        parser settings of CSV_READ_ATTEMPTS are used (same fallbacks as for eagerly loaded CSV files) and kept for the
+        next reads. The rows already yielded with the previous settings are skipped.
+        """
+        import pandas as pd
+
+        yielded = 0  # Number of rows yielded so far
+        attempt = CSV_READ_ATTEMPTS.index((self.engine, self._quoting)) + 1
+        while True:
+            try:
+                position = 0  # Number of rows read with the current settings
+                with pd.read_csv(self._get_source(), dtype=str, sep=self.delimiter, engine=self.engine,
+                                 encoding=self.encoding, quoting=self._quoting, chunksize=self.chunk_size) as reader:
+                    for chunk in reader:
+                        skipped = min(max(yielded - position, 0), len(chunk))
+                        position += len(chunk)
+                        if skipped < len(chunk):
+                            yielded += len(chunk) - skipped
+                            yield chunk.iloc[skipped:].fillna('')
+                return
+            except (pd.errors.ParserError, csv.Error) as e:  # The python engine reading chunks raises csv.Error
+                if attempt == len(CSV_READ_ATTEMPTS):
+                    raise
+                logger.warning("Falling back from the %s engine for '%s': %s", self.engine, self.name, e)
+                self.engine, self._quoting = CSV_READ_ATTEMPTS[attempt]
+                attempt += 1
+
+    def _get_source(self):
+        """
+        Returns the path of the file on the disk, or a stream of the content of the uploaded file.
+        """
+        return self.file_path or io.BytesIO(self._content)
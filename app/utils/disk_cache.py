@@ -0,0 +1,140 @@
+"""
+This module provides a size-bounded key-value cache stored on the disk, used by the persistent caches of JinjaXcat.
+Every entry is a file named after the hash of its key. When the total size of the entries exceeds the limit,
+the least recently used entries are evicted. The total size is tracked on every write and the directory is only
+scanned when the limit is exceeded (the entries are then evicted down to EVICTION_TARGET of the limit, so a full cache
+is not scanned on every write) and every RESCAN_INTERVAL writes, to account for the entries written by other processes.
+The entries are written readable by the owner only (the directories are created by get_cache_dir, also private).
+"""
+
+# Standard library imports
+import hashlib
+import os
+import tempfile
+import threading
+
+TEMPORARY_SUFFIX = '.tmp'  # Suffix of the files being written, they are not entries of the cache yet
+EVICTION_TARGET = 0.9  # Share of the limit down to which the entries are evicted once the limit is exceeded
+RESCAN_INTERVAL = 1000  # Number of writes after which the total size of the entries is scanned again
+
+
+class DiskCache:
+    """
+    A key-value cache of bytes stored in a directory. Entries are written atomically, so the cache can be shared
+    by several threads and processes. The modification time of an entry is its last use.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        :param directory: The directory storing the entries.
+        :param max_bytes: Maximum total size of the entries in bytes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Total size of the entries, scanned on the first write and then tracked
+        self._writes = 0  # Number of writes since the last scan
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Returns the value stored under the key and marks the entry as recently used.
+
+        :param key: The key of the entry.
+        :return: The stored value, or None if there is no such entry.
+        """
+        path = self._get_path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = file.read()
+            os.utime(path)  # Mark the entry as recently used
+        except OSError:
+            return None
+        return value
+
+    def set(self, key: str, value: bytes):
+        """
+        Stores the value under the key and evicts the least recently used entries if the cache is too big.
+        Values bigger than the whole cache are not stored.
+
+        :param key: The key of the entry.
+        :param value: The value to store.
+        """
+        if len(value) > self.max_bytes:
+            return
+        path = self._get_path(key)
+        try:
+            replaced_size = os.stat(path).st_size
+        except OSError:
+            replaced_size = 0
+        try:
+            # The temporary file is created readable by the owner only
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=TEMPORARY_SUFFIX)
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(value)
+            os.replace(temporary_path, path)  # Readers never see a partially written entry
+        except OSError:
+            return  # The cache is an optimization only, a failing disk must not break the caller
+        with self._lock:
+            self._writes += 1
+            if self._size is None or self._writes >= RESCAN_INTERVAL:
+                self._size, self._writes = sum(size for _, size, _ in self._scan()), 0
+            else:
+                self._size += len(value) - replaced_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def touch(self, key: str):
+        """
+        Marks the entry stored under the key as recently used.
+        """
+        try:
+            os.utime(self._get_path(key))
+        except OSError:
+            pass
+
+    def delete(self, key: str):
+        """
+        Removes the entry stored under the key, if there is any.
+        """
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+    def _get_path(self, key: str) -> str:
+        """
+        Returns the path of the file storing the entry of the key.
+        """
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def _scan(self) -> list:
+        """
+        Returns the entries of the directory as tuples (modification time, size, path).
+        """
+        entries = []
+        with os.scandir(self.directory) as scanner:
+            for entry in scanner:
+                if entry.is_file() and not entry.name.endswith(TEMPORARY_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:  # Removed by another process in the meantime
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the total size of the entries is within EVICTION_TARGET of the
+        limit.
+        """
+        entries = self._scan()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes * EVICTION_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+        self._size, self._writes = total_size, 0
@@ -0,0 +1,138 @@
+"""
+This module provides the encoding detection used for the text-based input and template files of JinjaXcat.
+Instead of running chardet over the entire content, only a bounded sample of the content is inspected
+and the results are cached by the hash of the content.
+"""
+
+# Standard library imports
+import codecs
+import hashlib
+import re
+import threading
+
+# Third party imports
+import cachetools
+
+# Local application/library specific imports
+from .profiler import profile_phase
+
+ENCODING_SAMPLE_SIZE = 64 * 1024  # Number of bytes inspected at the beginning of the content
+ENCODING_PROBE_SIZE = 16 * 1024  # Number of bytes inspected in the middle and at the end of the content
+ENCODING_CACHE_SIZE = 256  # Maximum number of detected encodings kept in the cache
+
+# Byte order marks, UTF-32 goes first because its little endian BOM starts with the UTF-16 little endian BOM
+BOMS = (
+    (codecs.BOM_UTF8, 'UTF-8-SIG'),
+    (codecs.BOM_UTF32_LE, 'UTF-32'),
+    (codecs.BOM_UTF32_BE, 'UTF-32'),
+    (codecs.BOM_UTF16_LE, 'UTF-16'),
+    (codecs.BOM_UTF16_BE, 'UTF-16'),
+)
+
+_NON_ASCII_BYTE = re.compile(rb'[\x80-\xff]')
+
+_encoding_cache = cachetools.LRUCache(maxsize=ENCODING_CACHE_SIZE)
+_encoding_cache_lock = threading.Lock()
+
+
+def get_file_encoding(file, bytes_object: bytes) -> str | None:
+    """
+    Returns the encoding of a file. The encoding declared on the file object (e.g. in the YAML configuration
+    of the CLI) takes precedence, otherwise the encoding is detected from the content.
+
+    :param file: The uploaded file, optionally having an encoding attribute.
+    :param bytes_object: The content of the file.
+    :return: Name of the encoding.
+    """
+    declared_encoding = getattr(file, 'encoding', None)
+    if declared_encoding:
+        return declared_encoding
+    with profile_phase('detect encoding', getattr(file, 'name', None)):
+        return detect_encoding(bytes_object)
+
+
+def detect_encoding(bytes_object: bytes) -> str | None:
+    """
+    Detects the encoding of the content. The results are cached by the hash of the content.
+
+    :param bytes_object: The content whose encoding should be detected.
+    :return: Name of the encoding, or None if the encoding could not be detected.
+    """
+    key = hashlib.blake2b(bytes_object, digest_size=16).digest()
+    with _encoding_cache_lock:
+        encoding = _encoding_cache.get(key)
+    if encoding is None:
+        encoding = _detect_encoding(bytes_object)
+        with _encoding_cache_lock:
+            _encoding_cache[key] = encoding
+    return encoding
+
+
+def _detect_encoding(bytes_object: bytes) -> str | None:
+    """
+    Detects the encoding of the content using a bounded sample of it.
+    Byte order marks and valid UTF-8 are recognized right away, chardet is used only for the other encodings.
+
+    :param bytes_object: The content whose encoding should be detected.
+    :return: Name of the encoding, or None if the encoding could not be detected.
+    """
+    # Content starting with a byte order mark needs no further inspection
+    for bom, encoding in BOMS:
+        if bytes_object.startswith(bom):
+            return encoding
+
+    samples = _get_samples(bytes_object)
+    if not any(_NON_ASCII_BYTE.search(sample) for sample in samples):
+        # The samples are plain ASCII, so inspect the first non-ASCII part of the content (if there is any)
+        match = _NON_ASCII_BYTE.search(bytes_object)
+        if not match:
+            return 'ascii'
+        start = max(match.start() - ENCODING_PROBE_SIZE // 2, 0)
+        samples = [_skip_continuation_bytes(bytes_object[start:start + ENCODING_PROBE_SIZE], start)]
+
+    # Valid non-ASCII UTF-8 is very unlikely to appear in content having any other encoding
+    if all(_is_utf8(sample) for sample in samples):
+        return 'utf-8'
+
+    import chardet  # Imported only when needed, as it takes a while to import
+
+    return chardet.detect(b'\n'.join(samples))['encoding']
+
+
+def _get_samples(bytes_object: bytes) -> list:
+    """
+    Returns the beginning of the content, and for large contents also a probe from its middle and its end.
+    """
+    if len(bytes_object) <= ENCODING_SAMPLE_SIZE + 2 * ENCODING_PROBE_SIZE:
+        return [bytes_object]
+    middle = (len(bytes_object) - ENCODING_PROBE_SIZE) // 2
+    tail = len(bytes_object) - ENCODING_PROBE_SIZE
+    return [
+        bytes_object[:ENCODING_SAMPLE_SIZE],
+        _skip_continuation_bytes(bytes_object[middle:middle + ENCODING_PROBE_SIZE], middle),
+        _skip_continuation_bytes(bytes_object[tail:], tail),
+    ]
+
+
+def _skip_continuation_bytes(sample: bytes, offset: int) -> bytes:
+    """
+    Removes UTF-8 continuation bytes from the beginning of a sample taken from the middle of the content,
+    so that a character cut in half by the sampling is not mistaken for invalid UTF-8.
+    """
+    if offset == 0:
+        return sample
+    index = 0
+    while index < min(3, len(sample)) and 0x80 <= sample[index] <= 0xBF:
+        index += 1
+    return sample[index:]
+
+
+def _is_utf8(sample: bytes) -> bool:
+    """
+    Checks whether the sample is valid UTF-8. A character cut in half at the end of the sample is tolerated.
+    """
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
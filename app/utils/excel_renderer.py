@@ -0,0 +1,121 @@
+"""
+This module provides the rendering engine for Excel (.xlsx) templates of JinjaXcat.
+Every cell starting with '{' is a Jinja2 template. Its rendered output is split by the {{split}} separator ('##')
+and the values are written to the cell and the cells below it, numbers being converted to numeric cell values.
+"""
+
+# Standard library imports
+import io
+import math
+import re
+
+# Local application/library specific imports
+from .jinja_environment import get_template
+
+SPLIT_SEPARATOR = '##'  # Separator of the values rendered by a template cell, available in templates as {{split}}
+
+# Numbers recognized in the rendered values, following the rules of pandas.to_numeric used previously
+_WHITESPACE = '[ \t\n\r\f\v]*'
+_INTEGER = re.compile(rf'{_WHITESPACE}[+-]?[0-9]+{_WHITESPACE}')
+_FLOAT = re.compile(rf'{_WHITESPACE}[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?{_WHITESPACE}')
+_INFINITY = re.compile(r'[+-]?inf(inity)?', re.IGNORECASE)
+_INTEGER_RANGE = range(-2 ** 63, 2 ** 64)  # Integers out of the int64/uint64 range are kept as strings
+
+
+def render_workbook(template_bytes: bytes, data_dict: dict) -> bytes:
+    """
+    Renders an Excel template. Templated cells are searched in the whole used range of every sheet,
+    each distinct cell template is compiled and rendered only once, and the values are converted in bulk.
+
+    :param template_bytes: The content of the Excel template.
+    :param data_dict: Dictionary with the data available in the templates.
+    :return: The content of the rendered Excel file.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filename=io.BytesIO(template_bytes))  # Load the workbook from the byte data
+    template_cells = {sheet.title: _find_template_cells(sheet) for sheet in workbook.worksheets}
+
+    # Render every distinct cell template once, all of them against the same data
+    sources = {source for cells in template_cells.values() for _, _, source in cells}
+    rendered_values = {source: convert_values(get_template(source).render(**data_dict).split(SPLIT_SEPARATOR))
+                       for source in sources}
+
+    for sheet in workbook.worksheets:
+        written = set()  # Coordinates of the cells already overwritten by rendered values
+        for row, column, source in template_cells[sheet.title]:
+            if (row, column) in written:  # The template was overwritten by the values of a template above it
+                continue
+            # Write the output values to the template cell and the subsequent cells in the same column
+            for i, value in enumerate(rendered_values[source]):
+                sheet.cell(row=row + i, column=column).value = value
+                written.add((row + i, column))
+
+    output_bytes = io.BytesIO()  # Create a BytesIO object to store the output data
+    workbook.save(output_bytes)  # Save the workbook to the BytesIO object
+    return output_bytes.getvalue()  # Return the byte representation of the Excel file
+
+
+def get_template_sources(template_bytes: bytes) -> set:
+    """
+    Returns the distinct Jinja2 templates of the cells of an Excel template.
+
+    :param template_bytes: The content of the Excel template.
+    :return: Set of the template sources.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filename=io.BytesIO(template_bytes))
+    return {source for sheet in workbook.worksheets for _, _, source in _find_template_cells(sheet)}
+
+
+def _find_template_cells(sheet) -> list:
+    """
+    Returns the cells containing a Jinja2 template (a string starting with '{'), in row by row order.
+    Only the used range of the sheet (from its first to its last used row and column) is inspected.
+
+    :param sheet: The openpyxl worksheet.
+    :return: List of tuples (row, column, template source).
+    """
+    template_cells = []
+    rows = sheet.iter_rows(min_row=sheet.min_row, min_col=sheet.min_column, values_only=True)
+    for row, values in enumerate(rows, start=sheet.min_row):
+        for column, value in enumerate(values, start=sheet.min_column):
+            if isinstance(value, str) and value.startswith('{'):
+                template_cells.append((row, column, value.replace('}\n', '}')))  # Erase redundant newlines
+    return template_cells
+
+
+def convert_values(values: list) -> list:
+    """
+    Converts the rendered string values to numbers where possible. Same as in a pandas Series, if all values are
+    numeric and some of them are floats, all the values are converted to floats.
+
+    :param values: List of rendered string values.
+    :return: List of converted values.
+    """
+    converted = [to_number(value) for value in values]
+    if all(isinstance(value, int | float) for value in converted):
+        if any(isinstance(value, float) for value in converted):
+            converted = [float(value) for value in converted]
+    return converted
+
+
+def to_number(value: str) -> int | float | str:
+    """
+    Converts a string to an integer or a float, if it represents a number. An empty string is converted to NaN.
+
+    :param value: The string to convert.
+    :return: The converted number, or the original string if it does not represent a number.
+    """
+    if value == '':
+        return math.nan
+    if _INTEGER.fullmatch(value):
+        number = int(value)
+        return number if number in _INTEGER_RANGE else value
+    if _FLOAT.fullmatch(value):
+        number = float(value)
+        return value if math.isinf(number) else number  # Keep out-of-range numbers as strings
+    if _INFINITY.fullmatch(value):
+        return float(value)
+    return value
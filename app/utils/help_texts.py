@@ -38,4 +38,9 @@ help_dict = {
         The optional 'Beautify Output' feature allows you to prettify XML files, making them visually more appealing and easier to read.
         When enabled, the output files will be formatted with indentation, line breaks, and proper spacing, resulting in a cleaner and more organized structure..
         """,
+    "preview_output":
+        """
+        Renders a quick preview of the output from the first records of every input file, so changes of the template can be checked in seconds even for big input files.
+        The preview is neither validated nor offered for download, use the 'Generate Output' button to generate the whole output.
+        """,
 }
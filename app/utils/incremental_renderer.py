@@ -0,0 +1,140 @@
+"""
+This module provides the incremental rendering of text-based templates. The fragments rendered for the rows of a data
+source (e.g. the ARTICLE elements of the articles) are kept in a state file together with the fingerprints of the rows.
+The next render re-renders only the fragments of the new and changed rows and splices the kept fragments of the other
+rows into the output, which is identical to a full render.
+
+The fragments are reused only if the template, the Jinja2 extensions and all the other data sources are unchanged, so
+a fragment must depend only on its row and on the other data sources (not e.g. on the current date).
+The new state is returned with the output and written by save_state once the output was written, so the next render
+of a failed run (e.g. an invalid output) renders the same rows again.
+The new, changed and deleted rows are also returned, to render a delta document (e.g. a BMEcat T_UPDATE_PRODUCTS).
+"""
+
+# Standard library imports
+import logging
+import os
+import pickle
+import tempfile
+from collections import namedtuple
+
+# Local application/library specific imports
+from .data_sources import compute_fingerprint, get_fingerprint
+from .jinja_environment import get_extensions_fingerprint
+from .parallel_renderer import ShardedTemplate, get_loop_rows
+
+STATE_VERSION = '1'  # Version of the format of the state files, states of other versions are not reused
+
+logger = logging.getLogger(__name__)
+
+# The rows that are new or changed since the previous render, and the keys of the deleted rows
+Delta = namedtuple('Delta', ['new', 'changed', 'deleted'])
+
+
+def render_incremental(template_source: str, data: dict, loop_source: str, record_key: str,
+                       state_path: str) -> tuple:
+    """
+    Renders the template, re-rendering only the fragments of the rows of the data source that changed since the
+    previous render. The state file is not updated, the returned state is written by save_state.
+
+    :param template_source: Source code of the template.
+    :param data: Dictionary of the data sources passed to the template.
+    :param loop_source: Name of the data source whose top-level loops are rendered row by row, e.g. articles_csv.
+    :param record_key: The column identifying the rows of the data source, e.g. SUPPLIER_AID.
+    :param state_path: Path to the state file written by the previous render, if any.
+    :return: Tuple (output, Delta, state) with the rendered output, the changes since the previous render and the new
+             state to be saved once the output is written.
+    """
+    sharded_template = ShardedTemplate(template_source, loop_source)
+    if not sharded_template.loops:
+        raise ValueError(f"The loops over {loop_source} rendered incrementally must not be nested in other blocks.")
+    rows = get_loop_rows(data, loop_source)
+    keys = _get_record_keys(rows, record_key)
+    record_fingerprints = [get_fingerprint(dict(row)) for row in rows]
+    context = compute_fingerprint(STATE_VERSION, template_source, loop_source, record_key, get_extensions_fingerprint(),
+                                  *(f'{name}={get_fingerprint(value)}' for name, value in sorted(data.items())
+                                    if name != loop_source))
+
+    state = _load_state(state_path)
+    previous_records = state['records'] if state else {}
+    reusable = state is not None and state['context'] == context
+
+    # Render the fragments of the rows which are new or changed (all the rows, if the template or the data changed)
+    rendered = [i for i, (key, fingerprint) in enumerate(zip(keys, record_fingerprints))
+                if not reusable or previous_records.get(key, (None,))[0] != fingerprint]
+    if rendered:
+        rendered_fragments = sharded_template.render_records(data, [rows[i] for i in rendered])
+        rendered_fragments = dict(zip(rendered, zip(*rendered_fragments)))  # {row index: fragments of the loops}
+    else:
+        rendered_fragments = {}
+    logger.info(f"Incremental render of {loop_source}: {len(rendered)} of {len(rows)} rows rendered")
+
+    fragments = [rendered_fragments[i] if i in rendered_fragments else previous_records[key][1]
+                 for i, key in enumerate(keys)]
+    output = sharded_template.insert_loops(sharded_template.render_main(data),
+                                           [''.join(row_fragments[j] for row_fragments in fragments)
+                                            for j in range(len(sharded_template.loops))])
+
+    new_state = {
+        'version': STATE_VERSION,
+        'context': context,
+        'records': {key: (fingerprint, tuple(row_fragments))
+                    for key, fingerprint, row_fragments in zip(keys, record_fingerprints, fragments)},
+    }
+
+    current_keys = set(keys)
+    delta = Delta(
+        new=[row for row, key in zip(rows, keys) if key not in previous_records],
+        changed=[row for row, key, fingerprint in zip(rows, keys, record_fingerprints)
+                 if key in previous_records and previous_records[key][0] != fingerprint],
+        deleted=[key for key in previous_records if key not in current_keys],
+    )
+    return output, delta, new_state
+
+
+def _get_record_keys(rows, record_key: str) -> list:
+    """
+    Returns the keys of the rows, which must be unique.
+    """
+    try:
+        keys = [row[record_key] for row in rows]
+    except KeyError:
+        raise ValueError(f"The rows rendered incrementally have no column {record_key}.") from None
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"The values of the column {record_key} identifying the rows rendered incrementally must be "
+                         f"unique.")
+    return keys
+
+
+def _load_state(state_path: str) -> dict | None:
+    """
+    Loads the state file of the previous render, returns None if there is no usable state.
+    """
+    try:
+        with open(state_path, 'rb') as file:
+            state = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # A damaged state only means that everything is rendered again
+        logger.warning(f"The state file {state_path} can not be loaded, rendering all the rows: {e}")
+        return None
+    return state if isinstance(state, dict) and state.get('version') == STATE_VERSION else None
+
+
+def save_state(state_path: str, state: dict):
+    """
+    Writes the state file atomically, so an interrupted render never leaves a damaged state behind.
+
+    :param state_path: Path to the state file.
+    :param state: The state returned by render_incremental.
+    """
+    directory = os.path.dirname(os.path.abspath(state_path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, state_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
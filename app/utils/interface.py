@@ -1,4 +1,5 @@
 import io
+import json
 import os
 
 import pandas as pd
@@ -6,35 +7,63 @@ import streamlit as st
 from lxml import etree
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
+from .artifact_cache import get_artifact, get_files_key
 from .help_texts import help_dict
-from .procesor import generate_output, load_data, prettify_output, validate_xml
+from .procesor import (
+    generate_output,
+    generate_preview,
+    get_preview_max_rows,
+    load_data,
+    prettify_output,
+    validate_xml,
+)
 
 MAX_OUTPUT_ERRORS = 100  # Sets the limit for the number of XSD/DTD validation errors displayed in the XML report
+PREVIEW_CHAR_LIMIT = 35000  # Maximum number of text characters to be displayed in output previews
 EXCEL_PREVIEW_ROW_LIMIT = 250  # Maximum number of rows to be displayed in an Excel file preview
 
 
-@st.cache_data(show_spinner="Preparing data...")
 def load_data_cached(input_files):
     """
-    Caches and returns the data loaded from the provided input files.
+    Returns the data loaded from the provided input files, kept in the artifact cache shared by all sessions.
 
     :param input_files: List of paths to the input files.
     :return: A dictionary mapping from file names to their loaded data.
     """
-    return load_data(input_files)
+    with st.spinner("Preparing data..."):
+        return get_artifact('data', [get_files_key(input_files)], lambda: load_data(input_files))
+
+
+def load_preview_data_cached(input_files, template_file, key_mapping):
+    """
+    Returns the data of a preview of the template: the first records of the CSV files the template loops over and
+    the other input files whole, kept in the artifact cache shared by all sessions.
+
+    :param input_files: List of paths to the input files.
+    :param template_file: Path to the template file.
+    :param key_mapping: Dictionary mapping from variable names to their values, for use in the template.
+    :return: A dictionary mapping from file names to their loaded data.
+    """
+    max_rows = get_preview_max_rows(template_file, key_mapping)
+    with st.spinner("Preparing data..."):
+        key_parts = [get_files_key(input_files), json.dumps(max_rows, sort_keys=True)]
+        return get_artifact('preview_data', key_parts, lambda: load_data(input_files, max_rows=max_rows))
 
 
-@st.cache_data(show_spinner="Generating output...")
 def generate_output_cached(input_files, template_file, key_mapping):
     """
-    Caches and returns the output generated from the provided input files and template file.
+    Returns the output generated from the provided input files and template file, kept in memory for a short time by
+    the artifact cache shared by all sessions. The output is rendered from the cached data of the input files.
 
     :param input_files: List of paths to the input files.
     :param template_file: Path to the template file.
     :param key_mapping: Dictionary mapping from variable names to their values, for use in the template.
     :return: The generated output as a string.
     """
-    return generate_output(input_files, template_file, key_mapping)
+    with st.spinner("Generating output..."):
+        key_parts = [get_files_key(input_files), get_files_key([template_file]), json.dumps(key_mapping, sort_keys=True)]
+        return get_artifact('output', key_parts, lambda: generate_output(
+            input_files, template_file, key_mapping, input_data=load_data_cached(input_files)), persistent=False)
 
 
 @st.cache_data
@@ -72,7 +101,8 @@ def display_input_files(input_files):
         if file_type.lower() in ['json', 'rest']:
             st.json(data)
         else:
-            st.dataframe(pd.DataFrame(data), use_container_width=True)
+            st.dataframe(data.to_dataframe() if hasattr(data, 'to_dataframe') else pd.DataFrame(data),
+                         use_container_width=True)
         dict_key_mapping[name] = changed_filename
 
 
@@ -220,25 +250,54 @@ def run_output_procedure(input_files, template_file, output_filename, validation
     prettified_status = None
     validation_status = None
 
-    st.session_state['output_state'] = (None, None, None, beautify_output, False)
+    st.session_state['output_state'] = (None, None, None, beautify_output, False, None)
     if not output_filename: output_filename = "output"  # noqa
     extension = template_file.name[template_file.name.rfind("."):]
 
     output = generate_output_cached(input_files, template_file, st.session_state['key_mapping'])
 
     if beautify_output:
-        prettified_output = prettify_output(output, extension)
-        if prettified_output:
-            output = prettified_output
+        try:
+            output = prettify_output(output, extension)
             prettified_status = True
+        except ValueError as e:  # The original output is kept and the error is displayed
+            prettified_status = str(e)
     if validation_file:
         validation_status = validate_xml(output.encode(), validation_file, MAX_OUTPUT_ERRORS)
 
     st.session_state['menu_index'] = "Output"
-    st.session_state['output_state'] = (output, extension, validation_status, beautify_output, prettified_status)
+    st.session_state['output_state'] = (output, extension, validation_status, beautify_output, prettified_status, None)
 
     st.download_button(
         label=f"Download as {output_filename}{extension}",
         data=output,
         file_name=output_filename + extension,
         use_container_width=True)
+
+
+def run_preview_procedure(input_files, template_file, beautify_output):
+    """
+    Renders a preview of the output with the first records of the looped input files only, and stops rendering once the
+    characters displayed in the Output tab are rendered, so changes of the template can be checked in seconds even for
+    big input files. The whole output is generated by run_output_procedure, for the download.
+
+    :param input_files: List of input files that hold the data to be processed.
+    :param template_file: File that provides the template for processing the input data.
+    :param beautify_output: Boolean indicating whether the preview should be beautified.
+    """
+    extension = template_file.name[template_file.name.rfind("."):]
+    prettified_status = True if beautify_output else None
+    with st.spinner("Rendering preview..."):
+        input_data = load_preview_data_cached(input_files, template_file, st.session_state['key_mapping'])
+        try:
+            preview, complete = generate_preview(input_files, template_file, st.session_state['key_mapping'],
+                                                 PREVIEW_CHAR_LIMIT, beautify=beautify_output, input_data=input_data)
+        except ValueError as e:  # The preview could not be beautified, so the original preview is displayed
+            if not beautify_output:
+                raise
+            prettified_status = str(e)
+            preview, complete = generate_preview(input_files, template_file, st.session_state['key_mapping'],
+                                                 PREVIEW_CHAR_LIMIT, input_data=input_data)
+
+    st.session_state['menu_index'] = "Output"
+    st.session_state['output_state'] = (preview, extension, None, beautify_output, prettified_status, complete)
@@ -1,10 +1,87 @@
+import functools
+import hashlib
 import importlib
 import inspect
 import os
+import threading
+from collections.abc import Mapping, Sequence
 
-from jinja2 import FileSystemLoader
+import cachetools
+from jinja2 import (
+    BaseLoader,
+    BytecodeCache,
+    ChoiceLoader,
+    FileSystemLoader,
+    Template,
+)
+from jinja2.exceptions import TemplateNotFound
 from jinja2.sandbox import SandboxedEnvironment
 
+from .cache_dir import get_cache_dir
+from .disk_cache import DiskCache
+from .profiler import profile_phase
+from .signing import get_signing_key, sign, verify
+
+TEMPLATE_CACHE_SIZE = 400  # Maximum number of compiled templates kept in memory by the shared environment
+BYTECODE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Maximum size of the compiled templates kept on the disk
+# Directory containing the Jinja2 extension modules
+EXTENSIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jinja_extensions')
+
+
+class TemplateSourceLoader(BaseLoader):
+    """
+    A Jinja2 loader serving template sources registered in memory under the hash of their content.
+    It allows templates created from strings to use the template and bytecode caches of the environment.
+    """
+
+    def __init__(self, maxsize: int = TEMPLATE_CACHE_SIZE):
+        self.sources = cachetools.LRUCache(maxsize=maxsize)
+
+    def register(self, source: str) -> str:
+        """
+        Registers a template source and returns the name under which it can be loaded.
+        :param source: Source code of the template.
+        :return: Name of the template, derived from the hash of its source.
+        """
+        name = f"source-{hashlib.sha256(source.encode()).hexdigest()}"
+        self.sources[name] = source
+        return name
+
+    def get_source(self, environment, template):
+        if template not in self.sources:
+            raise TemplateNotFound(template)
+        return self.sources[template], None, lambda: True  # The source of a given name never changes
+
+
+class DiskBytecodeCache(BytecodeCache):
+    """
+    A Jinja2 bytecode cache storing the compiled templates in a DiskCache, so the least recently used templates are
+    evicted once the cache exceeds its size (every edited template source is compiled to a new entry).
+    The entries are signed (see the signing module), the code of an entry whose signature does not match is never run.
+    """
+
+    def __init__(self, disk_cache: DiskCache):
+        self.disk_cache = disk_cache
+
+    def load_bytecode(self, bucket):
+        bytecode = verify(self.disk_cache.get(bucket.key))
+        if bytecode is not None:
+            bucket.bytecode_from_string(bytecode)  # Bytecode of another Python version is ignored by the bucket
+
+    def dump_bytecode(self, bucket):
+        self.disk_cache.set(bucket.key, sign(bucket.bytecode_to_string()))
+
+
+class ProfiledEnvironment(SandboxedEnvironment):
+    """
+    A sandboxed Jinja2 environment recording the compilation of the templates as a phase of the active profiler.
+    The templates found in the template cache or in the bytecode cache are not compiled, so they are not recorded.
+    """
+
+    def compile(self, source, name=None, filename=None, raw=False, defer_init=False):
+        with profile_phase('compile template'):
+            return super().compile(source, name, filename, raw, defer_init)
+
 
 def _load_jinja_extensions_from_directory(directory: str) -> dict:
     """
@@ -29,28 +106,91 @@ def _load_jinja_extensions_from_directory(directory: str) -> dict:
     return extensions
 
 
-def create_environment() -> SandboxedEnvironment:
+@functools.cache
+def get_extensions_fingerprint() -> str:
+    """
+    Returns the fingerprint of the source code of the Jinja2 extension modules, which changes when an extension is
+    added, removed or edited. The modules are loaded once per process, so the fingerprint is computed once as well.
+    :return: Hexadecimal digest of the names and the content of the modules.
+    """
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(EXTENSIONS_DIRECTORY)):
+        if filename.endswith('.py'):
+            with open(os.path.join(EXTENSIONS_DIRECTORY, filename), 'rb') as file:
+                digest.update(f"{filename}\0{len(content := file.read())}\0".encode() + content)
+    return digest.hexdigest()
+
+
+def create_environment(bytecode_cache: BytecodeCache | None = None) -> SandboxedEnvironment:
     """
     Create a custom Jinja2 environment.
+    :param bytecode_cache: Optional cache storing the compiled templates, e.g. on the disk.
     :return: SandboxedEnvironment object with custom filters and globals.
     """
-    env = SandboxedEnvironment(
+    env = ProfiledEnvironment(
         trim_blocks=True,
         lstrip_blocks=True,
         keep_trailing_newline=False,
         autoescape=True,
-        loader=FileSystemLoader(''),
+        loader=ChoiceLoader([TemplateSourceLoader(), FileSystemLoader('')]),
+        bytecode_cache=bytecode_cache,
+        cache_size=TEMPLATE_CACHE_SIZE,
     )
 
-    # Directory containing the Jinja2 extension modules
-    extensions_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jinja_extensions')
-
     # Load functions from the extensions directory
-    extensions = _load_jinja_extensions_from_directory(extensions_directory)
+    extensions = _load_jinja_extensions_from_directory(EXTENSIONS_DIRECTORY)
     env.filters.update(extensions)
     env.globals.update(extensions)
 
     # Add additional "static" globals
     env.globals['split'] = '##'  # This global variable stores the separator used for Excel templates
 
-    return env
\ No newline at end of file
+    # The rows of the tables are dictionary-like views, the tojson filter serializes them as dictionaries
+    env.policies['json.dumps_kwargs'] = {**env.policies['json.dumps_kwargs'], 'default': _to_json_compatible}
+
+    return env
+
+
+def _to_json_compatible(value):
+    """
+    Converts the mappings and sequences unknown to the json module (e.g. the rows of a RecordTable) to dictionaries
+    and lists.
+    """
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, Sequence):
+        return list(value)
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+@functools.cache
+def get_environment() -> SandboxedEnvironment:
+    """
+    Returns the process-wide Jinja2 environment, created on the first call.
+    Its compiled templates are kept in memory and in a bytecode cache on the disk, so they are shared across
+    renders, Streamlit sessions and CLI runs.
+    :return: The shared SandboxedEnvironment object.
+    """
+    with profile_phase('create environment'):
+        bytecode_cache_dir = get_cache_dir('bytecode')
+        # Without the signing key, the compiled templates can not be verified, so they are not cached on the disk
+        bytecode_cache = DiskBytecodeCache(DiskCache(bytecode_cache_dir, BYTECODE_CACHE_MAX_BYTES)) \
+            if bytecode_cache_dir and get_signing_key() else None
+        return create_environment(bytecode_cache=bytecode_cache)
+
+
+_template_lock = threading.Lock()
+
+
+def get_template(source: str) -> Template:
+    """
+    Returns the compiled template for the given source using the shared environment.
+    Templates with the same source are parsed and compiled only once per process, and their bytecode is reused
+    by subsequent processes.
+    :param source: Source code of the template.
+    :return: The compiled Template object.
+    """
+    environment = get_environment()
+    source_loader = environment.loader.loaders[0]
+    with _template_lock:  # Keep the registered source from being evicted before the template is loaded
+        return environment.get_template(source_loader.register(source))  # Compiled only if it is not cached yet
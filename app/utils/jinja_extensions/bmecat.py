@@ -1,4 +1,201 @@
-import pandas as pd
+"""
+This module provides the Jinja2 extensions for BMEcat catalogs. The category tree of a groups data source is indexed
+once (see CategoryTree) and the index is reused by all the calls made during a render. The cached indexes are keyed by
+the fingerprint of the data source and keep only the IDs of the groups, never their rows, so the data sources of a
+session can be freed while their indexes are cached.
+"""
+
+import threading
+from collections import defaultdict
+from collections.abc import Sequence
+
+import cachetools
+
+from ..data_sources import get_fingerprint
+
+CATEGORY_TREE_CACHE_SIZE = 8  # Maximum number of category tree indexes kept in memory
+
+_category_indexes = cachetools.LRUCache(maxsize=CATEGORY_TREE_CACHE_SIZE)
+_category_indexes_lock = threading.Lock()
+
+
+class _CategoryIndex:
+    """
+    The structure of a category tree, without the rows of the groups: the position of the row of every group,
+    the maps of the parents and the children, the BME hierarchy levels and the (lazily computed) closures.
+    """
+
+    def __init__(self, groups, GROUP_ID: str, PARENT_ID: str, CATALOG_STRUCTURE: str):
+        self.positions = {}  # Group ID -> position of the row of the group in the data source
+        self.parents = {}  # Group ID -> parent ID
+        self.structures = {}  # Group ID -> BME hierarchy level (e.g. 'root', 'node' or 'leaf')
+        self.children_map = defaultdict(list)  # Parent ID -> IDs of the child groups, in the order of the rows
+        self.leaf_ids = []  # IDs of the leaf groups, in the order of the rows (repeated IDs included)
+        for position, row in enumerate(groups):
+            group_id = row[GROUP_ID]
+            if row[CATALOG_STRUCTURE] == 'leaf':
+                self.leaf_ids.append(group_id)
+            if group_id not in self.positions:
+                self.positions[group_id] = position
+                self.parents[group_id] = row[PARENT_ID]
+                self.structures[group_id] = row[CATALOG_STRUCTURE]
+                self.children_map[row[PARENT_ID]].append(group_id)
+        self.ancestors = {}  # Group ID -> IDs of its ancestors, nearest first
+        self.climbs = {}  # Group ID -> parent IDs collected by get_groups_with_articles when climbing from the group
+        self.groups_with_articles = cachetools.LRUCache(maxsize=CATEGORY_TREE_CACHE_SIZE)
+
+
+class CategoryTree:
+    """
+    An index of the BME category tree stored in a groups data source, with maps of the parents and the children
+    of the groups and a (lazily computed) closure of their ancestors. If a group ID appears in several rows,
+    the first row is used.
+    """
+
+    def __init__(self, groups, GROUP_ID='GROUP_ID', PARENT_ID='PARENT_ID', CATALOG_STRUCTURE='CATALOG_STRUCTURE',
+                 index: _CategoryIndex | None = None):
+        """
+        :param groups: The records of the groups data source.
+        :param GROUP_ID: The column name for the group ID. Default - 'GROUP_ID'.
+        :param PARENT_ID: The column name for the parent ID. Default - 'PARENT_ID'.
+        :param CATALOG_STRUCTURE: The column name for the BME hierarchy level. Default - 'CATALOG_STRUCTURE'.
+        :param index: The index of the groups data source built before, see get_category_tree. Optional.
+        """
+        if index is None and not isinstance(groups, Sequence):
+            groups = list(groups)  # Iterated once more by topological_order
+        self.groups = groups  # The data source, only its rows returned by topological_order are read
+        self.index = index or _CategoryIndex(groups, GROUP_ID, PARENT_ID, CATALOG_STRUCTURE)
+
+    def children(self, group_id) -> list:
+        """
+        Returns the IDs of the child groups of a group, in the order of the rows.
+        Usage: {% for child_id in get_category_tree(groups_csv).children('1') %}
+        """
+        return list(self.index.children_map.get(group_id, []))
+
+    def descendants(self, group_id) -> list:
+        """
+        Returns the IDs of all the groups below a group, parents first (depth-first, in the order of the rows).
+        """
+        descendants, stack, seen = [], list(reversed(self.index.children_map.get(group_id, []))), {group_id}
+        while stack:
+            child_id = stack.pop()
+            if child_id in seen:
+                raise ValueError(f"The category tree contains a cycle at the group '{child_id}'")
+            seen.add(child_id)
+            descendants.append(child_id)
+            stack.extend(reversed(self.index.children_map.get(child_id, [])))
+        return descendants
+
+    def ancestors(self, group_id) -> list:
+        """
+        Returns the IDs of the groups above a group, nearest first (its parent, grandparent, ... up to the root).
+        Parent IDs that are not groups (e.g. the '0' parent of the root) are not included.
+        """
+        if group_id not in self.index.parents:
+            return []
+        # The closure ends with the parent ID of the topmost group, which is not a group itself
+        return list(self._get_closure(group_id, self.index.ancestors, self._next_ancestor)[:-1])
+
+    def topological_order(self) -> list:
+        """
+        Returns the rows of all the groups, every parent before its children (depth-first, in the order of the rows).
+        Usage: {% for group in get_category_tree(groups_csv).topological_order() %}
+        """
+        parents, positions = self.index.parents, self.index.positions
+        roots = [group_id for group_id, parent_id in parents.items() if parent_id not in parents]
+        ordered_ids = [group_id for root_id in roots for group_id in [root_id, *self.descendants(root_id)]]
+        if len(ordered_ids) != len(parents):
+            raise ValueError("The category tree contains a cycle, some groups are not reachable from a root group")
+        rows = self.groups if isinstance(self.groups, Sequence) else list(self.groups)
+        return [rows[positions[group_id]] for group_id in ordered_ids]
+
+    def groups_with_articles(self, articles, delimiter=',', CATALOG_GROUP_ID='CATALOG_GROUP_ID') -> list:
+        """
+        Returns the IDs of the leaf groups having articles and of the groups above them, see get_groups_with_articles.
+        The result is cached by the fingerprint of the articles data source.
+        """
+        key = (get_fingerprint(articles), delimiter, CATALOG_GROUP_ID)
+        cached = self.index.groups_with_articles.get(key)
+        if cached is None:
+            cached = tuple(self._get_groups_with_articles(articles, delimiter, CATALOG_GROUP_ID))
+            self.index.groups_with_articles[key] = cached
+        return list(cached)
+
+    def _get_groups_with_articles(self, articles, delimiter, CATALOG_GROUP_ID) -> list:
+        """
+        Computes the result of groups_with_articles, the parent IDs are collected in the same order as they were
+        by the original implementation, so the returned list is identical.
+        """
+        catalog_group_ids = {group_id for article in articles if isinstance(article.get(CATALOG_GROUP_ID), str)
+                             for group_id in article[CATALOG_GROUP_ID].split(delimiter)}
+        leaf_ids = [group_id for group_id in self.index.leaf_ids if group_id in catalog_group_ids]
+        parent_ids = set()
+        for group_id in leaf_ids:
+            for parent_id in self._get_closure(group_id, self.index.climbs, self._next_climb):
+                parent_ids.add(parent_id)
+        return list(parent_ids) + leaf_ids
+
+    def _next_ancestor(self, group_id) -> tuple:
+        """
+        Returns (parent ID, whether to continue with the parent) for the closure of the ancestors.
+        """
+        parent_id = self.index.parents[group_id]
+        return parent_id, parent_id in self.index.parents
+
+    def _next_climb(self, group_id) -> tuple:
+        """
+        Returns (parent ID, whether to continue with the parent) for the climb of get_groups_with_articles, which
+        includes the parent of the root group (usually '0') and stops at a group with the 'root' structure.
+        """
+        if group_id not in self.index.parents:
+            raise ValueError(f"The group '{group_id}' does not exist in the groups data source")
+        parent_id = self.index.parents[group_id]
+        stop = not parent_id or parent_id in [0, "0"] or self.index.structures[group_id] == 'root'
+        return parent_id, not stop
+
+    def _get_closure(self, group_id, closures: dict, next_step) -> tuple:
+        """
+        Returns the IDs collected by following next_step from the group. The closures of all the visited groups
+        are stored, so every group of the tree is visited only once.
+        """
+        path, visited = [], set()  # Groups whose closure is not known yet, each with the ID it adds
+        current_id, proceed = group_id, True
+        while proceed and current_id not in closures:
+            if current_id in visited:
+                raise ValueError(f"The category tree contains a cycle at the group '{current_id}'")
+            visited.add(current_id)
+            parent_id, proceed = next_step(current_id)
+            path.append((current_id, parent_id))
+            current_id = parent_id
+        closure = closures[current_id] if proceed else ()
+        for visited_id, parent_id in reversed(path):
+            closure = (parent_id, *closure)
+            closures[visited_id] = closure
+        return closures.get(group_id, ())
+
+
+def get_category_tree(groups, GROUP_ID='GROUP_ID', PARENT_ID='PARENT_ID',
+                      CATALOG_STRUCTURE='CATALOG_STRUCTURE') -> CategoryTree:
+    """
+    Returns the index of the category tree stored in the groups data source. The index is built once per data source
+    (identified by its fingerprint, see get_fingerprint) and reused by subsequent calls,
+    e.g. {% set tree = get_category_tree(groups_csv) %}.
+
+    :param groups: The records of the groups data source.
+    :param GROUP_ID: The column name for the group ID. Default - 'GROUP_ID'.
+    :param PARENT_ID: The column name for the parent ID. Default - 'PARENT_ID'.
+    :param CATALOG_STRUCTURE: The column name for the BME hierarchy level. Default - 'CATALOG_STRUCTURE'.
+    :return: The CategoryTree object.
+    """
+    key = (get_fingerprint(groups), GROUP_ID, PARENT_ID, CATALOG_STRUCTURE)
+    with _category_indexes_lock:
+        index = _category_indexes.get(key)
+        if index is None:
+            tree = CategoryTree(groups, GROUP_ID, PARENT_ID, CATALOG_STRUCTURE)
+            _category_indexes[key] = tree.index
+            return tree
+    return CategoryTree(groups, index=index)  # The rows are taken from the given data source
 
 
 def get_groups_with_articles(articles, groups, delimiter=',', CATALOG_STRUCTURE='CATALOG_STRUCTURE',
@@ -16,36 +213,9 @@ def get_groups_with_articles(articles, groups, delimiter=',', CATALOG_STRUCTURE=
     :param CATALOG_GROUP_ID: The column name for the catalog group within the articles df. Default - 'CATALOG_GROUP_ID'.
     :return: Set of group IDs associated with the given articles.
     """
-
-    # Convert raw data to pandas dataframes
-    groups_df = pd.DataFrame(groups)
-    articles_df = pd.DataFrame(articles)
-
-    # Extract and process catalog group IDs
-    group_ids = articles_df[CATALOG_GROUP_ID]
-    unique_catalog_group_ids = group_ids.str.split(delimiter).explode().unique()
-
-    # Identify leaf categories in groups data
-    leaf_categories = groups_df[
-        (groups_df[GROUP_ID].isin(unique_catalog_group_ids)) &
-        (groups_df[CATALOG_STRUCTURE] == 'leaf')]
-
-    # Convert GROUP_IDs of leaf categories to list
-    leaf_ids = leaf_categories[GROUP_ID].to_list()
-    # Identify parent categories of the leaf categories
-    parent_ids = set()
-    for group_id in leaf_ids:
-        while group_id:
-            matching_row = groups_df.loc[groups_df[GROUP_ID] == group_id]
-            group_id = matching_row[PARENT_ID].values[0]
-            structure = matching_row[CATALOG_STRUCTURE].values[0]
-            parent_ids.add(group_id)
-
-            if group_id in [0, "0"] or structure == "root":
-                break
-
-    groups_with_articles = list(parent_ids) + leaf_ids
-    return groups_with_articles
+    # The leaf groups having articles followed by the groups above them, using the index of the category tree
+    tree = get_category_tree(groups, GROUP_ID, PARENT_ID, CATALOG_STRUCTURE)
+    return tree.groups_with_articles(articles, delimiter, CATALOG_GROUP_ID)
 
 
 def float_bme(value: str) -> float | str:
@@ -3,15 +3,20 @@ This module provides decorators to enhance and customize the behavior of custom
 Currently, it offers caching functionalities using cachetools.
 """
 
+import threading
 
 import cachetools
+import cachetools.keys
+
+from ..data_sources import get_fingerprint
 
 
 def cached_input_files(maxsize=100):
     """
     A decorator to cache the results of functions (jinja2 extensions) used on input file data.
     This decorator utilizes an LRU (Least Recently Used) caching mechanism provided by cachetools.
-    It caches the result of the function based on the hashed input file data.
+    It caches the result of the function based on the fingerprint of the input file data, computed once when the
+    input file is loaded, so a cache hit does not depend on the size of the data. Nested data (e.g. JSON) is supported.
 
     :param maxsize: Maximum number of items to be stored in the cache. Defaults to 100.
     :return: A wrapped function with caching capabilities.
@@ -23,5 +28,29 @@ def cached_input_files(maxsize=100):
         # expensive computation
         return processed_data
     """
-    return cachetools.cached(cachetools.LRUCache(maxsize=maxsize),
-                             key=lambda data: hash(frozenset(tuple(d.items()) for d in data)))
+    if callable(maxsize):  # Used without parentheses (@cached_input_files), so maxsize is the decorated function
+        return cached_input_files()(maxsize)
+    return cachetools.cached(cachetools.LRUCache(maxsize=maxsize), key=_input_files_key, lock=threading.Lock())
+
+
+def _input_files_key(data, *args, **kwargs) -> tuple:
+    """
+    Returns the cache key of a call: the fingerprint of the data and the other arguments (data sources passed
+    as the other arguments are represented by their fingerprints too).
+    """
+    args = tuple(_argument_key(arg) for arg in args)
+    kwargs = {name: _argument_key(value) for name, value in kwargs.items()}
+    return cachetools.keys.hashkey(get_fingerprint(data), *args, **kwargs)
+
+
+def _argument_key(value):
+    """
+    Returns the fingerprint of a data source or of an unhashable value, otherwise the value itself.
+    """
+    if getattr(value, 'fingerprint', None):
+        return value.fingerprint
+    try:
+        hash(value)
+    except TypeError:
+        return get_fingerprint(value)
+    return value
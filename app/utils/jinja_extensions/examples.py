@@ -1,12 +1,9 @@
 import unicodedata
 from datetime import date, datetime
 
-import requests
-
+from .. import url_status
 from .decorators import cached_input_files
 
-# Third party imports
-
 
 def remove_accents(input_str: str) -> str:
     """
@@ -61,19 +58,29 @@ def log(message: str) -> str:
 
 def get_status_code(url: str) -> int | None:
     """
-    Get the HTTP status code of a web page.
+    Get the HTTP status code of a web page. The status codes are cached, so a URL checked recently (e.g. by
+    prefetch_status_codes) is not requested again.
 
     :param url: URL of a web page.
     :return: HTTP status code or None if the request fails.
     """
-    try:
-        response = requests.get(url)
-        return response.status_code
-    except:  # NOQA E722 *this serves as an example of how to create a custom function.
-        return None
+    return url_status.get_status_code(url)
+
+
+def prefetch_status_codes(data: list, column: str) -> str:
+    """
+    Checks the URLs of a data column concurrently, so that the following get_status_code calls are only lookups.
+    Usage: {{ prefetch_status_codes(articles_csv, 'MIME_SOURCE') }} before the loop over the articles.
+
+    :param data: List of records, e.g. the rows of a CSV input file.
+    :param column: Name of the column containing the URLs.
+    :return: Empty string.
+    """
+    url_status.check_urls(record.get(column) for record in data)
+    return ''
 
 
-@cached_input_files
+@cached_input_files()
 def remove_inactive_products(data: list) -> list:
     """
     This method removes inactive products from the given list of data records.
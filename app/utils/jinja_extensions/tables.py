@@ -0,0 +1,82 @@
+"""
+This module provides the Jinja2 extensions linking the rows of data sources, e.g. articles to their groups, prices or
+features. They are backed by hash indexes built once per data source (see utils/record_index.py), so a template
+joining two data sources stays linear in their size instead of nesting loops over them. The indexes are shared and
+read-only. Data created in a template is identified by its content, so index it once with index_by or group_by instead
+of calling lookup on it in a loop.
+"""
+
+from collections.abc import Mapping
+
+from .. import record_index
+
+
+def index_by(data, column) -> Mapping:
+    """
+    Indexes the rows of a data source by the values of a column. If a value appears in several rows, the first row
+    is indexed.
+    Usage: {% set groups = index_by(groups_csv, 'GROUP_ID') %} ... {{ groups[article['CATALOG_GROUP_ID']]['GROUP_NAME'] }}
+
+    :param data: The data source, e.g. groups_csv.
+    :param column: The indexed column.
+    :return: Read-only mapping of the values of the column to the rows.
+    """
+    return record_index.get_unique_index(data, column)
+
+
+def lookup(data, column, value, default=None):
+    """
+    Returns the first row of a data source having the value in a column.
+    Usage: {% set price = lookup(prices_csv, 'SUPPLIER_AID', article['SUPPLIER_AID']) %}
+
+    :param data: The data source, e.g. prices_csv.
+    :param column: The searched column.
+    :param value: The searched value.
+    :param default: The value returned if no row has the value. Default - None.
+    :return: The first matching row, or the default value.
+    """
+    return record_index.get_unique_index(data, column).get(value, default)
+
+
+def lookup_all(data, column, value) -> list:
+    """
+    Returns all the rows of a data source having the value in a column, in their original order.
+    Usage: {% for feature in lookup_all(features_csv, 'SUPPLIER_AID', article['SUPPLIER_AID']) %}
+
+    :param data: The data source, e.g. features_csv.
+    :param column: The searched column.
+    :param value: The searched value.
+    :return: List of the matching rows, empty if no row has the value.
+    """
+    return list(record_index.get_group_index(data, column).get(value, ()))
+
+
+def group_by(data, column, delimiter=None) -> Mapping:
+    """
+    Groups the rows of a data source by the values of a column. Unlike the built-in groupby filter, the groups keep
+    the original order of the rows and are looked up by their value.
+    Usage: {% set articles_by_group = group_by(articles_csv, 'CATALOG_GROUP_ID', ',') %}
+           {% for article in articles_by_group.get(group['GROUP_ID'], []) %}
+
+    :param data: The data source, e.g. articles_csv.
+    :param column: The grouped column.
+    :param delimiter: If given, the cells are split by the delimiter and the row is added to the group of every part.
+    :return: Read-only mapping of the values of the column to the tuples of rows.
+    """
+    return record_index.get_group_index(data, column, delimiter)
+
+
+def join_sources(left, right, on, right_on=None, how='inner') -> list:
+    """
+    Joins the rows of two data sources having the same value in the given columns. Every matching pair of rows gives
+    one joined row with the columns of both rows, the values of the left row are kept when both have the same column.
+    Usage: {% for article in join_sources(articles_csv, prices_csv, 'SUPPLIER_AID') %}
+
+    :param left: The left data source, e.g. articles_csv.
+    :param right: The right data source, e.g. prices_csv.
+    :param on: The column of the left data source.
+    :param right_on: The column of the right data source. Default - the same as 'on'.
+    :param how: 'inner' keeps only the left rows having a match, 'left' keeps all the left rows. Default - 'inner'.
+    :return: List of the joined rows.
+    """
+    return record_index.get_joined(left, right, on, right_on, how)
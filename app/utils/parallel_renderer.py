@@ -0,0 +1,304 @@
+"""
+This module provides the parallel rendering of text-based templates. The top-level loops over a data source named in
+the configuration (e.g. the articles of a catalog) are split into shards rendered by a pool of worker processes, and
+the rendered shards are joined in their original order, so the output is identical to the one of a serial render.
+
+The loops are cut out of the template with their own block tags, which keeps the whitespace control (trim_blocks,
+lstrip_blocks, '-' modifiers) of the surrounding text unchanged:
+- the main process renders the template with every sharded loop replaced by a loop printing a placeholder,
+- the workers render the template up to the last sharded loop, with the loops iterating over their shard only and
+  surrounded by markers, and return the text between the markers.
+Every iteration of the loops rendered by the workers also starts with a marker, so the output of the loops can be
+split into the fragments of the individual rows (see incremental_renderer.py).
+
+Only the loops placed directly in the template are split, not the loops nested in another block (e.g. in an if, set,
+filter, macro or call block), whose output may be processed by the block. If the template has no such loop, it is
+rendered serially. Every worker renders the template before the sharded loops as well (its output is discarded), so
+the code placed before the loops (e.g. a set tag calling an extension) runs in the main process and in every worker.
+"""
+
+# Standard library imports
+import logging
+import multiprocessing
+import os
+import re
+import uuid
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+# Third party imports
+from jinja2 import nodes
+
+# Local application/library specific imports
+from .jinja_environment import get_environment, get_template
+
+PARALLEL_RENDER_MIN_ROWS = 1000  # Minimum number of rows of the data source rendered by worker processes
+SHARD_ROWS_NAME = '_jinjaxcat_shard_rows'  # Name of the variable holding the rows of a shard in the worker templates
+
+# Matches the comments and the block tags of a template, the raw blocks are skipped separately
+_TAG_PATTERN = re.compile(r'\{#.*?#\}|\{%([-+]?)\s*(\w+)(.*?)([-+]?)%\}', re.S)
+_ENDRAW_PATTERN = re.compile(r'\{%[-+]?\s*endraw\s*[-+]?%\}')
+_FOR_PATTERN = re.compile(r'\s*[\w\s,()]+?\s+in\s+(\w+)\s*')
+
+_worker_state = {}  # The sharded template and the data of a worker process, set by its initializer
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedLoop:
+    """
+    A top-level loop of a template over a data source, located by the offsets of its block tags in the source.
+    """
+    __slots__ = ('start', 'body_start', 'end', 'open_modifier', 'body_modifier', 'close_modifier', 'source_span')
+
+    def __init__(self, for_tag: re.Match, endfor_tag: re.Match, source_span: tuple):
+        self.start, self.body_start, self.end = for_tag.start(), for_tag.end(), endfor_tag.end()
+        self.open_modifier = for_tag.group(1)  # Whitespace control of the opening tag, e.g. '-' in '{%- for'
+        self.body_modifier = for_tag.group(4)  # Whitespace control at the start of the body, e.g. '-' in 'x -%}'
+        self.close_modifier = endfor_tag.group(4)  # Whitespace control of the closing tag, e.g. '-' in 'endfor -%}'
+        self.source_span = source_span  # Offsets of the data source name in the template source
+
+
+def find_sharded_loops(template_source: str, loop_source: str) -> list:
+    """
+    Finds the top-level loops over the data source in the template, i.e. the loops {% for ... in loop_source %}
+    placed directly in the template, which are not nested in another loop or block.
+
+    :param template_source: Source code of the template.
+    :param loop_source: Name of the data source, e.g. articles_csv.
+    :return: List of ShardedLoop objects, in the order of the template. Empty if all the loops over the data source
+             are nested in other blocks.
+    """
+    top_level_lines, nested_lines = _get_loop_lines(get_environment().parse(template_source), loop_source)
+    if not top_level_lines and not nested_lines:
+        raise ValueError(f"The template has no top-level loop {{% for ... in {loop_source} %}} to render in parallel.")
+    loops, open_loops = [], []
+    position = 0
+    while match := _TAG_PATTERN.search(template_source, position):
+        position = match.end()
+        tag = match.group(2)
+        if tag == 'raw':  # The content of raw blocks is not parsed by Jinja2
+            endraw = _ENDRAW_PATTERN.search(template_source, position)
+            position = endraw.end() if endraw else len(template_source)
+        elif tag == 'for':
+            for_match = _FOR_PATTERN.fullmatch(match.group(3))
+            line = template_source.count('\n', 0, match.start(2)) + 1  # Line of the tag name, as in the parsed template
+            sharded = (not open_loops and for_match is not None and for_match.group(1) == loop_source
+                       and line in top_level_lines and line not in nested_lines)
+            source_span = (match.start(3) + for_match.start(1), match.start(3) + for_match.end(1)) if sharded else None
+            open_loops.append((match, source_span))
+        elif tag == 'endfor' and open_loops:
+            for_tag, source_span = open_loops.pop()
+            if source_span:
+                loops.append(ShardedLoop(for_tag, match, source_span))
+    return loops
+
+
+def _get_loop_lines(template: nodes.Template, loop_source: str) -> tuple:
+    """
+    Returns the lines of the loops over the data source placed directly in the parsed template, and the lines of the
+    loops over the data source nested in other blocks or loops. A loop is sharded only if its line has a top-level loop
+    and no nested one.
+    """
+    top_level_lines, nested_lines = set(), set()
+    for node in template.find_all(nodes.For):
+        if isinstance(node.iter, nodes.Name) and node.iter.name == loop_source:
+            (top_level_lines if any(node is child for child in template.body) else nested_lines).add(node.lineno)
+    return top_level_lines, nested_lines
+
+
+def check_sharded_loop(template_source: str, loop: ShardedLoop):
+    """
+    Checks that the iterations of a loop are independent of each other, so the loop can be split into shards.
+    A loop can not be rendered in parallel if it uses the loop variable (e.g. loop.index or loop.first, the shards
+    would count from the start), an else block or assigns attributes of a namespace (state kept across iterations).
+
+    :param template_source: Source code of the template.
+    :param loop: The checked loop.
+    """
+    for_node = get_environment().parse(template_source[loop.start:loop.end]).find(nodes.For)
+    if for_node.else_:
+        raise ValueError("A loop rendered in parallel can not have an else block.")
+    if any(_refers_to_loop_variable(node) for node in for_node.body):
+        raise ValueError("A loop rendered in parallel can not use the loop variable (e.g. loop.index).")
+    if any(node.find(nodes.NSRef) for node in for_node.body):
+        raise ValueError("A loop rendered in parallel can not assign namespace attributes.")
+
+
+class ShardedTemplate:
+    """
+    A template whose top-level loops over a data source are rendered separately from the rest of the template.
+    The template has no loops to render separately if all its loops over the data source are nested in other blocks.
+    """
+
+    def __init__(self, template_source: str, loop_source: str):
+        """
+        Finds and checks the loops over the data source in the template.
+
+        :param template_source: Source code of the template.
+        :param loop_source: Name of the data source, e.g. articles_csv.
+        """
+        self.loop_source = loop_source
+        self.loops = find_sharded_loops(template_source, loop_source)
+        for loop in self.loops:
+            check_sharded_loop(template_source, loop)
+
+        # Unique placeholders and markers, which can not appear in the rendered data
+        token = uuid.uuid4().hex
+        self.placeholders = [f'jinjaxcat{token}shard{i}' for i in range(len(self.loops))]
+        self.markers = [(f'jinjaxcat{token}start{i}', f'jinjaxcat{token}end{i}') for i in range(len(self.loops))]
+        self.record_marker = f'jinjaxcat{token}record'
+        self.main_source = self._replace_loops(template_source, lambda i, loop: _print_block(
+            self.placeholders[i], loop.open_modifier, loop.close_modifier))
+        self.loops_source = self._replace_loops(template_source, lambda i, loop: self._get_marked_loop(
+            template_source, loop, *self.markers[i]))
+
+    def render_main(self, data: dict) -> str:
+        """
+        Renders the template except the loops, which are replaced by placeholders (see insert_loops).
+
+        :param data: Dictionary of the data sources passed to the template.
+        :return: The rendered output with the placeholders of the loops.
+        """
+        return get_template(self.main_source).render(**data)
+
+    def insert_loops(self, output: str, rendered_loops: list) -> str:
+        """
+        Replaces the placeholders of the loops in the output of render_main by the output of the loops.
+
+        :param output: The output of render_main.
+        :param rendered_loops: The output of every loop, in the order of the template.
+        :return: The complete output.
+        """
+        for placeholder, rendered_loop in zip(self.placeholders, rendered_loops):
+            if output.count(placeholder) != 1:
+                raise ValueError("A loop rendered in parallel must be rendered exactly once.")
+            output = output.replace(placeholder, rendered_loop)
+        return output
+
+    def render_records(self, data: dict, rows: list) -> list:
+        """
+        Renders the loops over the given rows of the data source. The template is rendered up to the end of the last
+        loop only.
+
+        :param data: Dictionary of the data sources passed to the template.
+        :param rows: The rows the loops iterate over, e.g. a shard of the data source.
+        :return: For every loop, in the order of the template, the list of the fragments rendered for the rows.
+        """
+        if not self.loops:
+            return []
+        last_marker = self.markers[-1][1]
+        events = []
+        for event in get_template(self.loops_source).generate(**data, **{SHARD_ROWS_NAME: rows}):
+            events.append(event)
+            if last_marker in event:
+                break
+        output = ''.join(events)
+
+        fragments = []
+        for start_marker, end_marker in self.markers:
+            if output.count(start_marker) != 1 or output.count(end_marker) != 1:
+                raise ValueError("A loop rendered in parallel must be rendered exactly once.")
+            rendered_loop = output[output.index(start_marker) + len(start_marker):output.index(end_marker)]
+            fragments.append(rendered_loop.split(self.record_marker)[1:])
+        return fragments
+
+    def _replace_loops(self, template_source: str, replace) -> str:
+        """
+        Returns the template source with every loop replaced by replace(index, loop).
+        """
+        parts, position = [], 0
+        for i, loop in enumerate(self.loops):
+            parts += [template_source[position:loop.start], replace(i, loop)]
+            position = loop.end
+        parts.append(template_source[position:])
+        return ''.join(parts)
+
+    def _get_marked_loop(self, template_source: str, loop: ShardedLoop, start_marker: str, end_marker: str) -> str:
+        """
+        Returns the loop iterating over the given rows, surrounded by the blocks printing the markers, every
+        iteration starts with the record marker.
+        """
+        return (_print_block(start_marker, open_modifier=loop.open_modifier)
+                + template_source[loop.start:loop.source_span[0]] + SHARD_ROWS_NAME
+                + template_source[loop.source_span[1]:loop.body_start]
+                + _print_block(self.record_marker, close_modifier=loop.body_modifier)
+                + template_source[loop.body_start:loop.end]
+                + _print_block(end_marker, close_modifier=loop.close_modifier))
+
+
+def render_parallel(template_source: str, data: dict, loop_source: str, workers: int | None = None) -> str:
+    """
+    Renders the template, rendering the top-level loops over the data source in worker processes.
+    Every worker renders a contiguous shard of the rows, the output is identical to template.render(**data).
+
+    :param template_source: Source code of the template.
+    :param data: Dictionary of the data sources passed to the template.
+    :param loop_source: Name of the data source whose loops are split into shards, e.g. articles_csv.
+    :param workers: Number of worker processes, the number of CPUs by default.
+    :return: The rendered output.
+    """
+    sharded_template = ShardedTemplate(template_source, loop_source)
+    rows = get_loop_rows(data, loop_source)
+    workers = min(workers or os.cpu_count() or 1, len(rows))
+    if not sharded_template.loops:
+        logger.warning(f"The loops over {loop_source} are nested in other blocks, rendering the template serially")
+    if not sharded_template.loops or workers <= 1 or len(rows) < PARALLEL_RENDER_MIN_ROWS:
+        return get_template(template_source).render(**data)
+
+    bounds = [len(rows) * i // workers for i in range(workers + 1)]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(sharded_template, data)) as executor:
+        futures = [executor.submit(_render_shard, start, stop) for start, stop in zip(bounds, bounds[1:])]
+        output = sharded_template.render_main(data)  # The rest of the template is rendered meanwhile
+        shards = [future.result() for future in futures]
+    return sharded_template.insert_loops(output, [''.join(''.join(shard[i]) for shard in shards)
+                                                  for i in range(len(sharded_template.loops))])
+
+
+def get_loop_rows(data: dict, loop_source: str):
+    """
+    Returns the rows of the data source of the sharded loops, which must be loaded into memory.
+    """
+    rows = data.get(loop_source)
+    if not isinstance(rows, Sequence):
+        raise ValueError(f"The data source {loop_source} must be loaded into memory (not lazily) to render its "
+                         f"loops separately.")
+    return rows
+
+
+def _print_block(value: str, open_modifier: str = '', close_modifier: str = '') -> str:
+    """
+    Returns a block printing the value. Its opening and closing tags take over the whitespace control of the loop
+    they replace or surround, so the text around the loop is rendered the same way.
+    """
+    return f"{{%{open_modifier} for _value in ['{value}'] %}}{{{{ _value }}}}{{% endfor {close_modifier}%}}"
+
+
+def _refers_to_loop_variable(node) -> bool:
+    """
+    Checks whether the node uses the loop variable of the enclosing loop.
+    """
+    if isinstance(node, nodes.Name) and node.name == 'loop':
+        return True
+    if isinstance(node, nodes.For):  # A nested loop has its own loop variable, only its iterable belongs to the outer loop
+        return _refers_to_loop_variable(node.iter)
+    return any(_refers_to_loop_variable(child) for child in node.iter_child_nodes())
+
+
+def _init_worker(sharded_template: ShardedTemplate, data: dict):
+    """
+    Initializes a worker process with the template and the data, so they are sent to every worker once.
+    """
+    _worker_state.update(sharded_template=sharded_template, data=data)
+
+
+def _render_shard(start: int, stop: int) -> list:
+    """
+    Renders the sharded loops over the rows start:stop of the data source in a worker process.
+
+    :return: For every loop, the list of the fragments rendered for the rows.
+    """
+    sharded_template, data = _worker_state['sharded_template'], _worker_state['data']
+    return sharded_template.render_records(data, data[sharded_template.loop_source][start:stop])
@@ -1,24 +1,52 @@
 # Standard library imports
+import contextlib
 import csv
 import io
 import json
+import multiprocessing
 import os
-import xml.dom.minidom
-from collections import namedtuple
-from io import BytesIO
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 # Third party imports
-import chardet
-import openpyxl
-import pandas as pd
-import requests
-from lxml import etree
+# Note: heavy libraries (pandas, openpyxl, lxml, requests) are imported in the functions that use them,
+# so that jobs which do not need them (e.g. a JSON to XML run of the CLI) start fast.
+from jinja2 import nodes
+from jinja2.environment import TemplateStream
 
 # Local application/library specific imports
-from .jinja_environment import create_environment
-
-# Defining a named tuple to hold the result data
-Result = namedtuple('Result', ['type', 'msg', 'log'])
+from .data_sources import (
+    LazyCsvSource,
+    RecordTable,
+    compute_fingerprint,
+    read_csv,
+    with_fingerprint,
+)
+from .encoding import get_file_encoding
+from .excel_renderer import get_template_sources, render_workbook
+from .incremental_renderer import render_incremental
+from .jinja_environment import get_environment, get_template
+from .parallel_renderer import render_parallel
+from .profiler import is_profiling, profile_phase
+from .rest_source import load_rest
+from .xml_prettifier import prettify_xml, prettify_xml_stream
+from .xml_validation import (  # noqa: F401 (re-exported for the CLI and the interface)
+    Result,
+    validate_xml,
+)
+
+CSV_SNIFF_BYTES = 64 * 1024  # Number of bytes decoded to detect the delimiter of CSV files
+STREAM_BUFFER_SIZE = 100  # Number of template events joined into one chunk when streaming the rendered output
+PREVIEW_RECORD_LIMIT = 1000  # Number of the first records of every looped data source used to render a preview
+LOAD_THREADS = 8  # Default maximum number of input files loaded at the same time
+PROCESS_POOL_MIN_BYTES = 4 * 1024 * 1024  # Minimum total size of the CSV and Excel inputs parsed in worker processes
+# Environment variable with the number of worker processes parsing the CSV and Excel inputs, 0 (the default) parses
+# them in threads. Starting a worker process and importing pandas in it takes about a second and the parsed tables
+# are pickled back, so the processes only pay off for big inputs on several CPUs.
+LOAD_PROCESSES_ENV = 'JINJAXCAT_LOAD_PROCESSES'
+
+_process_pools = {}  # The worker processes parsing the inputs, reused by all loads, by their number of processes
+_process_pools_lock = threading.Lock()
 
 
 def change_dict_keys(original_dict: dict, key_mapping: dict) -> dict:
@@ -40,194 +68,499 @@ def change_dict_keys(original_dict: dict, key_mapping: dict) -> dict:
     return new_dict
 
 
-def generate_output(input_files: list, template_file: io.BytesIO, key_mapping: dict) -> bytes | str:
+def generate_output(input_files: list, template_file: io.BytesIO, key_mapping: dict,
+                    lazy_input: bool = False, parallel_loop: str | None = None,
+                    render_workers: int | None = None, input_data: dict | None = None) -> bytes | str:
     """
     Function that generates a file from given input_files and a template_file.
 
     :param input_files: A list of input files containing data for the template.
     :param template_file: The template file.
     :param key_mapping: A dictionary that maps old keys to new keys.
+    :param lazy_input: If True, CSV files are read lazily in chunks instead of being loaded into memory.
+    :param parallel_loop: Name of a data source, e.g. articles_csv. If given, the top-level loops of a text-based
+                          template over this data source are rendered in parallel by worker processes.
+    :param render_workers: Number of worker processes rendering the parallel loops, the number of CPUs by default.
+    :param input_data: Data already loaded from the input files (e.g. shared by several jobs). If given, it is used
+                       instead of loading the input files.
     :return: A bytes object representing the rendered file.
     """
+    if parallel_loop and template_file.name.endswith(".xlsx"):
+        raise ValueError("Parallel rendering is not supported for Excel templates.")
     template_bytes = template_file.getvalue()  # Get the bytes of the template file
-    data_dict = load_data(input_files)  # Load the data from the input files into a dictionary
-    if key_mapping:  # If key_mapping is provided change the keys in the loaded data
-        data_dict = change_dict_keys(data_dict, key_mapping)
-    environment = create_environment()  # Create a custom Jinja2 environment
+    data_dict = _load_template_data(input_files, key_mapping, lazy_input, input_data)  # Load the data of the inputs
 
     # Check the file extension to decide how to render the template
     if template_file.name.endswith(".xlsx"):
-        workbook = openpyxl.load_workbook(filename=io.BytesIO(template_bytes))  # Load the workbook from the byte data
-        for sheet_name in workbook.sheetnames:  # Iterate through each sheet in the workbook
-            sheet = workbook[sheet_name]  # Access the sheet by its name
-
-            # Iterate over each cell in each row of the sheet (limited to a maximum of 50 rows and 100 columns)
-            for row in sheet.iter_rows(min_row=1, max_row=50, min_col=1, max_col=100):
-                for cell in row:
-
-                    # Check if the cell value starts with '{', indicating a Jinja2 template
-                    if isinstance(cell.value, str) and cell.value.startswith('{'):
-                        cell_value = cell.value.replace('}\n', '}')  # Erase redundant newlines
-                        template = environment.from_string(cell_value)  # Create a Jinja2 template from the cell value
-                        rendered_output = template.render(**data_dict)  # Render the template using the data dictionary
-                        split_output_list = rendered_output.split('##')  # Split the rendered output by '##'
-
-                        if split_output_list:  # If rendered output can be split into a list
-                            data = pd.Series(split_output_list)  # Convert the rendered output into a Pandas Series
-                            series = data.apply(pd.to_numeric, errors='ignore')  # function that converts str to numeric
-
-                            # Write the output values to the subsequent cells in the same column
-                            for i, value in enumerate(series):
-                                sheet.cell(row=cell.row + i, column=cell.column).value = value
-                        else:  # Output is a single value. Write it to the Excel cell.
-                            sheet.cell(row=cell.row, column=cell.column).value = rendered_output
-
-        output_bytes = BytesIO()  # Create a BytesIO object to store the output data
-        workbook.save(output_bytes)  # Save the workbook to the BytesIO object
-        output_bytes.seek(0)  # Set the position of the BytesIO object to the beginning
-        return output_bytes.getvalue()  # Return the byte representation of the Excel file
+        return render_workbook(template_bytes, data_dict)  # Render the Excel template cell by cell
     # If the template file is not an Excel file, process it as a text-based file
     else:
-        string_object = template_bytes.decode(chardet.detect(template_bytes)['encoding'])  # Decode bytes into a string
-        template = environment.from_string(string_object)  # Create a Jinja2 template from the decoded string
+        encoding = get_file_encoding(template_file, template_bytes)  # Get the declared or detected encoding
+        string_object = template_bytes.decode(encoding)  # Decode bytes into a string
+        if parallel_loop:  # Render the shards of the loops over the data source in worker processes
+            return render_parallel(string_object, data_dict, parallel_loop, render_workers)
+        template = get_template(string_object)  # Get the compiled Jinja2 template of the decoded string
         return template.render(**data_dict)  # Render the template with the data dictionary and return the result
 
 
-def load_data(input_files: list) -> dict:
+def generate_output_stream(input_files: list, template_file: io.BytesIO, key_mapping: dict,
+                           buffer_size: int = STREAM_BUFFER_SIZE, lazy_input: bool = False,
+                           input_data: dict | None = None) -> TemplateStream:
+    """
+    Function that renders a text-based template lazily, chunk by chunk, instead of returning one big string.
+    The returned stream can be written to a file or any other stream as the chunks are produced,
+    so the complete output never has to be held in memory.
+
+    :param input_files: A list of input files containing data for the template.
+    :param template_file: The template file (text-based templates only).
+    :param key_mapping: A dictionary that maps old keys to new keys.
+    :param buffer_size: Number of rendered template events joined into a single chunk.
+    :param lazy_input: If True, CSV files are read lazily in chunks instead of being loaded into memory.
+    :param input_data: Data already loaded from the input files. If given, it is used instead of loading the input files.
+    :return: A TemplateStream yielding the rendered output as string chunks.
+    """
+    if template_file.name.endswith(".xlsx"):
+        raise ValueError("Streaming output is not supported for Excel templates.")
+
+    template_bytes = template_file.getvalue()  # Get the bytes of the template file
+    data_dict = _load_template_data(input_files, key_mapping, lazy_input, input_data)  # Load the data of the inputs
+
+    encoding = get_file_encoding(template_file, template_bytes)  # Get the declared or detected encoding
+    string_object = template_bytes.decode(encoding)  # Decode bytes into a string
+    template = get_template(string_object)  # Get the compiled Jinja2 template of the decoded string
+    stream = template.stream(**data_dict)  # Create a generator based stream instead of rendering the whole output
+    if buffer_size > 1:
+        stream.enable_buffering(size=buffer_size)  # Join small template events into bigger chunks
+    return stream
+
+
+def generate_incremental_output(input_files: list, template_file: io.BytesIO, key_mapping: dict, loop_source: str,
+                                record_key: str, state_file: str, delta_template_file: io.BytesIO | None = None,
+                                lazy_input: bool = False, input_data: dict | None = None) -> tuple:
+    """
+    Function that renders a text-based template incrementally: only the fragments of the rows of a data source that
+    changed since the previous render are rendered again, the other fragments are taken from the state file.
+    Optionally, a delta template is rendered with the changes, available as the delta_new and delta_changed lists of
+    rows and the delta_deleted list of the keys of the deleted rows.
+
+    :param input_files: A list of input files containing data for the template.
+    :param template_file: The template file (text-based templates only).
+    :param key_mapping: A dictionary that maps old keys to new keys.
+    :param loop_source: Name of the data source whose top-level loops are rendered row by row, e.g. articles_csv.
+    :param record_key: The column identifying the rows of the data source, e.g. SUPPLIER_AID.
+    :param state_file: Path to the state file written by the previous render, if any.
+    :param delta_template_file: The template of the delta document, optional.
+    :param lazy_input: If True, CSV files are read lazily in chunks instead of being loaded into memory.
+    :param input_data: Data already loaded from the input files. If given, it is used instead of loading the input files.
+    :return: Tuple (output, delta output, state), the delta output is None if there is no delta template. The state
+             must be saved with save_state once the outputs are written.
+    """
+    if template_file.name.endswith(".xlsx"):
+        raise ValueError("Incremental rendering is not supported for Excel templates.")
+
+    template_bytes = template_file.getvalue()  # Get the bytes of the template file
+    data_dict = _load_template_data(input_files, key_mapping, lazy_input, input_data)  # Load the data of the inputs
+    string_object = template_bytes.decode(get_file_encoding(template_file, template_bytes))
+    output, delta, state = render_incremental(string_object, data_dict, loop_source, record_key, state_file)
+
+    delta_output = None
+    if delta_template_file is not None:
+        delta_bytes = delta_template_file.getvalue()
+        delta_template = get_template(delta_bytes.decode(get_file_encoding(delta_template_file, delta_bytes)))
+        delta_output = delta_template.render(**data_dict, delta_new=delta.new, delta_changed=delta.changed,
+                                             delta_deleted=delta.deleted)
+    return output, delta_output, state
+
+
+def generate_preview(input_files: list, template_file: io.BytesIO, key_mapping: dict, max_chars: int,
+                     max_records: int = PREVIEW_RECORD_LIMIT, beautify: bool = False,
+                     input_data: dict | None = None) -> tuple:
+    """
+    Function that renders a preview of the output: the data sources the template loops over are rendered with their
+    first records only (the other data sources, e.g. the lookup tables, are complete), and the rendering of
+    a text-based template stops once the preview has max_chars characters.
+
+    :param input_files: A list of input files containing data for the template.
+    :param template_file: The template file.
+    :param key_mapping: A dictionary that maps old keys to new keys.
+    :param max_chars: Maximum number of characters of the preview of a text-based template.
+    :param max_records: Number of the first records of every looped data source (and of the lists nested in it)
+                        rendered.
+    :param beautify: If True, the preview of an XML template is beautified while it is rendered.
+    :param input_data: Data already loaded from the input files. If given, it is used instead of loading the input files,
+                       e.g. the data loaded with get_preview_max_rows.
+    :return: Tuple (preview, complete), complete is False if records were left out or the rendering was stopped.
+    """
+    template_bytes = template_file.getvalue()  # Get the bytes of the template file
+    looped_sources = _get_looped_sources(_get_template_sources(template_file))
+    if input_data is None:  # Only the first records of the looped CSV files are read
+        input_data = load_data(input_files, max_rows=_get_max_rows(looped_sources, key_mapping, max_records))
+    data_dict = _load_template_data(input_files, key_mapping, input_data=input_data)  # Load the data of the inputs
+    sampled_data, truncated = _sample_data(data_dict, looped_sources, max_records)
+    complete = not truncated
+
+    if template_file.name.endswith(".xlsx"):
+        return render_workbook(template_bytes, sampled_data), complete  # Excel previews show the first rows anyway
+    string_object = template_bytes.decode(get_file_encoding(template_file, template_bytes))
+    chunks = get_template(string_object).generate(**sampled_data)  # Rendered lazily, so the rendering can stop early
+    if beautify and template_file.name.endswith(".xml"):
+        chunks = prettify_xml_stream(chunks)
+    preview, length = [], 0
+    for chunk in chunks:
+        preview.append(chunk)
+        length += len(chunk)
+        if length > max_chars:
+            return ''.join(preview)[:max_chars], False
+    return ''.join(preview), complete
+
+
+def get_preview_max_rows(template_file: io.BytesIO, key_mapping: dict, max_records: int = PREVIEW_RECORD_LIMIT) -> dict:
+    """
+    Returns the maximum number of rows of the input files read for a preview (see load_data): the first records of
+    the data sources the template loops over, and one more record showing whether records were left out.
+
+    :param template_file: The template file.
+    :param key_mapping: A dictionary that maps old keys to new keys.
+    :param max_records: Number of the first records of every looped data source rendered.
+    :return: Dictionary with the maximum number of rows by the name of the data source of the input file.
+    """
+    return _get_max_rows(_get_looped_sources(_get_template_sources(template_file)), key_mapping, max_records)
+
+
+def _get_max_rows(looped_sources: set, key_mapping: dict, max_records: int) -> dict:
+    """
+    Returns the maximum number of rows read for a preview by the name of the data source of the input file, see
+    get_preview_max_rows.
+    """
+    source_names = {new_key: old_key for old_key, new_key in key_mapping.items()}  # The names before the mapping
+    return {source_names.get(name, name): max_records + 1 for name in looped_sources}
+
+
+def _get_template_sources(template_file: io.BytesIO) -> list:
+    """
+    Returns the sources of the Jinja2 templates of a template file (those of the cells of an Excel template).
+    """
+    template_bytes = template_file.getvalue()
+    if template_file.name.endswith(".xlsx"):
+        return sorted(get_template_sources(template_bytes))
+    return [template_bytes.decode(get_file_encoding(template_file, template_bytes))]
+
+
+def _get_looped_sources(template_sources: list) -> set:
+    """
+    Returns the names of the variables the loops of the templates iterate over, e.g. articles_csv for
+    {% for article in articles_csv|sort(attribute='ID') %}. A variable set from another variable, e.g.
+    {% set articles = articles_csv %}, stands for the variable it is set from as well.
+
+    :param template_sources: The sources of the templates.
+    :return: Set of the variable names.
+    """
+    looped, assigned = set(), {}
+    for source in template_sources:
+        template = get_environment().parse(source)
+        for node in template.find_all(nodes.Assign):
+            if isinstance(node.target, nodes.Name):
+                assigned.setdefault(node.target.name, set()).update(_get_base_names(node.node))
+        looped.update(name for node in template.find_all(nodes.For) for name in _get_base_names(node.iter))
+
+    pending = list(looped)
+    while pending:  # Add the variables the looped variables are set from
+        for name in assigned.get(pending.pop(), ()):
+            if name not in looped:
+                looped.add(name)
+                pending.append(name)
+    return looped
+
+
+def _get_base_names(node: nodes.Node) -> list:
+    """
+    Returns the name of the variable an expression is derived from by attributes, items, filters and calls, e.g.
+    articles_csv for articles_csv[:10]|sort, or an empty list if it is not derived from a single variable.
+    """
+    while isinstance(node, nodes.Getattr | nodes.Getitem | nodes.Filter | nodes.Call) and node.node is not None:
+        node = node.node
+    return [node.name] if isinstance(node, nodes.Name) else []
+
+
+def _sample_data(data_dict: dict, sources: set, max_records: int) -> tuple:
+    """
+    Returns the data with only the first records of the given data sources, other data sources are kept whole.
+
+    :param data_dict: Dictionary with the data sources.
+    :param sources: Names of the data sources to sample.
+    :param max_records: Number of the first records kept.
+    :return: Tuple (sampled data, truncated), truncated is True if some records were left out.
+    """
+    sampled_data, truncated = dict(data_dict), False
+    for name in sources & data_dict.keys():
+        sampled_data[name], source_truncated = _sample_records(data_dict[name], max_records)
+        truncated = truncated or source_truncated
+    return sampled_data, truncated
+
+
+def _sample_records(data, max_records: int) -> tuple:
+    """
+    Returns the data with only the first records of its lists (including the lists nested in its objects).
+
+    :return: Tuple (sampled data, truncated), truncated is True if some records were left out.
+    """
+    if isinstance(data, dict):
+        sampled = {key: _sample_records(value, max_records) for key, value in data.items()}
+        return {key: value for key, (value, _) in sampled.items()}, any(truncated for _, truncated in sampled.values())
+    if isinstance(data, list | RecordTable):
+        sampled = [_sample_records(item, max_records) for item in data[:max_records]]
+        return [item for item, _ in sampled], len(data) > max_records or any(truncated for _, truncated in sampled)
+    return data, False
+
+
+def _load_template_data(input_files: list, key_mapping: dict, lazy_input: bool = False,
+                        input_data: dict | None = None) -> dict:
+    """
+    Loads the data from the input files and renames the data sources according to the key mapping.
+
+    :param input_files: A list of input files containing data for the template.
+    :param key_mapping: A dictionary that maps old keys to new keys.
+    :param lazy_input: If True, CSV files are read lazily in chunks instead of being loaded into memory.
+    :param input_data: Data already loaded from the input files, used instead of loading them.
+    :return: Dictionary where each key-value pair corresponds to a data source name and its contents.
+    """
+    if input_data is not None:
+        data_dict = input_data
+    else:
+        data_dict = load_data(input_files, lazy=lazy_input)  # Load the data from the input files into a dictionary
+    if key_mapping:  # If key_mapping is provided change the keys in the loaded data
+        data_dict = change_dict_keys(data_dict, key_mapping)
+    return data_dict
+
+
+def load_data(input_files: list, lazy: bool = False, max_workers: int | None = None,
+              max_rows: dict | None = None) -> dict:
     """
     Function that loads data from various file types (CSV, Excel, JSON, and REST).
     The function returns a dictionary where each key-value pair corresponds to an input file and its contents.
+    Independent input files are loaded concurrently: REST and JSON inputs in a thread pool and, when there are
+    several large CSV or Excel inputs and LOAD_PROCESSES_ENV is set, those are parsed in a shared pool of worker
+    processes. The results are merged in the order of
+    the input files, so duplicates and errors are reported the same way as if the files were loaded one by one.
 
     :param input_files: List of strings representing file paths of the input files.
+    :param lazy: If True, CSV files are loaded as LazyCsvSource objects that read their rows in chunks on iteration.
+    :param max_workers: Maximum number of input files loaded at the same time, 1 loads the files one by one.
+    :param max_rows: Maximum number of rows read from the eagerly loaded CSV files by the name of their data source,
+                     e.g. {'articles_csv': 1000}. The other data sources are read whole.
     :return: Dictionary where each key-value pair corresponds to an input file and its contents.
     """
-    data_dict = {}  # Initialize a dictionary to store the data
-
-    # Loop over each input file
+    max_rows = max_rows or {}
+    # The files following a duplicate file name would never be reached, so they are not loaded at all
+    files_to_load, names = [], set()
     for file in input_files:
+        files_to_load.append(file)
+        if get_source_name(file.name) in names:
+            break
+        names.add(get_source_name(file.name))
+
+    with contextlib.ExitStack() as stack:
+        # While profiling, the files are loaded one by one, so that the measures of every file are its own
+        if max_workers == 1 or len(files_to_load) < 2 or is_profiling():
+            results = (_load_file_result(file, lazy, max_rows.get(get_source_name(file.name)))
+                       for file in files_to_load)  # Loaded one by one on merge
+        else:
+            results = _submit_input_files(stack, files_to_load, lazy, max_workers, max_rows)
+
+        # The result of a file re-raises the error raised while loading it
+        data_dict = merge_data([file.name for file in files_to_load], (result.result() for result in results))
+
+    return data_dict  # Return the dictionary containing all the data
 
-        extension = os.path.splitext(file.name)[-1]  # Get the extension name
-        name = file.name.replace('.', '_')  # Get the filename
 
+def merge_data(file_names: list, loaded_data) -> dict:
+    """
+    Merges the data loaded from several input files into one dictionary, in the order of the input files.
+    The data of a file is taken from loaded_data only once the name of its data source is known to be unique,
+    so a duplicate file name is reported before the errors of the files following it.
+
+    :param file_names: The names of the input files, e.g. ['articles.csv', 'groups.csv'].
+    :param loaded_data: Iterable of the data loaded from every input file, in the same order.
+    :return: Dictionary where each key-value pair corresponds to a data source name and its contents.
+    :raises Exception: If two input files have the same data source name.
+    """
+    data_dict, loaded_data = {}, iter(loaded_data)
+    for file_name in file_names:
+        name = get_source_name(file_name)
         if name in data_dict:
             raise Exception(
                 f"Duplicate Detected: The file '{name}' already exists. Please rename your input files.")
+        data_dict.update(next(loaded_data))
+    return data_dict
 
-        if extension == '.csv':
-            # Get the bytes object of the file and decode it using the detected encoding
-            bytes_object = file.getvalue()
-            string_object = bytes_object.decode(chardet.detect(bytes_object)['encoding'])
-            # Determine the delimiter using the first 10 lines of the string_object.
-            sample_lines = string_object.splitlines()[:5]
-            sample = '\n'.join(sample_lines)
-            dialect = csv.Sniffer().sniff(sample)
-            gap = str(dialect.delimiter)
-
-            # # Try loading the CSV into a DataFrame
-            try:
-                df = pd.read_csv(io.StringIO(string_object), dtype=str, sep=gap, engine="python").fillna('')
-            # If there's a parser error, read again ignoring quotes
-            except pd.errors.ParserError:
-                df = pd.read_csv(io.StringIO(string_object), dtype=str, quoting=3, sep=gap, engine="python").fillna('')
-            data_dict[name] = df.to_dict('records')  # Add DataFrame contents to data_dict under the key 'name'
-
-        elif extension == '.xlsx':
-            # Loop over each sheet in the Excel file
-            for sheet in pd.ExcelFile(file).sheet_names:
-                df = pd.read_excel(file, sheet, engine='openpyxl', dtype=str).fillna('')
-                # Load the sheet into a pandas DataFrame and convert it to a dictionary
-                data_dict[f"{sheet}_{name}"] = df.to_dict('records')
-
-        elif extension == '.rest':
-            # Get the bytes object of the file and decode and extract the HTTP method and headers
-            bytes_object = file.getvalue()
-            string_object = bytes_object.decode(chardet.detect(bytes_object)['encoding'])
-            lines = string_object.split('\n')  # Split the decoded string into lines
-            method, url = lines[0].split()  # Extract the HTTP method and URL from the first line
-            headers = {line.split(": ")[0]: line.split(": ")[1].strip() for line in lines[1:] if ": " in line}
-            if method.lower() == 'get':  # If the HTTP method is GET, send a GET request to the URL with the headers
-                response = requests.get(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            # If the response status code is 2xx, convert the JSON response to a  DataFrame and then to a dictionary
-            if 200 <= response.status_code < 300:  # Status code is 2xx
-                data_dict[name] = response.json()
-            else:
-                response.raise_for_status()  # If the response status code is not 2xx, raise an exception
-
-        elif extension == '.json':
-            # Load the JSON file into a pandas DataFrame and convert it to a dictionary
-            data_dict[name] = json.loads(file.getvalue())
 
-    return data_dict  # Return the dictionary containing all the data
+def get_source_name(file_name: str) -> str:
+    """
+    Returns the name of the data source of an input file, e.g. 'articles_csv' for 'articles.csv'.
+    """
+    return file_name.replace('.', '_')
 
 
-def prettify_output(content: str, extension) -> str | None:
+def _load_file_result(file, lazy: bool, max_rows: int | None = None) -> Future:
+    """
+    Loads an input file in the current thread and returns the outcome as a completed future.
     """
-    If the file is not .xml, the content is returned as is.
+    future = Future()
+    try:
+        future.set_result(_load_file(file, lazy, max_rows))
+    except Exception as e:
+        future.set_exception(e)
+    return future
 
-    :param content: String containing the content to be formatted.
-    :param output_file_name: String containing the name of the output file.
-    :return: str: The formatted content.
+
+def _submit_input_files(stack: contextlib.ExitStack, input_files: list, lazy: bool,
+                        max_workers: int | None, max_rows: dict) -> list:
     """
+    Submits the input files to be loaded concurrently. CPU-bound parsing (CSV and Excel files) goes to the shared
+    process pool if it is enabled by LOAD_PROCESSES_ENV and there are at least two such files, large enough to outweigh
+    the transfer of the parsed tables, all the other files (and the small CPU-bound ones) are loaded in a thread pool.
+
+    :param stack: Exit stack shutting down the thread pool, pending loads are cancelled if the merge fails.
+    :param input_files: The input files to load.
+    :param lazy: If True, CSV files are loaded as LazyCsvSource objects.
+    :param max_workers: Maximum number of input files loaded at the same time.
+    :param max_rows: Maximum number of rows read from the CSV files by the name of their data source.
+    :return: List of futures with the loaded data, in the order of the input files.
+    """
+    cpu_bound_files = [file for file in input_files if _is_cpu_bound(file, lazy)]
+    processes = int(os.environ.get(LOAD_PROCESSES_ENV) or 0)
+    use_processes = (processes > 0 and len(cpu_bound_files) > 1
+                     and sum(_get_file_size(file) for file in cpu_bound_files) >= PROCESS_POOL_MIN_BYTES)
 
-    # If the file is an XML file, create a prettified version of the XML with indentations and line breaks
-    if extension == '.xml':
-        try:
-            dom = xml.dom.minidom.parseString(content)  # Parse the XML content
-            prettified_xml = dom.toprettyxml(indent="  ", newl="\n")  # Create a prettified XML with indentation, breaks
-            lines = [line for line in prettified_xml.split("\n") if line.strip()]  # Erase lines containing white spaces
-            prettified_content = "\n".join(lines)  # Join the lines into a single string
-            return prettified_content
-        except:  # noqa: E722
-            # If the XML content is not valid, return None
-            # Note: the exception handling here is not specific and should be improved in future revisions
-            return None
+    thread_pool = ThreadPoolExecutor(max_workers=max_workers or min(len(input_files), LOAD_THREADS))
+    stack.callback(thread_pool.shutdown, cancel_futures=True)
+    process_pool = _get_process_pool(processes) if use_processes else None
+
+    futures = []
+    for file in input_files:
+        pool = process_pool if use_processes and _is_cpu_bound(file, lazy) else thread_pool
+        futures.append(pool.submit(_load_file, file, lazy, max_rows.get(get_source_name(file.name))))
+    stack.callback(lambda: [future.cancel() for future in futures])  # The shared process pool keeps running
+    return futures
 
 
-def validate_xml(xml_file, schema_path, max_output_errors=100) -> Result:
+def _get_process_pool(processes: int) -> ProcessPoolExecutor:
     """
-    Validate an XML file against a DTD or XSD schema.
-    :param xml_file: String containing the XML file content.
-    :param schema_path: String containing the path to the schema file.
-    :param max_output_errors: An integer representing the maximum number of errors to be displayed in output report.
-    :return: Instance of Result with status, title and message.
+    Returns the pool of worker processes parsing the inputs, started on the first use and reused by the next loads,
+    so the processes are started and import pandas only once.
+
+    :param processes: Number of worker processes.
+    :return: The ProcessPoolExecutor object.
     """
+    with _process_pools_lock:
+        if processes not in _process_pools:
+            # Spawned processes do not inherit the threads of the parent process, so they are safe to start anytime
+            _process_pools[processes] = ProcessPoolExecutor(max_workers=processes,
+                                                            mp_context=multiprocessing.get_context('spawn'))
+        return _process_pools[processes]
 
-    schema_type = schema_path[schema_path.rfind("."):]  # Extract schema type by retrieving the file extension
-    try:
-        xml_doc = etree.fromstring(xml_file)  # Parse the XML file
-    except etree.XMLSyntaxError as e:
-        # If XML parsing fails, return Result with failure status and error details
-        return Result("KO", e.__class__.__name__, e)
-
-    if schema_type == '.dtd':  # Validate the XML against the appropriate schema based on the schema type
-        try:
-            schema = etree.DTD(file=schema_path)  # Load the DTD schema
-            is_valid = schema.validate(xml_doc)  # Validate the XML document against the schema
-            errors = schema.error_log.filter_from_errors()  # Get the list of validation errors
-        except (etree.DTDParseError, etree.XMLSyntaxError) as e:
-            # If DTD parsing or validation fails, return Result with failure status and error details
-            return Result("KO", e.__class__.__name__, e)
-    elif schema_type == '.xsd':
-        try:
-            schema_doc = etree.parse(schema_path)  # Load the XSD schema
-            schema = etree.XMLSchema(schema_doc)
-            is_valid = schema.validate(xml_doc)  # Validate the XML document against the schema
-            errors = schema.error_log  # Get the list of validation errors
-        except etree.XMLSyntaxError as e:
-            # If XSD parsing or validation fails, return Result with failure status and error details
-            return Result("KO", e.__class__.__name__, e)
-    else:
-        return Result("KO", "Error", "The schema type is not recognize")  # If the schema type is not recognized
 
-    # Log whether the XML is valid or not, and any errors
-    if is_valid:
-        ok_msg = f"The XML output successfully matches the specified ({schema_type.upper()}) schema."
-        return Result("OK", "Validation Passed", ok_msg)
-    else:
-        ko_msg = (f"The XML output does not conform to the specified ({schema_type.upper()}) schema!\n\n"
-                  f"Displaying {min(max_output_errors, len(errors))} out of {len(errors)} errors in the output file:"
-                  f"\n\n{errors[:max_output_errors]}"
-                  )
-        return Result("KO", "Validation Failed", ko_msg)
+def _is_cpu_bound(file, lazy: bool) -> bool:
+    """
+    Checks whether loading the input file is dominated by parsing (eagerly loaded CSV files and Excel files).
+    """
+    extension = os.path.splitext(file.name)[-1]
+    return extension == '.xlsx' or (extension == '.csv' and not lazy)
+
+
+def _get_file_size(file) -> int:
+    """
+    Returns the size of an input file in bytes.
+    """
+    size = getattr(file, 'size', None)
+    return size if size is not None else len(file.getvalue())
+
+
+def _load_file(file, lazy: bool = False, max_rows: int | None = None) -> dict:
+    """
+    Loads the data of a single input file. Runs in a worker thread or process, so it must not depend on any shared
+    state.
+
+    :param file: The input file.
+    :param lazy: If True, a CSV file is loaded as a LazyCsvSource object that reads its rows in chunks on iteration.
+    :param max_rows: Maximum number of rows read from an eagerly loaded CSV file, all rows are read if None.
+    :return: Dictionary with the data sources of the file (one for each sheet of an Excel file).
+    """
+    with profile_phase('parse input', file.name):
+        return _parse_file(file, lazy, max_rows)
+
+
+def _parse_file(file, lazy: bool, max_rows: int | None = None) -> dict:
+    """
+    Parses an input file into its data sources, see _load_file.
+    """
+    data_dict = {}
+    extension = os.path.splitext(file.name)[-1]  # Get the extension name
+    name = get_source_name(file.name)  # Get the filename
+
+    if extension == '.csv':
+        # Get the bytes object of the file and detect its encoding
+        bytes_object = file.getvalue()
+        encoding = get_file_encoding(file, bytes_object)
+        # Determine the delimiter from the beginning of the file
+        gap = _sniff_delimiter(bytes_object[:CSV_SNIFF_BYTES].decode(encoding, errors='ignore'))
+        # Identifies the content of the data source (and the number of the rows read, if limited)
+        fingerprint = compute_fingerprint(bytes_object, encoding, gap, *([] if max_rows is None else [str(max_rows)]))
+        if lazy:
+            # Read the rows only when they are used
+            data_dict[name] = LazyCsvSource(file, encoding, gap, fingerprint=fingerprint)
+        else:
+            df = read_csv(bytes_object, encoding, gap, file.name, max_rows)  # Load the CSV into a DataFrame
+            # Add DataFrame contents (stored column by column) to data_dict under the key 'name'
+            data_dict[name] = RecordTable.from_dataframe(df, fingerprint)
+
+    elif extension == '.xlsx':
+        import pandas as pd
+
+        # Load all sheets in a single pass, the workbook is opened only once (in read-only mode)
+        sheets = pd.read_excel(file, sheet_name=None, engine='openpyxl', dtype=str)
+        file_fingerprint = compute_fingerprint(file.getvalue())  # Identifies the content of the workbook
+        for sheet, df in sheets.items():
+            # Convert each sheet's DataFrame to a table of records
+            fingerprint = compute_fingerprint(file_fingerprint, sheet)
+            data_dict[f"{sheet}_{name}"] = RecordTable.from_dataframe(df.fillna(''), fingerprint)
+
+    elif extension == '.rest':
+        # Get the bytes object of the file, decode it and send the request (fetching all pages if it is paginated)
+        bytes_object = file.getvalue()
+        data = load_rest(bytes_object.decode(get_file_encoding(file, bytes_object)))
+        data_dict[name] = with_fingerprint(data, compute_fingerprint(json.dumps(data)))
+
+    elif extension == '.json':
+        # Load the JSON file into a pandas DataFrame and convert it to a dictionary
+        bytes_object = file.getvalue()
+        data_dict[name] = with_fingerprint(json.loads(bytes_object), compute_fingerprint(bytes_object))
+
+    return data_dict
+
+
+def _sniff_delimiter(string_object: str) -> str:
+    """
+    Determines the delimiter of a CSV file using its first 5 lines.
+
+    :param string_object: The decoded content (or the beginning of the content) of a CSV file.
+    :return: The detected delimiter.
+    """
+    sample_lines = string_object.splitlines()[:5]
+    sample = '\n'.join(sample_lines)
+    dialect = csv.Sniffer().sniff(sample)
+    return str(dialect.delimiter)
+
+
+def prettify_output(content: str, extension) -> str:
+    """
+    Formats XML content with indentations and line breaks. If the file is not .xml, the content is returned as is.
+
+    :param content: String containing the content to be formatted.
+    :param extension: The extension of the output file, e.g. '.xml'.
+    :return: str: The formatted content.
+    :raises ValueError: If the XML content is not well-formed.
+    """
+    if extension == '.xml':
+        return prettify_xml(content)
+    return content
@@ -0,0 +1,277 @@
+"""
+This module provides the profiling of the CLI runs (the --profile option). The phases of a run, e.g. the encoding
+detection and the parsing of every input file, the creation of the Jinja2 environment, the compilation of the template,
+the rendering, the beautifying, the validation and the writing of the output, are recorded with their wall time,
+CPU time and peak memory, and reported in a summary table and optionally in a JSON report.
+
+The phases are recorded by the profile_phase context manager (and by profile_stream for the chunks of a streamed
+output), which does nothing unless a Profiler is active, so the functions of the other modules report their phases
+without a profiler being passed around. The calls of a phase in the same parent phase (and for the same file) are
+summed up in one record, e.g. the chunks of a stream. The times of a phase include the times of the phases nested in it.
+The peak memory is the peak of the memory allocated by Python (traced by tracemalloc since the profiler was started)
+while the phase was running, and the peak RSS is the peak resident set size of the process at the end of the phase.
+Both are process-wide, so the work of worker processes (e.g. of the parallel rendering) is not included.
+"""
+
+# Standard library imports
+import contextlib
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the peak RSS is not reported
+    resource = None
+
+PROFILE_REPORT_VERSION = 1  # Version of the format of the JSON report
+MEGABYTE = 1024 * 1024
+
+_active_profiler = None  # The profiler recording the phases, set while a Profiler is used as a context manager
+_END = object()  # Marks the end of a profiled stream
+
+
+class _PhaseRecord:
+    """
+    The measures of a phase in its parent phase, the measures of all its calls (e.g. of the chunks of a stream) are
+    summed up.
+    """
+    __slots__ = ('phase', 'file', 'depth', 'calls', 'wall_seconds', 'cpu_seconds', 'peak_memory_bytes',
+                 'peak_rss_bytes')
+
+    def __init__(self, phase: str, file: str | None, depth: int):
+        self.phase = phase
+        self.file = file
+        self.depth = depth  # Number of the phases the phase is nested in
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_bytes = 0
+        self.peak_rss_bytes = None
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """
+    Records the phases of a run while it is used as a context manager, e.g.:
+
+        with Profiler() as profiler:
+            run_jinaxcat(config_path)
+        print(profiler.format_table())
+    """
+
+    def __init__(self):
+        self.wall_seconds = self.cpu_seconds = None
+        self.peak_memory_bytes = 0
+        self.peak_rss_bytes = None
+        self._stacks = {}  # The phases running in every thread, by the identifier of the thread
+        # The records of the phases by their parent record (None for the top-level phases), phase and file
+        self._records_by_key = {}
+        self._children = {}  # The records nested in every record (None for the top-level ones), in the order entered
+        self._lock = threading.Lock()
+        self._started = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        global _active_profiler
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._started = (time.perf_counter(), time.process_time())
+        _active_profiler = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        _active_profiler = None
+        self.wall_seconds = time.perf_counter() - self._started[0]
+        self.cpu_seconds = time.process_time() - self._started[1]
+        with self._lock:
+            self._update_peak_memory()
+        self.peak_rss_bytes = get_peak_rss()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    @property
+    def records(self) -> list:
+        """
+        The recorded phases, every phase followed by the phases nested in it, in the order they were entered first.
+        """
+        with self._lock:
+            records, pending = [], list(reversed(self._children.get(None, [])))
+            while pending:
+                record = pending.pop()
+                records.append(record)
+                pending.extend(reversed(self._children.get(record, [])))
+            return records
+
+    def start_phase(self, phase: str, file: str | None = None) -> tuple:
+        """
+        Enters a phase in the current thread. Its measures are added to the record of the same phase and file in the
+        same parent phase, if it was entered before.
+
+        :param phase: Name of the phase.
+        :param file: Name of the file the phase works on, optional.
+        :return: Tuple (record, started) of the record of the phase and the wall and CPU time at the start of
+                 the phase, to be passed to stop_phase.
+        """
+        with self._lock:
+            self._update_peak_memory()  # The peak so far belongs to the phases running before this one started
+            stack = self._stacks.setdefault(threading.get_ident(), [])
+            parent = stack[-1] if stack else None
+            record = self._records_by_key.get((parent, phase, file))
+            if record is None:
+                record = self._records_by_key[parent, phase, file] = _PhaseRecord(phase, file, len(stack))
+                self._children.setdefault(parent, []).append(record)
+            stack.append(record)
+        return record, (time.perf_counter(), time.process_time())
+
+    def stop_phase(self, record: _PhaseRecord, started: tuple):
+        """
+        Leaves the phase entered last in the current thread and adds its measures to its record.
+
+        :param record: The record of the phase.
+        :param started: The wall and CPU time returned by start_phase.
+        """
+        wall_seconds, cpu_seconds = time.perf_counter() - started[0], time.process_time() - started[1]
+        peak_rss_bytes = get_peak_rss()
+        with self._lock:
+            self._update_peak_memory()
+            self._stacks[threading.get_ident()].pop()
+            record.calls += 1
+            record.wall_seconds += wall_seconds
+            record.cpu_seconds += cpu_seconds
+            record.peak_rss_bytes = peak_rss_bytes
+
+    def _update_peak_memory(self):
+        """
+        Adds the peak of the traced memory since the last update to the running phases and starts a new peak.
+        """
+        peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        for stack in self._stacks.values():
+            for record in stack:
+                record.peak_memory_bytes = max(record.peak_memory_bytes, peak_memory_bytes)
+        self.peak_memory_bytes = max(self.peak_memory_bytes, peak_memory_bytes)
+        tracemalloc.reset_peak()
+
+    def to_dict(self) -> dict:
+        """
+        Returns the machine-readable report of the profile.
+        """
+        return {
+            'version': PROFILE_REPORT_VERSION,
+            'command': sys.argv,
+            'python': sys.version.split()[0],
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'phases': [record.to_dict() for record in self.records],
+        }
+
+    def write_report(self, report_path: str):
+        """
+        Writes the report of the profile to a JSON file.
+
+        :param report_path: Path to the JSON file.
+        """
+        with open(report_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self) -> str:
+        """
+        Returns the summary table of the profile, the nested phases are indented below the phase they are nested in.
+        """
+        header = ('Phase', 'File', 'Calls', 'Wall (s)', 'CPU (s)', 'Peak memory (MB)', 'Peak RSS (MB)')
+        rows = [(f"{'  ' * record.depth}{record.phase}", record.file or '', str(record.calls),
+                 f"{record.wall_seconds:.3f}", f"{record.cpu_seconds:.3f}", _format_megabytes(record.peak_memory_bytes),
+                 _format_megabytes(record.peak_rss_bytes)) for record in self.records]
+        rows.append(('total', '', '', f"{self.wall_seconds or 0:.3f}", f"{self.cpu_seconds or 0:.3f}",
+                     _format_megabytes(self.peak_memory_bytes), _format_megabytes(self.peak_rss_bytes)))
+        widths = [max(len(row[column]) for row in [header, *rows]) for column in range(len(header))]
+        lines = []
+        for row in [header, *rows]:
+            # The names are aligned to the left, the measures to the right
+            lines.append('  '.join(value.ljust(width) if column < 2 else value.rjust(width)
+                                   for column, (value, width) in enumerate(zip(row, widths))).rstrip())
+        lines.insert(1, '-' * len(lines[0]))
+        return '\n'.join(lines)
+
+
+def is_profiling() -> bool:
+    """
+    Checks whether a profiler is recording the phases.
+    """
+    return _active_profiler is not None
+
+
+@contextlib.contextmanager
+def profile_phase(phase: str, file: str | None = None):
+    """
+    Records the code run in the context as a phase of the active profiler, if any.
+
+    :param phase: Name of the phase, e.g. 'render'.
+    :param file: Name of the file the phase works on, e.g. an input file, optional.
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+    record, started = profiler.start_phase(phase, file)
+    try:
+        yield
+    finally:
+        profiler.stop_phase(record, started)
+
+
+def profile_stream(phase: str, chunks, file: str | None = None):
+    """
+    Records the production of the chunks of a stream (e.g. the rendered output) as a phase of the active profiler.
+    The phase runs whenever the next chunk is requested, e.g. by the writing of a streamed output.
+
+    :param phase: Name of the phase, e.g. 'render'.
+    :param chunks: Iterable of the chunks.
+    :param file: Name of the file the phase works on, optional.
+    :return: Iterable of the same chunks.
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        return chunks
+    return _profile_chunks(profiler, phase, file, iter(chunks))
+
+
+def _profile_chunks(profiler: Profiler, phase: str, file: str | None, chunks):
+    """
+    Yields the chunks, recording the production of every chunk as a call of the phase.
+    """
+    while True:
+        record, started = profiler.start_phase(phase, file)
+        try:
+            chunk = next(chunks, _END)
+        finally:
+            profiler.stop_phase(record, started)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+def get_peak_rss() -> int | None:
+    """
+    Returns the peak resident set size of the process in bytes, or None if it is not available (on Windows).
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024  # Reported in kilobytes except on macOS
+
+
+def _format_megabytes(size: int | None) -> str:
+    """
+    Formats a size in bytes as megabytes for the summary table.
+    """
+    return '-' if size is None else f"{size / MEGABYTE:.1f}"
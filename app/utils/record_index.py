@@ -0,0 +1,171 @@
+"""
+This module provides the hash indexes of the data sources used by the table helpers of JinjaXcat templates
+(see jinja_extensions/tables.py). An index is built once per data source and column and kept in a cache,
+so the lookups made while rendering take constant time instead of scanning the whole data source.
+The cached indexes hold the positions of the rows only, like the category trees of the BMEcat helpers, and are bound to
+the data source passed in on every call, so the cache does not keep the data sources (e.g. the tables of the sessions
+which are gone) alive. Only the rows of data sources which can not be accessed by position (e.g. lazily read CSV files)
+are kept with their index. The indexes are shared by all the renders, so they are returned as read-only mappings.
+"""
+
+# Standard library imports
+import threading
+from collections.abc import Mapping, Sequence
+
+# Third party imports
+import cachetools
+
+# Local imports
+from .data_sources import get_fingerprint
+
+INDEX_CACHE_SIZE = 64  # Maximum number of indexes (and joined data sources) kept in memory
+
+_indexes = cachetools.LRUCache(maxsize=INDEX_CACHE_SIZE)
+_indexes_lock = threading.Lock()
+
+
+class RowIndex(Mapping):
+    """
+    A read-only index {value: row} of a data source, mapping the values to the positions of the rows in the cache.
+    """
+    __slots__ = ('positions', 'rows')
+
+    def __init__(self, positions: dict, rows: Sequence):
+        """
+        :param positions: The cached index of the positions of the rows.
+        :param rows: The rows of the data source.
+        """
+        self.positions = positions
+        self.rows = rows
+
+    def __getitem__(self, value):
+        return self.rows[self.positions[value]]
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class GroupIndex(RowIndex):
+    """
+    A read-only index {value: (rows)} of a data source, mapping the values to the positions of the rows in the cache.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, value):
+        return tuple(self.rows[position] for position in self.positions[value])
+
+
+def get_unique_index(data, column) -> RowIndex:
+    """
+    Returns the index {value: row} of a column. If a value appears in several rows, the first row is indexed.
+
+    :param data: The data source (a list of records).
+    :param column: The indexed column.
+    :return: Read-only mapping of the values of the column to the rows.
+    """
+    positions, (rows,) = _get_cached(('unique', column), (data,), lambda rows: _build_unique_index(rows, column))
+    return RowIndex(positions, rows)
+
+
+def get_group_index(data, column, delimiter: str | None = None) -> GroupIndex:
+    """
+    Returns the index {value: (rows)} of a column, the rows of every value are kept in their original order.
+
+    :param data: The data source (a list of records).
+    :param column: The indexed column.
+    :param delimiter: If given, the cells are split by the delimiter and the row is indexed under every part.
+    :return: Read-only mapping of the values of the column to the tuples of rows.
+    """
+    positions, (rows,) = _get_cached(('group', column, delimiter), (data,),
+                                     lambda rows: _build_group_index(rows, column, delimiter))
+    return GroupIndex(positions, rows)
+
+
+def get_joined(left, right, on, right_on=None, how: str = 'inner') -> list:
+    """
+    Returns the rows of the left data source joined with the matching rows of the right data source.
+    Every matching pair of rows gives one joined row, containing the columns of both rows (the values of the left row
+    are kept when both rows have the same column). The join is built using the group index of the right data source.
+
+    :param left: The left data source.
+    :param right: The right data source.
+    :param on: The column of the left data source.
+    :param right_on: The column of the right data source, the same as 'on' by default.
+    :param how: 'inner' keeps only the left rows having a match, 'left' keeps all the left rows.
+    :return: List of joined rows (dictionaries), built on every call so they can be modified.
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError(f"Unsupported join: {how}, use 'inner' or 'left'")
+    right_on = right_on if right_on is not None else on
+    pairs, (left_rows, right_rows) = _get_cached(
+        ('join', on, right_on, how), (left, right),
+        lambda left_rows, _: _build_join(left_rows, get_group_index(right, right_on).positions, on, how))
+    return [{**right_rows[right_position], **left_rows[left_position]} if right_position is not None
+            else dict(left_rows[left_position]) for left_position, right_position in pairs]
+
+
+def _get_cached(key: tuple, sources, build) -> tuple:
+    """
+    Returns the cached result of build() for the data sources, building it on the first call.
+    The data sources are identified by their fingerprint (see get_fingerprint), which is computed from the content
+    of other data (e.g. a list created in a template). The result refers to the rows by their position, so the cache
+    entry keeps only the rows of the data sources which can not be accessed by position, read into a tuple once.
+
+    :param key: Identifies the result for the given data sources, e.g. the kind of the index and the column.
+    :param sources: Tuple of the data sources.
+    :param build: Function building the result from the rows of the data sources (sequences).
+    :return: Tuple (result, rows) of the cached result and the rows of every data source it refers to.
+    """
+    key = (*(get_fingerprint(source) for source in sources), *key)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+    if cached is None:
+        rows = tuple(source if isinstance(source, Sequence) else tuple(source) for source in sources)
+        cached = build(*rows), tuple(None if source_rows is source else source_rows
+                                     for source_rows, source in zip(rows, sources))
+        with _indexes_lock:
+            _indexes[key] = cached
+    result, kept_rows = cached
+    return result, tuple(source if source_rows is None else source_rows
+                         for source_rows, source in zip(kept_rows, sources))
+
+
+def _build_unique_index(rows: Sequence, column) -> dict:
+    """
+    Builds the index {value: position of the first row having the value} of a column.
+    """
+    index = {}
+    for position, row in enumerate(rows):
+        index.setdefault(row.get(column), position)
+    return index
+
+
+def _build_group_index(rows: Sequence, column, delimiter) -> dict:
+    """
+    Builds the index {value: positions of the rows having the value} of a column, optionally splitting the cells by
+    the delimiter.
+    """
+    index = {}
+    for position, row in enumerate(rows):
+        value = row.get(column)
+        for part in (value.split(delimiter) if delimiter and isinstance(value, str) else [value]):
+            index.setdefault(part, []).append(position)
+    return {value: tuple(positions) for value, positions in index.items()}
+
+
+def _build_join(left_rows: Sequence, right_index: dict, on, how: str) -> tuple:
+    """
+    Builds the pairs of positions (left row, right row) of the joined rows, using the group index of the positions of
+    the right rows. The position of the right row is None for a left row without a match in a left join.
+    """
+    joined = []
+    for position, row in enumerate(left_rows):
+        matches = right_index.get(row.get(on))
+        if matches:
+            joined.extend((position, match) for match in matches)
+        elif how == 'left':
+            joined.append((position, None))
+    return tuple(joined)
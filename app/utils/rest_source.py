@@ -0,0 +1,281 @@
+"""
+This module provides the loading of REST (.rest) input files of JinjaXcat.
+A REST file contains a GET request line, optional headers and optional '# @option value' lines configuring
+the pagination, the timeout and the retries of the request, e.g.:
+
+    GET https://api.example.com/articles?per_page=100
+    Accept: application/json
+    # @pagination page
+    # @items data
+
+All requests share a pooled HTTP session. The pages of a paginated endpoint are fetched (concurrently if possible)
+and their items are merged into one data source. The responses are kept in a cache on the disk and revalidated with
+the ETag and Last-Modified headers, so an unchanged response costs only a 304 round-trip.
+"""
+
+# Standard library imports
+import functools
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Local application/library specific imports
+from .cache_dir import get_cache_dir
+from .disk_cache import DiskCache
+
+REST_POOL_SIZE = 32  # Maximum number of connections kept open to a single host by the shared session
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)  # Response status codes after which the request is retried
+PAGINATION_MODES = ('none', 'page', 'offset', 'cursor', 'link')
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Maximum size of the response cache on the disk
+
+# Options of a REST file and their default values, the type of the default value is the type of the option
+REST_OPTIONS = {
+    'pagination': 'none',  # One of PAGINATION_MODES
+    'items': '',  # Dotted path to the list of items in the response (e.g. 'data'), the whole response by default
+    'page_param': 'page',  # Query parameter with the page number ('page' pagination)
+    'start_page': 1,  # Number of the first page ('page' pagination)
+    'offset_param': 'offset',  # Query parameter with the index of the first item ('offset' pagination)
+    'limit_param': 'limit',  # Query parameter with the number of items per page ('offset' pagination)
+    'page_size': 0,  # Number of items per page, a shorter page is the last one (required by 'offset' pagination)
+    'cursor_param': 'cursor',  # Query parameter with the cursor of the page ('cursor' pagination)
+    'next_cursor': 'next_cursor',  # Dotted path to the cursor of the next page in the response ('cursor' pagination)
+    'concurrency': 4,  # Maximum number of pages fetched at the same time ('page' and 'offset' pagination)
+    'max_pages': 1000,  # Maximum number of pages fetched
+    'timeout': 30.0,  # Timeout of a request (in seconds)
+    'retries': 3,  # Number of retries of a failed request
+    'backoff': 0.5,  # Delay before the first retry (in seconds), doubled for every next retry
+    'cache': True,  # Whether the responses are kept in the response cache
+    'cache_max_age': 0.0,  # Age (in seconds) until which a cached response is used without revalidating it
+}
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def get_session():
+    """
+    Returns the HTTP session shared by all REST inputs, created on the first call.
+    Its connections are pooled, so subsequent requests to the same host do not open new connections.
+    :return: The shared requests.Session object.
+    """
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=REST_POOL_SIZE, pool_maxsize=REST_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@functools.cache
+def get_response_cache() -> DiskCache | None:
+    """
+    Returns the response cache shared by all REST inputs, created on the first call.
+    :return: The DiskCache object, or None if the cache directory is not available.
+    """
+    directory = get_cache_dir('http')
+    return DiskCache(directory, RESPONSE_CACHE_MAX_BYTES) if directory else None
+
+
+def parse_rest_file(string_object: str) -> tuple:
+    """
+    Parses the content of a REST file.
+
+    :param string_object: The decoded content of the REST file.
+    :return: Tuple (url, headers, options), the options are completed with their default values.
+    """
+    lines = string_object.split('\n')  # Split the decoded string into lines
+    method, url = lines[0].split()  # Extract the HTTP method and URL from the first line
+    if method.lower() != 'get':
+        raise ValueError(f"Unsupported HTTP method: {method}")
+
+    headers, options = {}, dict(REST_OPTIONS)
+    for line in lines[1:]:
+        if line.startswith('# @'):
+            key, _, value = line[3:].strip().partition(' ')
+            if key not in REST_OPTIONS:
+                raise ValueError(f"Unknown REST option: {key}")
+            options[key] = _convert_option(REST_OPTIONS[key], value.strip())
+        elif ": " in line:
+            headers[line.split(": ")[0]] = line.split(": ")[1].strip()
+
+    if options['pagination'] not in PAGINATION_MODES:
+        raise ValueError(f"Unknown pagination: {options['pagination']}, use one of {', '.join(PAGINATION_MODES)}")
+    if options['pagination'] == 'offset' and options['page_size'] < 1:
+        raise ValueError("The 'offset' pagination requires the 'page_size' option")
+    return url, headers, options
+
+
+def load_rest(string_object: str) -> list | dict:
+    """
+    Sends the request of a REST file and returns the data of the JSON response.
+    For a paginated endpoint, the items of all the pages are returned in one list.
+
+    :param string_object: The decoded content of the REST file.
+    :return: The data of the response.
+    """
+    url, headers, options = parse_rest_file(string_object)
+    pagination = options['pagination']
+    if pagination == 'none':
+        return _get_path(_fetch(url, headers, options)[0], options['items'])
+    elif pagination == 'cursor':
+        pages = _fetch_cursor_pages(url, headers, options)
+    elif pagination == 'link':
+        pages = _fetch_link_pages(url, headers, options)
+    else:
+        pages = _fetch_numbered_pages(url, headers, options)
+    return [item for page in pages for item in page]
+
+
+def _fetch_numbered_pages(url: str, headers: dict, options: dict):
+    """
+    Yields the items of the pages of a 'page' or 'offset' paginated endpoint. The pages are requested in batches
+    of 'concurrency' pages, until an empty page or a page shorter than 'page_size' is found.
+    """
+    def fetch(index):
+        if options['pagination'] == 'page':
+            params = {options['page_param']: options['start_page'] + index}
+        else:
+            params = {options['offset_param']: index * options['page_size'], options['limit_param']: options['page_size']}
+        return _get_path(_fetch(_set_query_params(url, params), headers, options)[0], options['items'])
+
+    with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+        for start in range(0, options['max_pages'], options['concurrency']):
+            indexes = range(start, min(start + options['concurrency'], options['max_pages']))
+            for items in executor.map(fetch, indexes):
+                yield items
+                if not items or len(items) < options['page_size']:  # The last page
+                    return
+    logger.warning("Stopped fetching '%s' after %d pages", url, options['max_pages'])
+
+
+def _fetch_cursor_pages(url: str, headers: dict, options: dict):
+    """
+    Yields the items of the pages of a 'cursor' paginated endpoint, following the cursors found in the responses.
+    """
+    page_url = url
+    for _ in range(options['max_pages']):
+        data, _ = _fetch(page_url, headers, options)
+        yield _get_path(data, options['items'])
+        cursor = _get_path(data, options['next_cursor'], default=None)
+        if not cursor:
+            return
+        page_url = _set_query_params(url, {options['cursor_param']: cursor})
+    logger.warning("Stopped fetching '%s' after %d pages", url, options['max_pages'])
+
+
+def _fetch_link_pages(url: str, headers: dict, options: dict):
+    """
+    Yields the items of the pages of an endpoint paginated by the 'next' relation of the Link response header.
+    """
+    page_url = url
+    for _ in range(options['max_pages']):
+        data, links = _fetch(page_url, headers, options)
+        yield _get_path(data, options['items'])
+        if 'next' not in links:
+            return
+        page_url = links['next']['url']
+    logger.warning("Stopped fetching '%s' after %d pages", url, options['max_pages'])
+
+
+def _fetch(url: str, headers: dict, options: dict) -> tuple:
+    """
+    Sends a GET request and returns the JSON data and the links of the response, using the response cache.
+    A cached response younger than 'cache_max_age' is returned without any request, an older one is revalidated
+    with the If-None-Match and If-Modified-Since headers.
+
+    :return: Tuple (data, links), the links are parsed from the Link header as in requests.Response.links.
+    """
+    cache = get_response_cache() if options['cache'] else None
+    key = '\n'.join([f"GET {url}", *(f"{name}: {value}" for name, value in sorted(headers.items()))])
+    entry = json.loads(cache.get(key) or 'null') if cache else None
+
+    if entry and time.time() - entry['stored_at'] < options['cache_max_age']:
+        return entry['data'], entry['links']  # Fresh enough, no request is needed
+
+    request_headers = dict(headers)
+    if entry and entry['etag']:
+        request_headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        request_headers['If-Modified-Since'] = entry['last_modified']
+    response = _get(url, request_headers, options)
+
+    if entry and response.status_code == 304:  # Not modified, the cached response is still valid
+        logger.info("Using the cached response of '%s' (not modified)", url)
+        if options['cache_max_age'] <= 0:
+            return entry['data'], entry['links']  # The time of the revalidation does not matter
+        entry['stored_at'] = time.time()
+    else:
+        entry = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'data': response.json(),
+            'links': response.links,
+        }
+    if cache and (entry['etag'] or entry['last_modified'] or options['cache_max_age'] > 0):
+        cache.set(key, json.dumps(entry).encode())
+    return entry['data'], entry['links']
+
+
+def _get(url: str, headers: dict, options: dict):
+    """
+    Sends a GET request using the shared session. Connection errors, timeouts and the RETRY_STATUS_CODES responses
+    are retried with an exponential backoff (or after the delay requested by the Retry-After header).
+
+    :return: The requests.Response object with a 2xx status code.
+    """
+    import requests
+
+    for attempt in range(options['retries'] + 1):
+        delay = options['backoff'] * 2 ** attempt
+        try:
+            response = get_session().get(url, headers=headers, timeout=options['timeout'])
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == options['retries']:
+                raise
+            logger.warning("Retrying the request to '%s' in %.1f s: %s", url, delay, e)
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == options['retries']:
+                response.raise_for_status()  # If the response status code is not 2xx, raise an exception
+                return response
+            if response.headers.get('Retry-After', '').isdigit():
+                delay = max(delay, int(response.headers['Retry-After']))
+            logger.warning("Retrying the request to '%s' in %.1f s: status code %d", url, delay, response.status_code)
+        time.sleep(delay)
+
+
+def _convert_option(default, value: str):
+    """
+    Converts the value of an option to the type of its default value.
+    """
+    if isinstance(default, bool):
+        return value.lower() in ('true', 'yes', 'on', '1')
+    return type(default)(value)
+
+
+def _set_query_params(url: str, params: dict) -> str:
+    """
+    Returns the URL with the given query parameters added or replaced.
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update(params)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _get_path(data, path: str, **kwargs):
+    """
+    Returns the value at the dotted path (e.g. 'meta.next_cursor') of the JSON data, or the data itself for an empty
+    path. If a default keyword argument is given, it is returned when the path does not exist.
+    """
+    for key in filter(None, path.split('.')):
+        try:
+            data = data[key]
+        except (KeyError, TypeError):
+            if 'default' in kwargs:
+                return kwargs['default']
+            raise
+    return data
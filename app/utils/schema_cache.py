@@ -0,0 +1,223 @@
+"""
+This module provides the cache of the compiled DTD and XSD schemas used to validate the XML outputs.
+Compiling a big schema (e.g. the BMEcat XSD) takes a noticeable time, so the compiled schemas are kept in a
+process-wide cache shared by the CLI jobs and the Streamlit sessions. A schema is identified by the hash of its content
+and of the content of the local schema files it includes or imports, so a schema uploaded again in another session
+(i.e. to another path) is not compiled again, while a changed schema file is. The hashes are kept by the path, the
+modification time and the size of the files, so unchanged files are not read again.
+"""
+
+# Standard library imports
+import hashlib
+import os
+import threading
+
+# Third party imports
+import cachetools
+
+SCHEMA_CACHE_SIZE = 8  # Maximum number of compiled schemas kept in memory
+SCHEMA_FILE_CACHE_SIZE = 256  # Maximum number of hashed schema files kept in memory
+XSD_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+XSD_REFERENCES = ('include', 'import', 'redefine')  # XSD elements referencing other schema files
+XSD_IDENTITY_CONSTRAINTS = ('key', 'keyref', 'unique')  # XSD elements checking values across elements
+
+_schemas = cachetools.LRUCache(maxsize=SCHEMA_CACHE_SIZE)
+_schema_files = cachetools.LRUCache(maxsize=SCHEMA_FILE_CACHE_SIZE)
+_schemas_lock = threading.Lock()
+
+
+class CompiledSchema:
+    """
+    A compiled DTD or XSD schema shared by several threads. lxml keeps the errors of the last validation on the schema
+    object, so the validations using the same schema are serialized to report the errors of the right document.
+    """
+
+    def __init__(self, schema):
+        """
+        :param schema: The compiled lxml DTD or XMLSchema.
+        """
+        self.schema = schema
+        self._lock = threading.Lock()
+
+    def validate(self, xml_element) -> tuple:
+        """
+        Validates an XML document or element against the schema.
+
+        :param xml_element: The parsed XML document or element.
+        :return: Tuple (is_valid, error_log) with the result of the validation and a copy of its errors.
+        """
+        with self._lock:
+            is_valid = self.schema.validate(xml_element)
+            return is_valid, self.schema.error_log.copy()
+
+
+def get_schema(schema_path: str) -> CompiledSchema:
+    """
+    Returns the compiled DTD or XSD schema, compiling it only if it is not in the cache yet.
+
+    :param schema_path: Path to the schema file, the schema type is given by its extension (.dtd or .xsd).
+    :return: Instance of CompiledSchema.
+    """
+    schema_type = schema_path[schema_path.rfind("."):]
+    key = (schema_type, *_get_schema_hashes(schema_path, schema_type))
+    with _schemas_lock:
+        schema = _schemas.get(key)
+    if schema is None:
+        schema = CompiledSchema(_compile_schema(schema_path, schema_type))
+        with _schemas_lock:
+            schema = _schemas.setdefault(key, schema)  # Keep the schema compiled first by concurrent sessions
+    return schema
+
+
+def get_clearable_elements(schema_path: str) -> frozenset:
+    """
+    Returns the tags (including the target namespace) of the globally declared elements of an XSD schema that can be
+    cleared once they were validated on their own, leaving a skeleton of the document validated by the schema returned
+    by get_skeleton_schema. The elements of substitution groups can not be cleared, and no element can be cleared if the
+    schema has identity constraints, which check the content of the elements across the document.
+
+    :param schema_path: Path to the XSD schema file.
+    :return: Set of the tags, empty if no element can be cleared.
+    """
+    from lxml import etree
+
+    hashes = _get_schema_hashes(schema_path, '.xsd')
+    with _schemas_lock:
+        if ('clearable', *hashes) in _schemas:
+            return _schemas['clearable', *hashes]
+    tags = frozenset()
+    paths, seen, constrained = [os.path.abspath(schema_path)], set(), False
+    while paths and not constrained:  # Identity constraints in any of the schema files make the skeletons invalid
+        path = paths.pop()
+        if path not in seen:
+            seen.add(path)
+            constraints = etree.parse(path).iter(*(f'{{{XSD_NAMESPACE}}}{tag}' for tag in XSD_IDENTITY_CONSTRAINTS))
+            constrained = next(constraints, None) is not None
+            paths += _get_schema_file(path, '.xsd')[1]
+    if not constrained:
+        schema_root = etree.parse(schema_path).getroot()
+        tags = frozenset(_get_tag(schema_root, element) for element in _get_global_declarations(schema_root)
+                         if not element.get('substitutionGroup'))
+    with _schemas_lock:
+        _schemas['clearable', *hashes] = tags
+    return tags
+
+
+def get_skeleton_schema(schema_path: str, tags) -> CompiledSchema:
+    """
+    Returns the XSD schema of the skeletons of the documents whose elements with the given tags (see
+    get_clearable_elements) were validated on their own and cleared: the global declarations of these elements accept
+    any content and attributes, everything else is validated as by the original schema.
+
+    :param schema_path: Path to the XSD schema file.
+    :param tags: The tags of the cleared elements, including the target namespace.
+    :return: Instance of CompiledSchema.
+    """
+    from lxml import etree
+
+    key = ('skeleton', frozenset(tags), *_get_schema_hashes(schema_path, '.xsd'))
+    with _schemas_lock:
+        schema = _schemas.get(key)
+    if schema is None:
+        schema_tree = etree.parse(schema_path)  # Keeps the path of the file, so the relative references are resolved
+        for element in _get_global_declarations(schema_tree.getroot()):
+            if _get_tag(schema_tree.getroot(), element) in tags:
+                for attribute in ('type', 'fixed', 'default'):
+                    element.attrib.pop(attribute, None)  # An element declared without a type has the type xs:anyType
+                for type_definition in element.iterchildren(f'{{{XSD_NAMESPACE}}}complexType',
+                                                            f'{{{XSD_NAMESPACE}}}simpleType'):
+                    element.remove(type_definition)
+        schema = CompiledSchema(etree.XMLSchema(schema_tree))
+        with _schemas_lock:
+            schema = _schemas.setdefault(key, schema)
+    return schema
+
+
+def preload_schemas(schema_paths):
+    """
+    Compiles the schemas into the cache, e.g. before the jobs using them are run.
+
+    :param schema_paths: Paths to the schema files.
+    """
+    for schema_path in dict.fromkeys(schema_paths):
+        get_schema(schema_path)
+
+
+def _compile_schema(schema_path: str, schema_type: str):
+    """
+    Compiles the DTD or XSD schema.
+    """
+    from lxml import etree
+
+    if schema_type == '.dtd':
+        return etree.DTD(file=schema_path)  # Load the DTD schema
+    return etree.XMLSchema(etree.parse(schema_path))  # Load the XSD schema
+
+
+def _get_global_declarations(schema_root) -> list:
+    """
+    Returns the global element declarations of an XSD schema.
+    """
+    return list(schema_root.iterchildren(f'{{{XSD_NAMESPACE}}}element'))
+
+
+def _get_tag(schema_root, element) -> str:
+    """
+    Returns the tag of the elements declared by a global declaration, including the target namespace of the schema.
+    """
+    namespace = schema_root.get('targetNamespace')
+    return f"{{{namespace}}}{element.get('name')}" if namespace else element.get('name')
+
+
+def _get_schema_hashes(schema_path: str, schema_type: str) -> tuple:
+    """
+    Returns the hashes of the schema file and of the local schema files it includes or imports (recursively).
+    """
+    hashes, paths, seen = [], [os.path.abspath(schema_path)], set()
+    while paths:
+        path = paths.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        digest, references = _get_schema_file(path, schema_type)
+        hashes.append(digest)
+        paths += references
+    return tuple(hashes)
+
+
+def _get_schema_file(path: str, schema_type: str) -> tuple:
+    """
+    Returns the hash of a schema file and the paths of the local schema files it references, reading the file only if
+    it changed since it was hashed.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _schemas_lock:
+        schema_file = _schema_files.get(key)
+    if schema_file is None:
+        with open(path, 'rb') as file:
+            content = file.read()
+        references = _get_references(path, content) if schema_type == '.xsd' else []
+        schema_file = (hashlib.blake2b(content, digest_size=16).digest(), references)
+        with _schemas_lock:
+            _schema_files[key] = schema_file
+    return schema_file
+
+
+def _get_references(path: str, content: bytes) -> list:
+    """
+    Returns the paths of the local files included, imported or redefined by an XSD schema.
+    """
+    from lxml import etree
+
+    try:
+        schema_root = etree.fromstring(content, base_url=path)
+    except etree.XMLSyntaxError:
+        return []  # The error is reported when the schema is compiled
+    references = []
+    for tag in XSD_REFERENCES:
+        for element in schema_root.iterchildren(f'{{{XSD_NAMESPACE}}}{tag}'):
+            location = element.get('schemaLocation')
+            if location and '://' not in location:  # Remote schemas are not hashed
+                references.append(os.path.abspath(os.path.join(os.path.dirname(path), location)))
+    return [reference for reference in references if os.path.isfile(reference)]
@@ -0,0 +1,82 @@
+"""
+This module provides the signing of the entries of the caches on the disk which are loaded as code or objects (the
+pickled artifacts and the compiled templates). The entries are signed with a secret key kept in the private cache
+directory, so an entry whose signature does not match (e.g. a file placed in the cache directory by another user) is
+never loaded.
+"""
+
+# Standard library imports
+import functools
+import hashlib
+import hmac
+import os
+import secrets
+
+# Local application/library specific imports
+from .cache_dir import get_cache_dir
+
+SIGNING_KEY_FILE = 'artifacts.key'  # Name of the file of the key signing the cache entries, in the 'keys' directory
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+@functools.cache
+def get_signing_key() -> bytes | None:
+    """
+    Returns the secret key signing the cache entries on the disk, generating it on the first use. The key file is
+    readable by the owner only and is shared by the processes using the same cache directory.
+    :return: The key, or None if the key file can not be read or created.
+    """
+    directory = get_cache_dir('keys')
+    if directory is None:
+        return None
+    path = os.path.join(directory, SIGNING_KEY_FILE)
+    try:
+        with open(path, 'rb') as file:
+            return file.read() or None
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return None
+    temporary_path = f"{path}.{secrets.token_hex(8)}.tmp"
+    try:
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(secrets.token_bytes(32))
+        try:
+            os.link(temporary_path, path)  # Fails if another process created the key in the meantime
+        except FileExistsError:
+            pass
+        with open(path, 'rb') as file:
+            return file.read() or None
+    except OSError:
+        return None
+    finally:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def sign(value: bytes) -> bytes:
+    """
+    Returns the value preceded by its signature, to be stored in a cache on the disk.
+
+    :param value: The value of the cache entry.
+    :return: The signed value.
+    """
+    return hmac.digest(get_signing_key(), value, 'sha256') + value
+
+
+def verify(signed: bytes | None) -> bytes | None:
+    """
+    Returns the value of a signed cache entry if its signature matches.
+
+    :param signed: The signed value read from the cache, or None if there is no such entry.
+    :return: The value, or None if there is no entry or its signature does not match.
+    """
+    if signed is None:
+        return None
+    signature, value = signed[:SIGNATURE_SIZE], signed[SIGNATURE_SIZE:]
+    if not hmac.compare_digest(signature, hmac.digest(get_signing_key(), value, 'sha256')):
+        return None
+    return value
@@ -0,0 +1,77 @@
+"""
+This module provides the URL status checking used by the get_status_code template function of JinjaXcat.
+The URLs of a whole data column can be checked at once, concurrently over the pooled HTTP session of the REST inputs,
+and the status codes are cached for URL_STATUS_TTL seconds, so checking a URL while rendering is a dictionary lookup.
+A failed request (e.g. a transient network error) is only cached for URL_FAILURE_TTL seconds, long enough for the
+checks of the same render not to wait for the URL again.
+"""
+
+# Standard library imports
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Third party imports
+import cachetools
+
+# Local application/library specific imports
+from .rest_source import get_session
+
+URL_STATUS_TTL = 3600  # Number of seconds a checked status code is kept in the cache
+URL_FAILURE_TTL = 60  # Number of seconds a failed request is kept in the cache
+URL_STATUS_CACHE_SIZE = 500000  # Maximum number of status codes kept in the cache
+URL_STATUS_CONCURRENCY = 16  # Maximum number of URLs checked at the same time
+URL_STATUS_TIMEOUT = 10  # Timeout of a request (in seconds)
+
+_status_cache = cachetools.TTLCache(maxsize=URL_STATUS_CACHE_SIZE, ttl=URL_STATUS_TTL)
+_failure_cache = cachetools.TTLCache(maxsize=URL_STATUS_CACHE_SIZE, ttl=URL_FAILURE_TTL)  # URLs of failed requests
+_status_cache_lock = threading.Lock()
+
+
+def check_urls(urls) -> dict:
+    """
+    Checks the status codes of the URLs. The URLs missing in the cache are checked concurrently.
+
+    :param urls: Iterable of URLs, empty values and duplicates are skipped.
+    :return: Dictionary {url: status code}, the status code is None if the request failed.
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))  # Distinct URLs, in their original order
+    with _status_cache_lock:
+        # A failed request is cached without a status code
+        status_codes = {url: _status_cache.get(url) for url in urls if url in _status_cache or url in _failure_cache}
+
+    missing_urls = [url for url in urls if url not in status_codes]
+    if missing_urls:
+        with ThreadPoolExecutor(max_workers=min(URL_STATUS_CONCURRENCY, len(missing_urls))) as executor:
+            checked = dict(zip(missing_urls, executor.map(_request_status_code, missing_urls)))
+        with _status_cache_lock:
+            for url, status_code in checked.items():
+                if status_code is None:
+                    _failure_cache[url] = None
+                else:
+                    _status_cache[url] = status_code
+        status_codes.update(checked)
+    return status_codes
+
+
+def get_status_code(url: str) -> int | None:
+    """
+    Returns the status code of the URL, from the cache if the URL was checked recently.
+
+    :param url: The URL to check.
+    :return: HTTP status code, or None if the request failed.
+    """
+    with _status_cache_lock:
+        if url in _status_cache or url in _failure_cache:
+            return _status_cache.get(url)
+    return check_urls([url]).get(url)
+
+
+def _request_status_code(url: str) -> int | None:
+    """
+    Sends a GET request to the URL and returns its status code. The body of the response is not downloaded.
+    """
+    try:
+        with get_session().get(url, timeout=URL_STATUS_TIMEOUT, stream=True) as response:
+            return response.status_code
+    except Exception:  # Any failure (invalid URL, connection error, timeout, ...) means there is no status code
+        return None
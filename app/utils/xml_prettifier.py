@@ -0,0 +1,225 @@
+"""
+This module provides the pretty printing of XML outputs. The output is parsed incrementally and the indented output is
+produced while it is parsed, so a big catalog is never held in memory as a whole, e.g. when it is streamed from the
+template to the output file.
+
+The result is the same as the one of xml.dom.minidom's toprettyxml (indented by two spaces) without the lines containing
+only white spaces, which was used before. The parser is expat, which minidom is built on, so the text nodes, the CDATA
+sections, the order of the namespace declarations and the document type are written the same way.
+"""
+
+# Standard library imports
+from xml.parsers import expat
+
+XML_DECLARATION = '<?xml version="1.0" ?>'  # The declaration written by minidom, whatever the input declares
+INDENT = '  '  # Indentation added for every level of the elements
+
+
+class _Element:
+    """
+    An element being written. Its last text or CDATA section is kept until it is known whether more text follows and
+    whether it is the only child of the element.
+    """
+    __slots__ = ('tag', 'indent', 'has_children', 'text', 'is_cdata')
+
+    def __init__(self, tag: str, indent: str):
+        self.tag = tag
+        self.indent = indent
+        self.has_children = False  # True once the start tag is closed and the children are written on their own lines
+        self.text = None
+        self.is_cdata = False
+
+
+class _XmlPrettifier:
+    """
+    Writes the nodes reported by the expat parser indented, collecting the written pieces in a list.
+    """
+
+    def __init__(self):
+        self.pieces = [XML_DECLARATION, '\n']
+        self._elements = []
+        self._namespaces = []  # Namespace declarations of the next element, in their order in the document
+        self._in_cdata = False
+        self._cdata_continues = False  # True while the data of the same CDATA section is reported
+        self._internal_subset = None
+        self.parser = expat.ParserCreate(namespace_separator=' ')
+        self.parser.namespace_prefixes = True
+        self.parser.buffer_text = True
+        self.parser.ordered_attributes = True
+        self.parser.specified_attributes = True
+        self.parser.StartElementHandler = self._start_element
+        self.parser.EndElementHandler = self._end_element
+        self.parser.CharacterDataHandler = self._character_data
+        self.parser.StartNamespaceDeclHandler = self._start_namespace
+        self.parser.StartCdataSectionHandler = self._start_cdata
+        self.parser.EndCdataSectionHandler = self._end_cdata
+        self.parser.CommentHandler = self._comment
+        self.parser.ProcessingInstructionHandler = self._processing_instruction
+        self.parser.StartDoctypeDeclHandler = self._start_doctype
+        self.parser.EndDoctypeDeclHandler = self._end_doctype
+
+    def _start_child(self) -> str:
+        """
+        Prepares the current element (if any) for the next child node and returns the indentation of the child.
+        """
+        if not self._elements:
+            return ''
+        element = self._elements[-1]
+        if not element.has_children:
+            self.pieces.append('>\n')
+            element.has_children = True
+        self._write_text(element)
+        return element.indent + INDENT
+
+    def _write_text(self, element: _Element):
+        """
+        Writes the text kept by the element on its own line, a CDATA section is written as is.
+        """
+        if element.text is not None:
+            self.pieces.append(f'<![CDATA[{element.text}]]>' if element.is_cdata
+                               else _escape(f'{element.indent}{INDENT}{element.text}\n'))
+            element.text = None
+
+    def _start_element(self, name: str, attributes: list):
+        indent = self._start_child()
+        self._elements.append(_Element(_get_qualified_name(name), indent))
+        self.pieces.append(f'{indent}<{self._elements[-1].tag}')
+        for prefix, uri in self._namespaces:
+            self.pieces.append(f' xmlns:{prefix}="{_escape(uri)}"' if prefix else f' xmlns="{_escape(uri)}"')
+        self._namespaces.clear()
+        for i in range(0, len(attributes), 2):
+            self.pieces.append(f' {_get_qualified_name(attributes[i])}="{_escape(attributes[i + 1])}"')
+
+    def _end_element(self, name: str):
+        element = self._elements.pop()
+        if element.has_children:
+            self._write_text(element)
+            self.pieces.append(f'{element.indent}</{element.tag}>\n')
+        elif element.text is not None:  # An element having only a text is written on one line
+            text = f'<![CDATA[{element.text}]]>' if element.is_cdata else _escape(element.text)
+            self.pieces.append(f'>{text}</{element.tag}>\n')
+        else:
+            self.pieces.append('/>\n')
+
+    def _character_data(self, data: str):
+        if not self._elements:
+            return
+        element = self._elements[-1]
+        if element.text is not None and element.is_cdata == self._in_cdata \
+                and (self._cdata_continues or not self._in_cdata):
+            element.text += data  # Adjacent texts are joined, like the data of the same CDATA section
+            return
+        if element.text is not None:
+            self._start_child()
+        element.text, element.is_cdata = data, self._in_cdata
+        self._cdata_continues = self._in_cdata
+
+    def _start_namespace(self, prefix: str | None, uri: str):
+        self._namespaces.append((prefix, uri))
+
+    def _start_cdata(self):
+        self._in_cdata, self._cdata_continues = True, False
+
+    def _end_cdata(self):
+        self._in_cdata, self._cdata_continues = False, False
+
+    def _comment(self, data: str):
+        indent = self._start_child()
+        self.pieces.append(f'{indent}<!--{data}-->\n')
+
+    def _processing_instruction(self, target: str, data: str):
+        indent = self._start_child()
+        self.pieces.append(f'{indent}<?{target} {data}?>\n')
+
+    def _start_doctype(self, name: str, system_id: str | None, public_id: str | None, has_internal_subset: bool):
+        self.pieces.append(f'<!DOCTYPE {name}')
+        if public_id:
+            self.pieces.append(f"\n  PUBLIC '{public_id}'\n  '{system_id}'")
+        elif system_id:
+            self.pieces.append(f"\n  SYSTEM '{system_id}'")
+        if has_internal_subset:
+            # The internal subset is written as it is in the document, so its markup is collected unparsed
+            self._internal_subset = []
+            self.parser.CommentHandler = self.parser.ProcessingInstructionHandler = None
+            self.parser.DefaultHandlerExpand = self._internal_subset.append
+        else:
+            self.pieces.append('>\n')
+
+    def _end_doctype(self):
+        if self._internal_subset is not None:
+            subset = ''.join(self._internal_subset).replace('\r\n', '\n').replace('\r', '\n')
+            self.pieces.append(f' [{subset}]>\n')
+            self._internal_subset = None
+            self.parser.DefaultHandlerExpand = None
+            self.parser.CommentHandler = self._comment
+            self.parser.ProcessingInstructionHandler = self._processing_instruction
+
+
+def prettify_xml_stream(chunks):
+    """
+    Pretty prints an XML document while its chunks are iterated, e.g. while it is being rendered.
+
+    :param chunks: Iterable of the chunks (str or bytes) of the XML document.
+    :return: Generator yielding the chunks of the indented document.
+    :raises ValueError: If the document is not well-formed XML.
+    """
+    prettifier = _XmlPrettifier()
+    rest, started = '', False  # The last line, which may still continue, and whether a line was already yielded
+    for chunk in _parse_chunks(prettifier, chunks):
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        lines = [line for line in lines if line.strip()]  # Erase the lines containing only white spaces
+        if lines:
+            yield ('\n' if started else '') + '\n'.join(lines)
+            started = True
+    if rest.strip():
+        yield ('\n' if started else '') + rest
+
+
+def prettify_xml(content: str | bytes) -> str:
+    """
+    Pretty prints an XML document.
+
+    :param content: The XML document.
+    :return: The indented document.
+    :raises ValueError: If the document is not well-formed XML.
+    """
+    return ''.join(prettify_xml_stream([content]))
+
+
+def _parse_chunks(prettifier: _XmlPrettifier, chunks):
+    """
+    Feeds the chunks to the parser and yields the pieces written for every chunk.
+    """
+    try:
+        for chunk in chunks:
+            prettifier.parser.Parse(chunk, False)
+            yield _take_pieces(prettifier)
+        prettifier.parser.Parse(b'', True)
+    except expat.ExpatError as e:
+        raise ValueError(f"The output is not well-formed XML and can not be beautified: {e}") from None
+    yield _take_pieces(prettifier)
+
+
+def _take_pieces(prettifier: _XmlPrettifier) -> str:
+    """
+    Returns the pieces written so far and empties the list of pieces.
+    """
+    pieces = ''.join(prettifier.pieces)
+    prettifier.pieces.clear()
+    return pieces
+
+
+def _get_qualified_name(name: str) -> str:
+    """
+    Returns the qualified name (prefix:name) of an element or attribute reported as 'uri name prefix' by expat.
+    """
+    parts = name.split(' ')
+    return f'{parts[2]}:{parts[1]}' if len(parts) == 3 else parts[-1]
+
+
+def _escape(data: str) -> str:
+    """
+    Escapes a text or an attribute value the way minidom does.
+    """
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
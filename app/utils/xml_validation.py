@@ -0,0 +1,343 @@
+"""
+This module provides the validation of XML outputs against DTD and XSD schemas.
+Besides validating a complete document, the StreamingXmlValidator validates a document while it is being rendered:
+the rendered chunks are parsed incrementally in a background thread, and with an XSD schema the completed elements
+(e.g. the ARTICLE elements of a BMEcat catalog) are validated as soon as they are parsed, so an invalid output can be
+rejected after its first errors instead of after the whole document has been rendered. The validated elements are then
+cleared, and the skeleton of the document (the emptied elements within the rest of the document) is validated once
+at the end against the schema relaxed by get_skeleton_schema, so the content of the elements is neither validated twice
+nor kept in memory (only the empty elements are). Otherwise, i.e. without unit validation or if the schema does not
+allow to clear the elements (see get_clearable_elements, e.g. the BMEcat schema whose identity constraints span the
+articles), the whole document is kept in memory and validated at the end, the completed elements a second time.
+"""
+
+# Standard library imports
+import queue
+import threading
+from collections import namedtuple
+
+# Local application/library specific imports
+from .schema_cache import (
+    XSD_NAMESPACE,
+    get_clearable_elements,
+    get_schema,
+    get_skeleton_schema,
+)
+
+# Defining a named tuple to hold the result data
+Result = namedtuple('Result', ['type', 'msg', 'log'])
+
+VALIDATION_UNIT_DEPTH = 2  # Default depth of the elements validated while streaming, e.g. the ARTICLEs of a BMEcat
+VALIDATION_QUEUE_SIZE = 64  # Maximum number of rendered chunks waiting to be parsed
+
+
+def validate_xml(xml_file, schema_path, max_output_errors=100) -> Result:
+    """
+    Validate an XML file against a DTD or XSD schema.
+    :param xml_file: String containing the XML file content.
+    :param schema_path: String containing the path to the schema file.
+    :param max_output_errors: An integer representing the maximum number of errors to be displayed in output report.
+    :return: Instance of Result with status, title and message.
+    """
+
+    from lxml import etree
+
+    schema_type = schema_path[schema_path.rfind("."):]  # Extract schema type by retrieving the file extension
+    try:
+        xml_doc = etree.fromstring(xml_file)  # Parse the XML file
+    except etree.XMLSyntaxError as e:
+        # If XML parsing fails, return Result with failure status and error details
+        return Result("KO", e.__class__.__name__, e)
+    return _validate_document(xml_doc, schema_path, schema_type, max_output_errors)
+
+
+class StreamingXmlValidator:
+    """
+    Validates an XML document fed chunk by chunk, e.g. while it is being rendered, in a background thread.
+    Syntax errors stop the validation right away. With an XSD schema and max_errors, the globally declared elements at
+    the given depth are validated as soon as they are complete, and the validation stops (see the failed property)
+    once max_errors errors are found, the validated elements are cleared and the skeleton of the document is validated
+    after the last chunk. Otherwise, the complete document is validated after the last chunk, giving the same result as
+    validate_xml.
+    """
+
+    def __init__(self, schema_path: str, max_errors: int | None = None, max_output_errors: int = 100,
+                 unit_depth: int = VALIDATION_UNIT_DEPTH):
+        """
+        Starts the background thread parsing the chunks.
+
+        :param schema_path: Path to the DTD or XSD schema file.
+        :param max_errors: If given, the validation stops after this number of errors is found in the completed
+                           elements (XSD schemas only).
+        :param max_output_errors: The maximum number of errors displayed in the report.
+        :param unit_depth: Depth of the elements validated as soon as they are complete, the root has the depth 0.
+        """
+        self.schema_path = schema_path
+        self.schema_type = schema_path[schema_path.rfind("."):]
+        self.max_errors = max_errors
+        self.max_output_errors = max_output_errors
+        self.unit_depth = unit_depth
+        self._chunks = queue.Queue(maxsize=VALIDATION_QUEUE_SIZE)
+        self._failed = threading.Event()
+        self._aborted = threading.Event()
+        self._result = None
+        self._all_chunks_read = False
+        self.interrupted = False  # True if the validation stopped the iteration of the chunks (see validate)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def failed(self) -> bool:
+        """
+        True once the document is known to be invalid, the rest of it does not need to be rendered.
+        """
+        return self._failed.is_set()
+
+    def feed(self, chunk: str | bytes):
+        """
+        Passes the next chunk of the document to the validation. Chunks fed after the validation failed are ignored.
+        """
+        if not self.failed:
+            self._chunks.put(chunk)
+
+    def validate(self, chunks):
+        """
+        Passes the chunks to the validation while they are iterated, e.g. while they are written to a file.
+        The iteration stops early if the validation fails.
+
+        :param chunks: Iterable of the chunks of the document.
+        :return: Generator yielding the chunks.
+        """
+        for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+            if self.failed:
+                self.interrupted = True
+                return
+
+    def close(self) -> Result:
+        """
+        Waits until all the chunks are validated and returns the result of the validation.
+
+        :return: Instance of Result with status, title and message.
+        """
+        self._chunks.put(None)
+        self._thread.join()
+        return self._result
+
+    def abort(self):
+        """
+        Stops the validation of a document that will not be completed, e.g. because its rendering failed, without
+        validating the chunks fed so far. The background thread ends and the parsed document is released.
+        """
+        self._aborted.set()
+        self._chunks.put(None)
+        self._thread.join()
+
+    def _run(self):
+        """
+        Parses the chunks in the background thread, the chunks left after a failure are discarded.
+        """
+        try:
+            self._result = self._validate_chunks()
+        except Exception as e:  # The error is reported as the result of the validation, the feeding must not block
+            self._result = Result("KO", e.__class__.__name__, e)
+        if self._result.type != "OK":
+            self._failed.set()
+        while not self._all_chunks_read:
+            self._all_chunks_read = self._chunks.get() is None
+
+    def _validate_chunks(self) -> Result:
+        """
+        Parses the chunks incrementally and validates the completed elements, then the skeleton or the whole document.
+        """
+        from lxml import etree
+
+        if self.schema_type not in ('.dtd', '.xsd'):
+            return Result("KO", "Error", "The schema type is not recognize")
+        unit_schema, unit_tags, clearable_tags, cleared_tags = None, set(), frozenset(), set()
+        if self.schema_type == '.xsd' and self.max_errors:
+            unit_schema = get_schema(self.schema_path)
+            unit_tags = _get_global_elements(self.schema_path)  # Only these elements can be validated on their own
+            clearable_tags = get_clearable_elements(self.schema_path)
+
+        # Without unit validation, the chunks are only parsed; otherwise only the start of the root is reported, the
+        # completed units are then found by walking the tree built so far (events for each element are much slower)
+        if unit_schema is None:
+            parser = etree.XMLParser()
+        else:
+            parser = etree.XMLPullParser(events=('start',), tag=_get_root_elements(self.schema_path))
+        root, unit, errors = None, None, []
+        while (chunk := self._chunks.get()) is not None:
+            try:
+                parser.feed(chunk)
+            except etree.XMLSyntaxError as e:
+                return Result("KO", e.__class__.__name__, e)
+            if unit_schema is None:
+                continue
+            for _, element in parser.read_events():
+                root = element if root is None else root
+            while root is not None and (next_unit := _get_next_unit(root, unit, self.unit_depth)) is not None \
+                    and _is_complete(next_unit, root):
+                unit = next_unit
+                errors += _validate_unit(unit, unit_schema, unit_tags, clearable_tags, cleared_tags)
+                if len(errors) >= self.max_errors:
+                    return self._get_stopped_result(errors)
+        self._all_chunks_read = True
+        if self._aborted.is_set():
+            return Result("KO", "Aborted", "The validation was aborted before the end of the document.")
+        try:
+            xml_doc = parser.close()
+        except etree.XMLSyntaxError as e:
+            return Result("KO", e.__class__.__name__, e)
+        if unit_schema is None or not clearable_tags:
+            return _validate_document(xml_doc, self.schema_path, self.schema_type, self.max_output_errors)
+
+        # The last units are complete once the document is
+        root = xml_doc if root is None else root
+        while (unit := _get_next_unit(root, unit, self.unit_depth)) is not None:
+            errors += _validate_unit(unit, unit_schema, unit_tags, clearable_tags, cleared_tags)
+        if not cleared_tags:
+            return _validate_document(xml_doc, self.schema_path, self.schema_type, self.max_output_errors)
+
+        # The skeleton does not validate the elements having the tags of the cleared units, the ones at other depths
+        # (not cleared) are validated on their own
+        for element in xml_doc.iter(*cleared_tags):
+            if sum(1 for _ in element.iterancestors()) != self.unit_depth:
+                errors += _validate_unit(element, unit_schema, unit_tags, frozenset(), cleared_tags)
+        is_valid, skeleton_errors = get_skeleton_schema(self.schema_path, cleared_tags).validate(xml_doc)
+        errors = sorted([*errors, *skeleton_errors], key=lambda error: error.line)
+        return _get_result(is_valid and not errors, errors, self.schema_type, self.max_output_errors)
+
+    def _get_stopped_result(self, errors: list) -> Result:
+        """
+        Returns the result of a validation stopped after max_errors errors.
+        """
+        ko_msg = (f"The XML output does not conform to the specified ({self.schema_type.upper()}) schema!\n\n"
+                  f"The validation was stopped after {len(errors)} errors, displaying "
+                  f"{min(self.max_output_errors, len(errors))} of them:\n\n"
+                  + "\n".join(str(error) for error in errors[:self.max_output_errors]))
+        return Result("KO", "Validation Failed", ko_msg)
+
+
+def _validate_unit(unit, unit_schema, unit_tags: set, clearable_tags: frozenset, cleared_tags: set) -> list:
+    """
+    Validates a completed element on its own if it is declared globally, and clears it if it can be cleared.
+
+    :return: List of the validation errors of the element.
+    """
+    if unit.tag not in unit_tags:
+        return []
+    is_valid, errors = unit_schema.validate(unit)
+    if unit.tag in clearable_tags:
+        unit.clear(keep_tail=True)  # Only the empty element is kept, for the validation of the skeleton
+        cleared_tags.add(unit.tag)
+    return [] if is_valid else list(errors)
+
+
+def _get_global_elements(schema_path: str) -> set:
+    """
+    Returns the tags (including the target namespace) of the elements declared globally in the XSD schema.
+    """
+    from lxml import etree
+
+    schema_root = etree.parse(schema_path).getroot()
+    namespace = schema_root.get('targetNamespace')
+    names = (element.get('name') for element in schema_root.iterchildren(f'{{{XSD_NAMESPACE}}}element'))
+    return {f'{{{namespace}}}{name}' if namespace else name for name in names}
+
+
+def _get_root_elements(schema_path: str) -> set:
+    """
+    Returns the tags of the globally declared elements which are not referenced by other elements, i.e. the possible
+    roots of the documents (all the global elements if each of them is referenced).
+    """
+    from lxml import etree
+
+    schema_root = etree.parse(schema_path).getroot()
+    references = {element.get('ref').split(':')[-1] for element in schema_root.iter(f'{{{XSD_NAMESPACE}}}element')
+                  if element.get('ref')}
+    global_elements = _get_global_elements(schema_path)
+    return {tag for tag in global_elements if tag.split('}')[-1] not in references} or global_elements
+
+
+def _get_next_unit(root, previous, depth: int):
+    """
+    Returns the element at the given depth following the previous one (the first one if previous is None) in the tree
+    built so far, or None if there is none yet.
+    """
+    from lxml import etree
+
+    element, level, moving_on = (root, 0, False) if previous is None else (previous, depth, True)
+    while True:
+        if not moving_on:
+            if level == depth:
+                return element
+            child = next(element.iterchildren(tag=etree.Element), None)
+            if child is not None:
+                element, level = child, level + 1
+                continue
+        # Move on to the next sibling element, climbing up while there is none
+        moving_on = False
+        while level > 0:
+            sibling = next(element.itersiblings(tag=etree.Element), None)
+            if sibling is not None:
+                element = sibling
+                break
+            element, level = element.getparent(), level - 1
+        else:
+            return None
+
+
+def _is_complete(element, root) -> bool:
+    """
+    Returns True if the end tag of the element was parsed, i.e. if something follows the element or an ancestor.
+    """
+    while element is not root:
+        if element.getnext() is not None:
+            return True
+        element = element.getparent()
+    return False
+
+
+def _validate_document(xml_doc, schema_path: str, schema_type: str, max_output_errors: int) -> Result:
+    """
+    Validates the parsed XML document against the DTD or XSD schema.
+    """
+    from lxml import etree
+
+    if schema_type == '.dtd':  # Validate the XML against the appropriate schema based on the schema type
+        try:
+            schema = get_schema(schema_path)  # Load the compiled DTD schema
+            is_valid, error_log = schema.validate(xml_doc)  # Validate the XML document against the schema
+            errors = error_log.filter_from_errors()  # Get the list of validation errors
+        except (etree.DTDParseError, etree.XMLSyntaxError) as e:
+            # If DTD parsing or validation fails, return Result with failure status and error details
+            return Result("KO", e.__class__.__name__, e)
+    elif schema_type == '.xsd':
+        try:
+            schema = get_schema(schema_path)  # Load the compiled XSD schema
+            is_valid, errors = schema.validate(xml_doc)  # Validate the XML document and get the validation errors
+        except etree.XMLSyntaxError as e:
+            # If XSD parsing or validation fails, return Result with failure status and error details
+            return Result("KO", e.__class__.__name__, e)
+    else:
+        return Result("KO", "Error", "The schema type is not recognize")  # If the schema type is not recognized
+
+    return _get_result(is_valid, errors, schema_type, max_output_errors)
+
+
+def _get_result(is_valid: bool, errors, schema_type: str, max_output_errors: int) -> Result:
+    """
+    Returns the result of a validation, displaying at most max_output_errors errors.
+    """
+    # Log whether the XML is valid or not, and any errors
+    if is_valid:
+        ok_msg = f"The XML output successfully matches the specified ({schema_type.upper()}) schema."
+        return Result("OK", "Validation Passed", ok_msg)
+    else:
+        ko_msg = (f"The XML output does not conform to the specified ({schema_type.upper()}) schema!\n\n"
+                  f"Displaying {min(max_output_errors, len(errors))} out of {len(errors)} errors in the output file:"
+                  f"\n\n{errors[:max_output_errors]}"
+                  )
+        return Result("KO", "Validation Failed", ko_msg)
@@ -0,0 +1,52 @@
+# This script compares the CSV parser settings used by JinjaXcat on a large generated CSV file. To run it, execute:
+# .\venv\Scripts\python.exe .\benchmarks\bench_csv_engines.py [number_of_rows]
+
+import csv
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from utils.data_sources import read_csv  # noqa: E402
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+COLUMNS = ['SUPPLIER_AID', 'EAN', 'DESCRIPTION_SHORT', 'DESCRIPTION_LONG', 'MANUFACTURER_NAME', 'PRICE_AMOUNT',
+           'TAX', 'ORDER_UNIT', 'KEYWORDS', 'CATALOG_GROUP_ID']
+
+
+def generate_csv(rows: int) -> bytes:
+    """
+    Generates a semicolon separated CSV file that resembles a supplier article export.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(COLUMNS)
+    for i in range(rows):
+        writer.writerow([f"{i:08d}", f"99{i:08d}", f"Article {i}", f"Long description of the article {i}; v{i % 7}",
+                         f"Manufacturer {i % 100}", f"{i % 1000},99", "20", "C62", "flexible, fast, versatile",
+                         str(200 + i % 50)])
+    return buffer.getvalue().encode('utf-8')
+
+
+def measure(label: str, function) -> float:
+    """
+    Runs the function and prints the elapsed time.
+    """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40}{elapsed:>8.2f} s")
+    return elapsed
+
+
+if __name__ == '__main__':
+    content = generate_csv(ROWS)
+    print(f"CSV file with {ROWS} rows ({len(content) / 1024 / 1024:.1f} MB)")
+    python_time = measure("python engine (previous behaviour)", lambda: pd.read_csv(
+        io.StringIO(content.decode('utf-8')), dtype=str, sep=';', engine="python").fillna(''))
+    fast_time = measure("read_csv (c engine)", lambda: read_csv(content, 'utf-8', ';'))
+    print(f"Speedup: {python_time / fast_time:.1f}x")
@@ -0,0 +1,68 @@
+# This script measures the import time of the CLI for different kinds of jobs. To run it, execute:
+# .\venv\Scripts\python.exe .\benchmarks\bench_import_time.py
+# Every job runs in a fresh interpreter, so the measured time includes all imports the job triggers.
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 5  # Number of runs per job, the fastest run is reported
+
+# Script run in a fresh interpreter. It reports the time spent importing modules and the heavy modules imported.
+JOB_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, 'app')
+start = time.perf_counter()
+from app import jinjaxcat_cli
+cli_import = time.perf_counter() - start
+if len(sys.argv) > 1:
+    jinjaxcat_cli.run_jinaxcat(sys.argv[1])
+heavy_modules = ['pandas', 'openpyxl', 'lxml', 'requests', 'chardet']
+print(json.dumps({'cli_import': cli_import, 'total': time.perf_counter() - start,
+                  'heavy_modules': [module for module in heavy_modules if module in sys.modules]}))
+"""
+
+TEMPLATE = '<CATALOG>{% for article in data %}<ARTICLE>{{ article["ID"] }}</ARTICLE>{% endfor %}</CATALOG>'
+
+
+def write_job(directory: str, name: str, input_file: str | None, content: str = '', **options) -> str | None:
+    """
+    Writes the input, template and configuration files of a job and returns the path to its configuration.
+    """
+    if input_file is None:
+        return None
+    with open(os.path.join(directory, input_file), 'w') as f:
+        f.write(content)
+    template_path = os.path.join(directory, f'{name}.xml')
+    with open(template_path, 'w') as f:
+        f.write(TEMPLATE.replace('data', input_file.replace('.', '_')))
+    config_path = os.path.join(directory, f'{name}.yml')
+    with open(config_path, 'w') as f:
+        json.dump({'input_files': [os.path.join(directory, input_file)], 'template_file': template_path,
+                   'output_file': os.path.join(directory, f'{name}_output.xml'), **options}, f)
+    return config_path
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jobs = {
+            'import only': None,
+            'json to xml': write_job(temp_dir, 'json', 'data.json', '[{"ID": "1"}, {"ID": "2"}]'),
+            'csv to xml': write_job(temp_dir, 'csv', 'data.csv', 'ID;NAME\n1;a\n2;b\n'),
+            'csv to xml (beautify)': write_job(temp_dir, 'beautify', 'beautify.csv', 'ID;NAME\n1;a\n',
+                                               beautify_output=True),
+        }
+        print(f"{'job':<25}{'cli import':>12}{'total':>10}  heavy modules")
+        for job_name, config_path in jobs.items():
+            runs = []
+            for _ in range(REPEAT):
+                args = [config_path] if config_path else []
+                result = subprocess.run([sys.executable, '-c', JOB_SCRIPT, *args], cwd=ROOT_DIR,
+                                        capture_output=True, text=True, check=True)
+                runs.append(json.loads(result.stdout.splitlines()[-1]))
+            best = min(runs, key=lambda run: run['total'])
+            print(f"{job_name:<25}{best['cli_import'] * 1000:>10.0f}ms{best['total'] * 1000:>8.0f}ms  "
+                  f"{', '.join(best['heavy_modules']) or '-'}")
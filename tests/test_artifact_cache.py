@@ -0,0 +1,105 @@
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import artifact_cache, procesor, signing
+from .helpers import get_file_path
+
+
+# Fixture that stores the artifact cache in a temporary directory
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('JINJAXCAT_CACHE_DIR', str(tmp_path))
+    _clear_caches()
+    yield tmp_path
+    _clear_caches()
+
+
+# Helper that forgets the artifacts kept in memory and the artifact cache on the disk
+def _clear_caches():
+    artifact_cache.get_artifact_cache.cache_clear()
+    signing.get_signing_key.cache_clear()
+    artifact_cache._memory_artifacts.clear()
+    artifact_cache._transient_artifacts.clear()
+
+
+# Helper that loads the test input files, counting the loads
+def _load_test_data(loads):
+    loads.append(1)
+    return procesor.load_data(jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')]))
+
+
+# This test checks that the same files uploaded again are loaded once, also after a restart, and that every call
+# returns its own copy of the data
+def test_get_artifact_is_keyed_by_content(tmp_path):
+    loads = []
+    files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')])
+    data = artifact_cache.get_artifact('data', [artifact_cache.get_files_key(files)], lambda: _load_test_data(loads))
+    artifact_cache._memory_artifacts.clear()  # Simulate a restart, the artifact is read from the disk
+
+    (tmp_path / 'articles.csv').write_bytes(files[0].getvalue())
+    uploaded_again = jinjaxcat_cli.prepare_files([str(tmp_path / 'articles.csv')])
+    cached_data = artifact_cache.get_artifact('data', [artifact_cache.get_files_key(uploaded_again)],
+                                              lambda: _load_test_data(loads))
+    assert len(loads) == 1 and cached_data is not data
+    assert [dict(row) for row in cached_data['articles_csv']] == [dict(row) for row in data['articles_csv']]
+
+    (tmp_path / 'articles.csv').write_bytes(files[0].getvalue() + b'\n')
+    changed = jinjaxcat_cli.prepare_files([str(tmp_path / 'articles.csv')])
+    artifact_cache.get_artifact('data', [artifact_cache.get_files_key(changed)], lambda: _load_test_data(loads))
+    assert len(loads) == 2
+
+
+# This test ensures that the artifacts built from REST inputs are not cached, and that the disk budget is respected
+def test_get_artifact_skips_uncacheable_artifacts(tmp_path, monkeypatch):
+    (tmp_path / 'items.rest').write_text('GET http://localhost/items\n')
+    rest_files = jinjaxcat_cli.prepare_files([str(tmp_path / 'items.rest')])
+    assert artifact_cache.get_files_key(rest_files) is None
+    builds = []
+    for _ in range(2):
+        artifact_cache.get_artifact('output', [None, 'template'], lambda: builds.append(1))
+    assert len(builds) == 2
+
+    monkeypatch.setenv(artifact_cache.ARTIFACT_CACHE_MAX_BYTES_ENV, '1000')
+    artifact_cache.get_artifact_cache.cache_clear()
+    for i in range(10):
+        artifact_cache.get_artifact('data', [str(i)], lambda: 'x' * 300)
+    assert sum(path.stat().st_size for path in (tmp_path / 'artifacts').iterdir()) <= 1000
+
+
+# This test checks that the outputs are kept in memory for a short time only, and that the artifacts built by another
+# version of the code are not reused
+def test_get_artifact_expires_outputs(tmp_path, monkeypatch):
+    now = [0]
+    monkeypatch.setattr(artifact_cache, '_transient_artifacts', artifact_cache.cachetools.TTLCache(
+        maxsize=artifact_cache.ARTIFACT_MEMORY_MAX_BYTES, ttl=artifact_cache.TRANSIENT_ARTIFACT_TTL,
+        timer=lambda: now[0], getsizeof=len))
+    builds = []
+    for _ in range(2):
+        artifact_cache.get_artifact('output', ['key'], lambda: builds.append(1) or 'output', persistent=False)
+    assert len(builds) == 1 and not (tmp_path / 'artifacts').exists()
+    now[0] += artifact_cache.TRANSIENT_ARTIFACT_TTL + 1
+    artifact_cache.get_artifact('output', ['key'], lambda: builds.append(1) or 'output', persistent=False)
+    assert len(builds) == 2
+
+    artifact_cache.get_artifact('data', ['key'], lambda: builds.append(1) or 'data')
+    artifact_cache._memory_artifacts.clear()
+    monkeypatch.setattr(artifact_cache, 'get_code_fingerprint', lambda: 'upgraded')
+    artifact_cache.get_artifact('data', ['key'], lambda: builds.append(1) or 'data')
+    assert len(builds) == 4
+
+
+# This test ensures that the artifacts on the disk are signed with a private key, and that a tampered artifact is
+# built again instead of being unpickled
+def test_get_artifact_rejects_tampered_artifacts(tmp_path, mocker):
+    builds = []
+    artifact_cache.get_artifact('data', ['key'], lambda: builds.append(1) or 'data')
+    key_path = tmp_path / 'keys' / signing.SIGNING_KEY_FILE
+    assert key_path.stat().st_mode & 0o777 == 0o600 and len(key_path.read_bytes()) == 32
+
+    artifact_path, = (tmp_path / 'artifacts').iterdir()
+    artifact_path.write_bytes(b'\0' * signing.SIGNATURE_SIZE + artifact_path.read_bytes()[
+        signing.SIGNATURE_SIZE:])
+    artifact_cache._memory_artifacts.clear()
+    loads = mocker.spy(artifact_cache.pickle, 'loads')
+    assert artifact_cache.get_artifact('data', ['key'], lambda: builds.append(1) or 'data') == 'data'
+    assert len(builds) == 2 and loads.call_count == 0
@@ -0,0 +1,72 @@
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils.data_sources import with_fingerprint
+from ..app.utils.jinja_extensions import bmecat
+from ..app.utils.procesor import load_data
+from .helpers import get_file_path
+
+# A small category tree: 1 (root) -> 2 -> 4, 5 and 1 -> 3 -> 6
+GROUPS = [
+    {'GROUP_ID': '1', 'PARENT_ID': '0', 'CATALOG_STRUCTURE': 'root'},
+    {'GROUP_ID': '2', 'PARENT_ID': '1', 'CATALOG_STRUCTURE': 'node'},
+    {'GROUP_ID': '3', 'PARENT_ID': '1', 'CATALOG_STRUCTURE': 'node'},
+    {'GROUP_ID': '4', 'PARENT_ID': '2', 'CATALOG_STRUCTURE': 'leaf'},
+    {'GROUP_ID': '5', 'PARENT_ID': '2', 'CATALOG_STRUCTURE': 'leaf'},
+    {'GROUP_ID': '6', 'PARENT_ID': '3', 'CATALOG_STRUCTURE': 'leaf'},
+]
+
+
+# This test checks the groups with articles, the leaf groups go last and the parent of the root ('0') is included
+def test_get_groups_with_articles():
+    articles = [{'CATALOG_GROUP_ID': '5'}, {'CATALOG_GROUP_ID': '4,2,7'}, {'CATALOG_GROUP_ID': ''}]
+    groups_with_articles = bmecat.get_groups_with_articles(articles, GROUPS)
+    assert sorted(groups_with_articles[:-2]) == ['0', '1', '2']
+    assert groups_with_articles[-2:] == ['4', '5']
+    assert bmecat.get_groups_with_articles(articles, GROUPS) == groups_with_articles
+
+
+# This test ensures that the example catalog gets the groups with articles from the index of its category tree
+def test_get_groups_with_articles_of_example_catalog():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('../examples/example2/articles.csv'),
+                                               get_file_path('../examples/example2/groups.csv')])
+    data = load_data(input_files)
+    groups_with_articles = bmecat.get_groups_with_articles(data['articles_csv'], data['groups_csv'])
+    assert sorted(groups_with_articles[:5]) == ['0', '1', '2', '201', '3']
+    assert groups_with_articles[5:] == ['201', '202', '203', '301', '302', '303', '201201']
+
+
+# This test checks the navigation in the category tree
+def test_category_tree_navigation():
+    tree = bmecat.get_category_tree(GROUPS)
+    assert bmecat.get_category_tree(GROUPS).index is tree.index  # The index is built once per data source
+    assert tree.children('2') == ['4', '5']
+    assert tree.descendants('1') == ['2', '4', '5', '3', '6']
+    assert tree.ancestors('6') == ['3', '1']
+    assert tree.ancestors('1') == [] and tree.children('6') == [] and tree.ancestors('missing') == []
+    assert [group['GROUP_ID'] for group in tree.topological_order()] == ['1', '2', '4', '5', '3', '6']
+    assert [group['GROUP_ID'] for group in bmecat.CategoryTree(GROUPS[::-1]).topological_order()] == \
+           ['1', '3', '6', '2', '5', '4']
+
+
+# This test ensures that the cached index is shared by the data sources having the same fingerprint and does not keep
+# their rows, the rows are taken from the data source passed in
+def test_category_tree_index_is_keyed_by_fingerprint():
+    tree = bmecat.get_category_tree(with_fingerprint([dict(group) for group in GROUPS], 'groups'))
+    groups = with_fingerprint([{**group, 'NAME': 'new'} for group in GROUPS], 'groups')
+    new_tree = bmecat.get_category_tree(groups)
+    assert new_tree.index is tree.index and vars(tree.index).keys().isdisjoint({'groups', 'rows'})
+    assert [group['NAME'] for group in new_tree.topological_order()] == ['new'] * len(GROUPS)
+
+
+# This test checks that cycles in the category tree are reported instead of looping forever
+def test_category_tree_rejects_cycles():
+    groups = GROUPS + [{'GROUP_ID': '7', 'PARENT_ID': '8', 'CATALOG_STRUCTURE': 'node'},
+                       {'GROUP_ID': '8', 'PARENT_ID': '7', 'CATALOG_STRUCTURE': 'leaf'}]
+    tree = bmecat.CategoryTree(groups)
+    with pytest.raises(ValueError, match='cycle'):
+        tree.ancestors('8')
+    with pytest.raises(ValueError, match='cycle'):
+        tree.topological_order()
+    with pytest.raises(ValueError, match='cycle'):
+        bmecat.get_groups_with_articles([{'CATALOG_GROUP_ID': '8'}], groups)
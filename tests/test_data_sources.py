@@ -0,0 +1,118 @@
+import logging
+import pickle
+
+from ..app import jinjaxcat_cli
+from ..app.utils import procesor
+from ..app.utils.data_sources import (
+    LazyCsvSource,
+    RecordTable,
+    get_fingerprint,
+    read_csv,
+)
+from ..app.utils.jinja_environment import create_environment
+from ..app.utils.jinja_extensions.examples import remove_inactive_products
+from .helpers import get_file_path
+
+
+# This test ensures that a lazily loaded CSV file yields the same rows as an eagerly loaded one
+def test_lazy_csv_source_matches_eager_loading():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')])
+    eager_data = procesor.load_data(input_files)['articles_csv']
+    lazy_data = procesor.load_data(input_files, lazy=True)['articles_csv']
+    assert isinstance(lazy_data, LazyCsvSource)
+    assert list(lazy_data) == eager_data
+
+
+# This test checks that a lazy CSV source can be iterated repeatedly and reports its length when read in chunks
+def test_lazy_csv_source_repeated_iteration_and_length():
+    file = jinjaxcat_cli.CustomUploadedFile(get_file_path('test_data/groups.csv'))
+    group_ids = [row['GROUP_ID'] for row in procesor.load_data([file])['groups_csv']]
+    source = LazyCsvSource(file, 'utf-8-sig', ';', chunk_size=3)
+    assert len(source) == len(group_ids)
+    assert [row['GROUP_ID'] for row in source] == group_ids
+    assert [row['GROUP_ID'] for row in source] == group_ids
+
+
+# This test checks that a lazy CSV source read from the disk does not keep the content of the file, counts its rows
+# while it is iterated and falls back to the other parser settings for malformed files
+def test_lazy_csv_source_reads_from_disk(tmp_path, mocker):
+    (tmp_path / 'items.csv').write_bytes(b'a;b\n1;x\n2;y\n"3;z\n')
+    source = LazyCsvSource(jinjaxcat_cli.CustomUploadedFile(str(tmp_path / 'items.csv')), 'utf-8', ';', chunk_size=1)
+    assert source._content is None and source.columns == ['a', 'b']
+    read_csv_chunks = mocker.spy(source, '_read_chunks')
+    assert [row['a'] for row in source] == ['1', '2', '"3']
+    assert len(source) == 3 and read_csv_chunks.call_count == 1
+
+
+# This test ensures that rendering with lazily loaded input files produces the same output as eager loading
+def test_generate_output_with_lazy_input():
+    file_paths = [get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')]
+    template_path = get_file_path('test_data/template.xml')
+    expected_output = procesor.generate_output(jinjaxcat_cli.prepare_files(file_paths),
+                                               jinjaxcat_cli.CustomUploadedFile(template_path), key_mapping={})
+    output = procesor.generate_output(jinjaxcat_cli.prepare_files(file_paths),
+                                      jinjaxcat_cli.CustomUploadedFile(template_path), key_mapping={},
+                                      lazy_input=True)
+    assert output == expected_output
+
+
+# This test ensures that well-formed CSV files are read using the fast C engine
+def test_read_csv_uses_c_engine(caplog):
+    caplog.set_level(logging.INFO)
+    df = read_csv(b'a;b\n1;\n', 'utf-8', ';', 'test.csv')
+    assert df.to_dict('records') == [{'a': '1', 'b': ''}]
+    assert "using the c engine" in caplog.text
+
+
+# This test checks that malformed CSV files fall back to the python engine and finally to ignoring quotes
+def test_read_csv_falls_back_for_malformed_files(caplog):
+    caplog.set_level(logging.INFO)
+    df = read_csv(b'a;b\n"x;1\n', 'utf-8', ';', 'test.csv')
+    assert df.to_dict('records') == [{'a': '"x', 'b': '1'}]
+    assert "Falling back from the c engine for 'test.csv'" in caplog.text
+    assert "Falling back from the python engine for 'test.csv'" in caplog.text
+    assert "using the python engine (ignoring quotes)" in caplog.text
+
+
+# This test checks that the rows of a record table behave like the dictionaries of the eager loading used before
+def test_record_table_rows_behave_like_dictionaries():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')])
+    records = read_csv(input_files[0].getvalue(), 'utf-8-sig', ';').to_dict('records')
+    table = procesor.load_data(input_files)['articles_csv']
+    assert isinstance(table, RecordTable)
+    assert table == records and len(table) == len(records)
+    assert table[-1] == records[-1] and table[1:3] == records[1:3]
+    row = table[0]
+    assert row['SUPPLIER_AID'] == records[0]['SUPPLIER_AID'] and row.get('MISSING', 'x') == 'x'
+    assert list(row) == list(records[0]) and list(row.items()) == list(records[0].items()) and 'EAN' in row
+    assert pickle.loads(pickle.dumps(table)) == records
+    assert table.to_dataframe().to_dict('records') == records
+
+
+# This test checks that the record tables and their rows can be combined with lists and dictionaries, and that slices
+# keep a fingerprint while a row is pickled without its table
+def test_record_table_is_compatible_with_lists_and_dictionaries():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')])
+    records = read_csv(input_files[0].getvalue(), 'utf-8-sig', ';').to_dict('records')
+    table = procesor.load_data(input_files)['articles_csv']
+    assert table + [{'a': 1}] == records + [{'a': 1}] and [{'a': 1}] + table == [{'a': 1}] + records
+    assert table.copy() == records and isinstance(table.copy(), list)
+    row = table[0].copy()
+    row['SUPPLIER_AID'] = 'changed'
+    assert table[0] | {'SUPPLIER_AID': 'changed'} == row and {'EAN': 'x'} | table[0] == records[0]
+    assert isinstance(table[1:3], RecordTable) and table[1:3] == records[1:3] and table[::-2] == records[::-2]
+    assert get_fingerprint(table[1:3]) == get_fingerprint(table[1:3]) != get_fingerprint(table[1:4])
+    assert get_fingerprint(table[1:3]) != table.fingerprint
+    assert len(pickle.dumps(table[0])) < len(pickle.dumps(table)) / 2 and pickle.loads(pickle.dumps(table[0])) == records[0]
+
+
+# This test ensures that templates and extensions use the rows of a record table like dictionaries
+def test_record_table_in_templates():
+    import pandas as pd
+
+    table = RecordTable.from_dataframe(pd.DataFrame({'ID': ['1', '2', '3'], 'Status': ['Active', 'Inactive', 'Active']}))
+    template = create_environment().from_string(
+        "{% for row in data %}{{ row.ID }}{{ row['Status'][0] }}{% for key, value in row.items() %}.{% endfor %}"
+        "{% endfor %}|{{ data|selectattr('Status', 'eq', 'Active')|map(attribute='ID')|join(',') }}|{{ data[0]|tojson }}")
+    assert template.render(data=table) == '1A..2I..3A..|1,3|{"ID": "1", "Status": "Active"}'
+    assert remove_inactive_products(table) == [{'ID': '1', 'Status': 'Active'}, {'ID': '3', 'Status': 'Active'}]
@@ -0,0 +1,46 @@
+from ..app import jinjaxcat_cli
+from ..app.utils.data_sources import with_fingerprint
+from ..app.utils.jinja_extensions.decorators import cached_input_files
+from ..app.utils.procesor import load_data
+from .helpers import get_file_path
+
+
+# This test ensures that the cache key of a loaded data source is its fingerprint, the records are not inspected
+def test_cached_input_files_uses_fingerprints():
+    calls = []
+
+    @cached_input_files(maxsize=10)
+    def count_records(data, column='ID'):
+        calls.append(data)
+        return len(data)
+
+    articles = with_fingerprint([{'ID': '1'}, {'ID': '2'}], 'articles')
+    assert count_records(articles) == count_records(articles) == 2
+    assert count_records(with_fingerprint([], 'articles')) == 2  # Same fingerprint, same content
+    assert count_records(articles, column='EAN') == 2
+    assert len(calls) == 2
+
+
+# This test checks that nested (unhashable) data is supported and that the decorator works without parentheses
+def test_cached_input_files_supports_nested_data():
+    calls = []
+
+    @cached_input_files
+    def count_tags(data, tags):
+        calls.append(data)
+        return sum(len(record['tags']) for record in data if set(record['tags']) & set(tags))
+
+    data = [{'ID': '1', 'tags': ['a', 'b'], 'meta': {'active': True}}, {'ID': '2', 'tags': []}]
+    assert count_tags(data, ['a']) == count_tags([dict(record) for record in data], ['a']) == 2
+    assert count_tags(data, ['c']) == 0
+    assert len(calls) == 2
+
+
+# This test checks that the loaded data sources carry fingerprints identifying their content
+def test_load_data_attaches_fingerprints():
+    paths = [get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')]
+    data = load_data(jinjaxcat_cli.prepare_files(paths))
+    lazy_data = load_data(jinjaxcat_cli.prepare_files(paths), lazy=True)
+    assert data['articles_csv'].fingerprint == lazy_data['articles_csv'].fingerprint
+    assert data['articles_csv'].fingerprint != data['groups_csv'].fingerprint
+    assert load_data(jinjaxcat_cli.prepare_files(paths))['groups_csv'].fingerprint == data['groups_csv'].fingerprint
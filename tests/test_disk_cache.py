@@ -0,0 +1,61 @@
+import os
+
+from ..app.utils.cache_dir import get_cache_dir
+from ..app.utils.disk_cache import DiskCache
+
+
+# This test checks that the stored values are returned, and that the missing keys return None
+def test_disk_cache_stores_values(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.set('key', b'value')
+    assert cache.get('key') == b'value'
+    assert cache.get('missing') is None
+    cache.delete('key')
+    assert cache.get('key') is None
+
+
+# This test ensures that the least recently used entries are evicted when the cache exceeds its size
+def test_disk_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.set(key, b'0123456789')
+        os.utime(cache._get_path(key), (i, i))  # Distinct times of the last use
+    assert cache.get('a') is None  # Evicted when 'c' was stored
+    cache.get('b')  # 'b' becomes the most recently used entry
+    cache.set('d', b'0123456789')
+    assert [cache.get(key) is not None for key in 'bcd'] == [True, False, True]
+
+
+# This test checks that values bigger than the whole cache are not stored
+def test_disk_cache_skips_too_big_values(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=5)
+    cache.set('key', b'0123456789')
+    assert cache.get('key') is None
+    assert os.listdir(tmp_path) == []
+
+
+# This test ensures that the directory is not scanned on every write, and that the entries are private to the owner
+def test_disk_cache_tracks_size_without_scanning(tmp_path, mocker):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    scan = mocker.spy(cache, '_scan')
+    for i in range(50):
+        cache.set(str(i), b'0123456789')
+    cache.set('0', b'01234567890123456789')  # Replacing an entry counts only the difference of the sizes
+    assert scan.call_count == 1 and cache._size == 510
+    for i in range(50, 150):
+        cache.set(str(i), b'0123456789')
+    assert sum(os.path.getsize(path) for _, _, path in cache._scan()) <= 1000
+    assert scan.call_count < 10
+    assert os.stat(cache._get_path('149')).st_mode & 0o077 == 0
+
+
+# This test checks that an existing cache directory is made private to the owner, and that a directory belonging to
+# another user is not used
+def test_get_cache_dir_makes_existing_directory_private(tmp_path, monkeypatch):
+    os.chmod(tmp_path, 0o777)
+    monkeypatch.setenv('JINJAXCAT_CACHE_DIR', str(tmp_path))
+    directory = get_cache_dir('bytecode')
+    assert os.stat(tmp_path).st_mode & 0o077 == 0 and os.stat(directory).st_mode & 0o077 == 0
+
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(tmp_path).st_uid + 1)
+    assert get_cache_dir('bytecode') is None
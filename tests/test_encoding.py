@@ -0,0 +1,58 @@
+import codecs
+
+import chardet
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import encoding, procesor
+from .helpers import get_file_path
+
+
+# Parametrized test case for content starting with a byte order mark
+@pytest.mark.parametrize("content, expected", [
+    (codecs.BOM_UTF8 + 'čaj'.encode(), 'UTF-8-SIG'),
+    ('čaj'.encode('utf-16'), 'UTF-16'),
+    ('čaj'.encode('utf-32'), 'UTF-32'),
+])
+def test_detect_encoding_bom(content, expected):
+    assert encoding.detect_encoding(content) == expected
+
+
+# Test case for UTF-8 and ASCII content without a byte order mark
+def test_detect_encoding_utf8_and_ascii():
+    assert encoding.detect_encoding('Žltý kôň;Ďateľ\n'.encode()) == 'utf-8'
+    assert encoding.detect_encoding(b'plain;ascii\n') == 'ascii'
+
+
+# Test case for content whose only non-ASCII characters are outside the inspected samples
+def test_detect_encoding_non_ascii_outside_samples():
+    content = b'a;b\n' * 100000 + 'Žltý kôň;Ďateľ\n'.encode() + b'a;b\n' * 100000
+    assert encoding.detect_encoding(content) == 'utf-8'
+
+
+# Test case for a large content in a legacy encoding, which is detected by chardet using the samples only
+def test_detect_encoding_legacy_encoding(mocker):
+    content = 'Le café était très fréquenté; señor!\n'.encode('latin-1') * 20000
+    spy = mocker.spy(chardet, 'detect')
+    detected = encoding.detect_encoding(content)
+    assert content.decode(detected) == content.decode('latin-1')
+    assert len(spy.call_args.args[0]) < encoding.ENCODING_SAMPLE_SIZE + 3 * encoding.ENCODING_PROBE_SIZE
+
+
+# Test case for the cache of detected encodings
+def test_detect_encoding_is_cached(mocker):
+    content = 'Le café était très fréquenté\n'.encode('cp1252') * 10
+    first = encoding.detect_encoding(content)
+    spy = mocker.spy(encoding, '_detect_encoding')
+    assert encoding.detect_encoding(content) == first
+    spy.assert_not_called()
+
+
+# Test case for an encoding declared in the configuration, which skips the detection entirely
+def test_declared_encoding_skips_detection(mocker):
+    spy = mocker.spy(encoding, 'detect_encoding')
+    files = jinjaxcat_cli.prepare_files([{'path': get_file_path('test_data/groups.csv'), 'encoding': 'utf-8-sig'}])
+    assert files[0].encoding == 'utf-8-sig'
+    data = procesor.load_data(files)
+    assert data['groups_csv'][0]['GROUP_ID'] == '1'
+    spy.assert_not_called()
@@ -2,7 +2,7 @@ import datetime
 
 import pytest
 
-from ..app.utils import jinja_environment
+from ..app.utils import jinja_environment, signing
 
 
 # Creating a pytest fixture for the custom environment. This fixture will be available across all tests in the session
@@ -61,3 +61,53 @@ def test_log_filter(env, capfd):
     template.render()  # This line is necessary to actually render the template
     out, _ = capfd.readouterr()
     assert out.strip() == 'Test log message!'
+
+
+# Test case for the shared environment. This test case checks that the environment is created only once per process
+def test_get_environment_is_shared():
+    assert jinja_environment.get_environment() is jinja_environment.get_environment()
+
+
+# Test case for the compiled template cache. This test case checks that templates with the same source are reused
+def test_get_template_is_cached():
+    template = jinja_environment.get_template('{{ "cached"|remove_accents }}')
+    assert jinja_environment.get_template('{{ "cached"|remove_accents }}') is template
+    assert template.render() == 'cached'
+
+
+# Test case for the bytecode cache. This test case checks that a new process reuses the templates compiled on the disk,
+# and that a compiled template whose signature does not match is compiled again instead of being run
+def test_get_template_uses_bytecode_cache(tmp_path, monkeypatch, mocker):
+    monkeypatch.setenv('JINJAXCAT_CACHE_DIR', str(tmp_path))
+    jinja_environment.get_environment.cache_clear()
+    signing.get_signing_key.cache_clear()
+    try:
+        assert jinja_environment.get_template('{{ "héllo"|remove_accents }}').render() == 'hello'
+        assert list((tmp_path / 'bytecode').iterdir())  # The compiled template has been stored on the disk
+
+        jinja_environment.get_environment.cache_clear()  # Simulate a new process with a new environment
+        compile_spy = mocker.spy(jinja_environment.SandboxedEnvironment, 'compile')
+        assert jinja_environment.get_template('{{ "héllo"|remove_accents }}').render() == 'hello'
+        compile_spy.assert_not_called()
+
+        for path in (tmp_path / 'bytecode').iterdir():  # Replace the signatures, e.g. by another user
+            path.write_bytes(b'\0' * signing.SIGNATURE_SIZE + path.read_bytes()[signing.SIGNATURE_SIZE:])
+        jinja_environment.get_environment.cache_clear()
+        assert jinja_environment.get_template('{{ "héllo"|remove_accents }}').render() == 'hello'
+        compile_spy.assert_called_once()
+    finally:
+        jinja_environment.get_environment.cache_clear()
+        signing.get_signing_key.cache_clear()
+
+
+# Test case for the size of the bytecode cache. It checks that the templates used least recently are evicted
+def test_bytecode_cache_is_bounded(tmp_path):
+    bytecode_cache = jinja_environment.DiskBytecodeCache(jinja_environment.DiskCache(str(tmp_path), max_bytes=20000))
+    environment = jinja_environment.create_environment(bytecode_cache=bytecode_cache)
+    for i in range(100):
+        source = f'{{{{ "{i}" * 2 }}}}'
+        bucket = bytecode_cache.get_bucket(environment, f'template{i}', None, source)
+        bucket.code = environment.compile(source)
+        bytecode_cache.set_bucket(bucket)
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 20000
+    assert len(list(tmp_path.iterdir())) < 100
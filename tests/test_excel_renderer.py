@@ -0,0 +1,68 @@
+import io
+import math
+
+import openpyxl
+import pytest
+
+from ..app.utils import excel_renderer
+
+
+# Helper that creates an Excel template with the given cell values
+def _create_template(cells: dict) -> bytes:
+    workbook = openpyxl.Workbook()
+    for coordinate, value in cells.items():
+        workbook.active[coordinate] = value
+    template_bytes = io.BytesIO()
+    workbook.save(template_bytes)
+    return template_bytes.getvalue()
+
+
+# Parametrized test case for the conversion of rendered values. It follows the rules of pandas.to_numeric
+@pytest.mark.parametrize("value, expected", [
+    ('1', 1),
+    (' 12 ', 12),
+    ('007', 7),
+    ('-1.5', -1.5),
+    ('1e3', 1000.0),
+    ('.5', 0.5),
+    ('inf', math.inf),
+    ('24,99', '24,99'),
+    ('1_000', '1_000'),
+    ('nan', 'nan'),
+    ('1e400', '1e400'),
+    ('EUR', 'EUR'),
+])
+def test_to_number(value, expected):
+    assert excel_renderer.to_number(value) == expected
+    assert type(excel_renderer.to_number(value)) is type(expected)
+
+
+# Test case for the conversion of all values rendered by a cell, including the empty value after the last split
+def test_convert_values():
+    assert excel_renderer.convert_values(['1', '2']) == [1, 2]
+    converted = excel_renderer.convert_values(['1', '2', ''])
+    assert converted[:2] == [1.0, 2.0] and all(isinstance(value, float) for value in converted)
+    assert math.isnan(converted[2])
+    assert excel_renderer.convert_values(['1', 'EUR']) == [1, 'EUR']
+
+
+# Test case for the rendering of an Excel template. Templated cells outside of the first 50 rows and 100 columns
+# are rendered too and each distinct template is compiled and rendered only once
+def test_render_workbook(mocker):
+    template = "{% for value in values %}{{ value }}{{ split }}{% endfor %}"
+    template_bytes = _create_template({'A1': 'Header', 'A2': template, 'B2': template, 'CZ120': template})
+    get_template_spy = mocker.spy(excel_renderer, 'get_template')
+    output = excel_renderer.render_workbook(template_bytes, {'values': ['1', 'x', '2.5']})
+    get_template_spy.assert_called_once()
+
+    sheet = openpyxl.load_workbook(io.BytesIO(output)).active
+    assert sheet['A1'].value == 'Header'
+    assert [sheet.cell(row=row, column=1).value for row in range(2, 5)] == [1, 'x', 2.5]
+    assert [sheet.cell(row=row, column=2).value for row in range(2, 5)] == [1, 'x', 2.5]
+    assert [sheet.cell(row=row, column=104).value for row in range(120, 123)] == [1, 'x', 2.5]
+
+
+# Test case for the search of templated cells in a used range which does not start at the first cell of the sheet
+def test_find_template_cells_in_offset_range():
+    sheet = openpyxl.load_workbook(io.BytesIO(_create_template({'C5': 'Header', 'D7': '{{ a }}', 'E10': '{b}'}))).active
+    assert excel_renderer._find_template_cells(sheet) == [(7, 4, '{{ a }}'), (10, 5, '{b}')]
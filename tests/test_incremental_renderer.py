@@ -0,0 +1,106 @@
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import incremental_renderer, parallel_renderer, procesor
+from ..app.utils.jinja_environment import get_template
+from .helpers import get_file_path
+
+
+# Helper that loads the test input data and the test template
+def _load_test_data():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv'),
+                                               get_file_path('test_data/groups.csv')])
+    with open(get_file_path('test_data/template.xml'), encoding='utf-8') as file:
+        return procesor.load_data(input_files), file.read()
+
+
+# This test checks that only the new and changed rows are rendered again, and that the output is the same as the one
+# of a full render
+def test_render_incremental_matches_full_render(tmp_path, mocker):
+    data, template_source = _load_test_data()
+    state_path = str(tmp_path / 'state' / 'catalog.state')
+    output, delta, state = incremental_renderer.render_incremental(template_source, data, 'articles_csv',
+                                                                   'SUPPLIER_AID', state_path)
+    incremental_renderer.save_state(state_path, state)
+    assert output == get_template(template_source).render(**data)
+    assert len(delta.new) == len(data['articles_csv']) and delta.changed == [] and delta.deleted == []
+
+    articles = [dict(article) for article in data['articles_csv']]
+    deleted = articles.pop(0)['SUPPLIER_AID']
+    articles[0]['DESCRIPTION_SHORT'] = 'Changed description'
+    articles.append({**articles[1], 'SUPPLIER_AID': 'NEW-1'})
+    data['articles_csv'] = articles
+    render_records = mocker.spy(parallel_renderer.ShardedTemplate, 'render_records')
+    output, delta, _ = incremental_renderer.render_incremental(template_source, data, 'articles_csv', 'SUPPLIER_AID',
+                                                               state_path)
+
+    assert output == get_template(template_source).render(**data)
+    assert [row['SUPPLIER_AID'] for row in render_records.call_args.args[2]] == [articles[0]['SUPPLIER_AID'], 'NEW-1']
+    assert delta.new == [articles[-1]] and delta.changed == [articles[0]] and delta.deleted == [deleted]
+
+
+# This test ensures that all the rows are rendered again if the template or an extension changes or the state file is
+# damaged
+@pytest.mark.parametrize('change', ['template', 'extension', 'state'])
+def test_render_incremental_rerenders_all_rows(tmp_path, mocker, change):
+    rows = [{'ID': str(i)} for i in range(5)]
+    state_path = str(tmp_path / 'catalog.state')
+    incremental_renderer.save_state(state_path, incremental_renderer.render_incremental(
+        '{% for row in rows %}<{{ row.ID }}>{% endfor %}', {'rows': rows}, 'rows', 'ID', state_path)[2])
+    template_source = '{% for row in rows %}[{{ row.ID }}]{% endfor %}' if change == 'template' else \
+        '{% for row in rows %}<{{ row.ID }}>{% endfor %}'
+    if change == 'extension':
+        mocker.patch.object(incremental_renderer, 'get_extensions_fingerprint', return_value='edited')
+    if change == 'state':
+        (tmp_path / 'catalog.state').write_bytes(b'damaged')
+    render_records = mocker.spy(parallel_renderer.ShardedTemplate, 'render_records')
+    output, delta, _ = incremental_renderer.render_incremental(template_source, {'rows': rows}, 'rows', 'ID',
+                                                               state_path)
+    assert output == get_template(template_source).render(rows=rows)
+    assert len(render_records.call_args.args[2]) == 5
+    assert delta.changed == [] and delta.deleted == []
+
+
+# This test checks that the rows rendered incrementally must have unique keys, and that their loops must not be nested
+# in other blocks
+def test_render_incremental_rejects_duplicate_keys(tmp_path):
+    with pytest.raises(ValueError, match='unique'):
+        incremental_renderer.render_incremental('{% for row in rows %}{{ row.ID }}{% endfor %}',
+                                                {'rows': [{'ID': '1'}, {'ID': '1'}]}, 'rows', 'ID',
+                                                str(tmp_path / 'catalog.state'))
+    with pytest.raises(ValueError, match='nested'):
+        incremental_renderer.render_incremental('{% if rows %}{% for row in rows %}{{ row.ID }}{% endfor %}{% endif %}',
+                                                {'rows': [{'ID': '1'}]}, 'rows', 'ID', str(tmp_path / 'catalog.state'))
+
+
+# This test checks that the CLI writes the delta document with the changes since the previous run, saves the state
+# only once the outputs are written and checks the incremental configuration before rendering
+def test_run_jinaxcat_incremental_with_delta(tmp_path, mocker):
+    (tmp_path / 'articles.csv').write_text('ID;NAME\n1;a\n2;b\n')
+    (tmp_path / 'template.xml').write_text('<A>{% for article in articles_csv %}<B>{{ article.NAME }}</B>'
+                                           '{% endfor %}</A>')
+    (tmp_path / 'delta.xml').write_text('<D>{% for article in delta_new + delta_changed %}<U>{{ article.ID }}</U>'
+                                        '{% endfor %}{% for id in delta_deleted %}<X>{{ id }}</X>{% endfor %}</D>')
+    config = {'input_files': [str(tmp_path / 'articles.csv')], 'template_file': str(tmp_path / 'template.xml'),
+              'output_file': str(tmp_path / 'output.xml'),
+              'incremental': {'loop': 'articles_csv', 'key': 'ID', 'state_file': str(tmp_path / 'catalog.state'),
+                              'delta_template': str(tmp_path / 'delta.xml'),
+                              'delta_output_file': str(tmp_path / 'delta_output.xml')}}
+    jinjaxcat_cli.run_job(config)
+    assert (tmp_path / 'delta_output.xml').read_text() == '<D><U>1</U><U>2</U></D>'
+
+    (tmp_path / 'articles.csv').write_text('ID;NAME\n2;c\n3;d\n')
+    mocker.patch.object(jinjaxcat_cli, 'write_output', side_effect=OSError('disk full'))
+    with pytest.raises(OSError):
+        jinjaxcat_cli.run_job(config)  # The state is kept when the outputs are not written
+    mocker.stopall()
+    jinjaxcat_cli.run_job(config)
+    assert (tmp_path / 'output.xml').read_text() == '<A><B>c</B><B>d</B></A>'
+    assert (tmp_path / 'delta_output.xml').read_text() == '<D><U>3</U><U>2</U><X>1</X></D>'
+
+    # A missing key of the incremental mapping is reported before anything is rendered or written
+    del config['incremental']['delta_output_file']
+    (tmp_path / 'articles.csv').write_text('ID;NAME\n4;e\n')
+    with pytest.raises(ValueError, match='delta_output_file'):
+        jinjaxcat_cli.run_job(config)
+    assert (tmp_path / 'output.xml').read_text() == '<A><B>c</B><B>d</B></A>'
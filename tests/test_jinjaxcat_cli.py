@@ -1,7 +1,13 @@
 import filecmp
+import json
 import os
+import shutil
+import subprocess
+import sys
+import threading
 from unittest.mock import mock_open, patch
 
+import pytest
 import yaml
 
 from ..app import jinjaxcat_cli
@@ -51,6 +57,32 @@ def test_write_output(mock_open):
     mock_open().write.assert_called_once_with(output_content)  # Assert that the correct content was written to the file
 
 
+# This test checks whether the write_output_stream function writes all output chunks to the file
+def test_write_output_stream(tmp_path):
+    file_path = tmp_path / 'temp_output.txt'
+    jinjaxcat_cli.write_output_stream(iter(['test ', 'output', '\n']), file_path)  # Write the output chunks
+    assert file_path.read_text() == 'test output\n'
+
+
+# This test ensures that the streaming mode of run_jinaxcat writes the same output as the default mode
+@pytest.mark.parametrize('beautify_output', [False, True])
+def test_run_jinaxcat_stream_output(tmp_path, beautify_output):
+    config = {
+        'input_files': [get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')],
+        'template_file': get_file_path('test_data/template.xml'),
+        'output_file': str(tmp_path / 'output.xml'),
+        'beautify_output': beautify_output,
+    }
+    config_path = tmp_path / 'config.yml'
+    config_path.write_text(yaml.safe_dump(config))
+    jinjaxcat_cli.run_jinaxcat(config_path)
+    config['output_file'] = str(tmp_path / 'streamed_output.xml')
+    config['stream_output'] = True
+    config_path.write_text(yaml.safe_dump(config))
+    jinjaxcat_cli.run_jinaxcat(config_path)
+    assert filecmp.cmp(tmp_path / 'output.xml', tmp_path / 'streamed_output.xml', shallow=False)
+
+
 # This test ensures that the run_jinaxcat function generates the correct output
 def test_run_jinaxcat():
     config_path = get_file_path('test_data/demo_config.yml')
@@ -65,3 +97,116 @@ def test_run_jinaxcat():
 
     # Compare the content of the expected output file and the actual output file
     assert filecmp.cmp(expected_output_file, output_file, shallow=False)
+
+
+# Script run in a fresh interpreter to find out which heavy libraries a CLI job imports
+IMPORT_CHECK_SCRIPT = """
+import json, sys
+sys.path.insert(0, 'app')
+from app import jinjaxcat_cli
+if len(sys.argv) > 1:
+    jinjaxcat_cli.run_jinaxcat(sys.argv[1])
+heavy_modules = ['pandas', 'openpyxl', 'lxml', 'requests', 'chardet']
+print(json.dumps([module for module in heavy_modules if module in sys.modules]))
+"""
+
+
+# Parametrized test case for the lazy imports of the CLI. It ensures that a job imports only the libraries it needs
+@pytest.mark.parametrize("input_file, template, expected_modules", [
+    (None, None, []),
+    ('articles.json', '{% for article in articles_json %}<A>{{ article["ID"] }}</A>{% endfor %}', []),
+    ('articles.csv', '{% for article in articles_csv %}<A>{{ article["ID"] }}</A>{% endfor %}', ['pandas']),
+])
+def test_cli_imports_only_needed_libraries(tmp_path, input_file, template, expected_modules):
+    args = []
+    if input_file:
+        (tmp_path / 'articles.json').write_text('[{"ID": "1"}, {"ID": "2"}]')
+        (tmp_path / 'articles.csv').write_text('ID;NAME\n1;a\n2;b\n')
+        (tmp_path / 'template.xml').write_text(template)
+        config = {'input_files': [str(tmp_path / input_file)], 'template_file': str(tmp_path / 'template.xml'),
+                  'output_file': str(tmp_path / 'output.xml')}
+        (tmp_path / 'config.yml').write_text(yaml.safe_dump(config))
+        args.append(str(tmp_path / 'config.yml'))
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', IMPORT_CHECK_SCRIPT, *args], cwd=root_dir,
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.splitlines()[-1]) == expected_modules
+
+
+# This test checks the batch mode: every distinct input file is loaded once, the jobs of several configurations are
+# run by worker processes and a failed job is reported in the summary without stopping the others
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch(tmp_path, mocker, workers):
+    articles, groups = get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')
+    template = get_file_path('test_data/template.xml')
+    single_config = {'input_files': [articles, groups], 'template_file': template,
+                     'output_file': str(tmp_path / 'single.xml')}
+    jobs_config = {'input_files': [articles, groups], 'template_file': template, 'lazy_input': True, 'jobs': [
+        {'name': 'streamed', 'output_file': str(tmp_path / 'streamed.xml'), 'stream_output': True},
+        {'name': 'missing input', 'output_file': str(tmp_path / 'missing.xml'),
+         'input_files': [str(tmp_path / 'missing.csv')]},
+    ]}
+    (tmp_path / 'single.yml').write_text(yaml.safe_dump(single_config))
+    (tmp_path / 'jobs.yml').write_text(yaml.safe_dump(jobs_config))
+    load_data = mocker.spy(jinjaxcat_cli, 'load_data')
+
+    summary = jinjaxcat_cli.run_batch([tmp_path / 'single.yml', tmp_path / 'jobs.yml'], workers=workers,
+                                      summary_path=tmp_path / 'summary.json')
+
+    assert load_data.call_count == 4  # Articles and groups, loaded eagerly and lazily
+    assert [(job['name'], job['status']) for job in summary['jobs']] == \
+           [(None, 'ok'), ('streamed', 'ok'), ('missing input', 'failed')]
+    assert 'missing.csv' in summary['jobs'][2]['error'] and summary['failed'] == 1
+    assert set(summary['jobs'][0]['timings']) == {'render', 'write', 'total'}
+    assert json.loads((tmp_path / 'summary.json').read_text()) == summary
+    assert filecmp.cmp(tmp_path / 'single.xml', tmp_path / 'streamed.xml', shallow=False)
+
+
+# This test ensures that a batch job with two input files of the same name fails as a single run does, and that the
+# summary is written next to the first configuration file by default
+def test_run_batch_reports_duplicate_inputs(tmp_path):
+    (tmp_path / 'copy').mkdir()
+    shutil.copy(get_file_path('test_data/articles.csv'), tmp_path / 'copy' / 'articles.csv')
+    config = {'input_files': [get_file_path('test_data/articles.csv'), str(tmp_path / 'copy' / 'articles.csv')],
+              'template_file': get_file_path('test_data/template.xml'), 'output_file': str(tmp_path / 'output.xml')}
+    (tmp_path / 'config.yml').write_text(yaml.safe_dump(config))
+
+    summary = jinjaxcat_cli.run_batch([tmp_path / 'config.yml'], workers=1)
+    assert summary['failed'] == 1 and 'Duplicate Detected' in summary['jobs'][0]['error']
+    assert json.loads((tmp_path / jinjaxcat_cli.SUMMARY_FILE).read_text()) == summary
+
+
+# This test checks that a streamed output is validated while it is rendered, that an invalid output stops the job and
+# that a failed rendering stops the validation
+def test_run_job_validates_streamed_output(tmp_path, caplog):
+    (tmp_path / 'items.xsd').write_text(
+        '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"><xs:element name="catalog"><xs:complexType>'
+        '<xs:sequence><xs:element name="items"><xs:complexType><xs:sequence>'
+        '<xs:element ref="item" maxOccurs="unbounded"/></xs:sequence></xs:complexType></xs:element></xs:sequence>'
+        '</xs:complexType></xs:element><xs:element name="item"><xs:complexType><xs:sequence>'
+        '<xs:element name="id" type="xs:int"/></xs:sequence></xs:complexType></xs:element></xs:schema>')
+    (tmp_path / 'items.json').write_text(json.dumps([{'ID': str(i)} for i in range(1000)]))
+    (tmp_path / 'template.xml').write_text('<catalog><items>{% for item in items_json %}<item><id>{{ item.ID }}</id>'
+                                           '</item>{% endfor %}</items></catalog>')
+    config = {'input_files': [str(tmp_path / 'items.json')], 'template_file': str(tmp_path / 'template.xml'),
+              'output_file': str(tmp_path / 'output.xml'), 'schema_file': str(tmp_path / 'items.xsd'),
+              'stream_output': True, 'max_validation_errors': 1}
+    with caplog.at_level('INFO'):
+        jinjaxcat_cli.run_job(config)
+    assert 'successfully matches' in caplog.text
+
+    (tmp_path / 'items.json').write_text(json.dumps([{'ID': 'x'}] * 20000))
+    with pytest.raises(Exception, match='stopped by the validation'):
+        jinjaxcat_cli.run_job(config)
+    assert (tmp_path / 'output.xml').stat().st_size < 20000 * len('<item><id>x</id></item>')
+
+    # A failed rendering aborts the validation, so its background thread does not outlive the job
+    (tmp_path / 'template.xml').write_text('<catalog><items>{% for item in items_json %}<item><id>{{ item.ID }}</id>'
+                                           '{{ missing.value if loop.index == 100 }}</item>{% endfor %}</items>'
+                                           '</catalog>')
+    (tmp_path / 'items.json').write_text(json.dumps([{'ID': str(i)} for i in range(1000)]))
+    thread_count = threading.active_count()
+    for _ in range(3):
+        with pytest.raises(Exception, match='missing'):
+            jinjaxcat_cli.run_job(config)
+    assert threading.active_count() == thread_count
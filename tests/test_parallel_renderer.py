@@ -0,0 +1,62 @@
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import parallel_renderer, procesor
+from ..app.utils.jinja_environment import get_template
+from .helpers import get_file_path
+
+
+# This test ensures that the loops rendered by worker processes give the same output as a serial render
+def test_generate_output_in_parallel_matches_serial_render(monkeypatch):
+    monkeypatch.setattr(parallel_renderer, 'PARALLEL_RENDER_MIN_ROWS', 0)
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv'),
+                                               get_file_path('test_data/groups.csv')])
+    template_file = jinjaxcat_cli.CustomUploadedFile(get_file_path('test_data/template.xml'))
+    expected_output = procesor.generate_output(input_files, template_file, key_mapping={})
+    output = procesor.generate_output(input_files, template_file, key_mapping={}, parallel_loop='articles_csv',
+                                      render_workers=2)
+    assert output == expected_output
+
+
+# This test checks that the whitespace control around and inside the sharded loops is kept
+@pytest.mark.parametrize('template_source', [
+    "<a>\n  {% for row in rows %}\n  <b>{{ row }}</b>\n  {% endfor %}\n</a>\n{% for row in rows %}{{ row }},{% endfor %}",
+    "<a>\n  {%- for row in rows -%}\n  <b>{{ row }}</b>\n  {%- endfor -%}\n</a>{% for i in [1] %}\n"
+    "{% for row in rows %}{{ row }}{% endfor %}{% endfor %}",
+    "{% set total = rows|length %}{% raw %}{% for row in rows %}{% endraw %}"
+    "{% for row in rows %}{{ row }}/{{ total }}{% for c in row %}{{ loop.index }}{% endfor %}\n{% endfor %}",
+])
+def test_render_parallel_keeps_whitespace(monkeypatch, template_source):
+    monkeypatch.setattr(parallel_renderer, 'PARALLEL_RENDER_MIN_ROWS', 0)
+    data = {'rows': [str(i) for i in range(10)]}
+    output = parallel_renderer.render_parallel(template_source, data, 'rows', workers=3)
+    assert output == get_template(template_source).render(**data)
+
+
+# This test ensures that only the loops placed directly in the template are split, the loops nested in other blocks
+# are rendered with the rest of the template, so the output of the blocks is processed as in a serial render
+@pytest.mark.parametrize('template_source, sharded', [
+    ("{% set rendered %}{% for row in rows %}{{ row }}{% endfor %}{% endset %}{{ rendered|length }}", 0),
+    ("{% filter upper %}\n{% for row in rows %}x{{ row }}{% endfor %}{% endfilter %}", 0),
+    ("{% if rows %}{% for row in rows %}{{ row }}{% endfor %}{% endif %}", 0),
+    ("{% macro m() %}{% for row in rows %}{{ row }}{% endfor %}{% endmacro %}{{ m()|upper }}\n"
+     "{% for row in rows %}{{ row }};{% endfor %}", 1),
+])
+def test_render_parallel_skips_nested_loops(monkeypatch, template_source, sharded):
+    monkeypatch.setattr(parallel_renderer, 'PARALLEL_RENDER_MIN_ROWS', 0)
+    data = {'rows': [str(i) for i in range(10)]}
+    assert len(parallel_renderer.find_sharded_loops(template_source, 'rows')) == sharded
+    output = parallel_renderer.render_parallel(template_source, data, 'rows', workers=2)
+    assert output == get_template(template_source).render(**data)
+
+
+# This test checks that the loops whose iterations depend on each other are rejected
+@pytest.mark.parametrize('template_source, message', [
+    ("{% for row in other %}{{ row }}{% endfor %}", 'no top-level loop'),
+    ("{% for row in rows %}{{ loop.index }}{% endfor %}", 'loop variable'),
+    ("{% for row in rows %}{{ row }}{% else %}empty{% endfor %}", 'else block'),
+    ("{% set ns = namespace(n=0) %}{% for row in rows %}{% set ns.n = ns.n + 1 %}{% endfor %}", 'namespace'),
+])
+def test_render_parallel_rejects_dependent_loops(template_source, message):
+    with pytest.raises(ValueError, match=message):
+        parallel_renderer.render_parallel(template_source, {'rows': ['1', '2'], 'other': []}, 'rows', workers=2)
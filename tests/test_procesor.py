@@ -0,0 +1,127 @@
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import procesor
+from .helpers import get_file_path
+
+
+# Helper that prepares the test input files and the test template file
+def _prepare_test_files():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv'),
+                                               get_file_path('test_data/groups.csv')])
+    template_file = jinjaxcat_cli.CustomUploadedFile(get_file_path('test_data/template.xml'))
+    return input_files, template_file
+
+
+# This test ensures that the streamed output is identical to the output rendered in one go
+def test_generate_output_stream_matches_generate_output():
+    input_files, template_file = _prepare_test_files()
+    expected_output = procesor.generate_output(input_files, template_file, key_mapping={})
+    input_files, template_file = _prepare_test_files()
+    output_stream = procesor.generate_output_stream(input_files, template_file, key_mapping={}, buffer_size=5)
+    chunks = list(output_stream)
+    assert len(chunks) > 1  # The output is produced in several chunks
+    assert ''.join(chunks) == expected_output
+
+
+# This test checks that Excel templates are rejected by the streaming renderer
+def test_generate_output_stream_rejects_excel_templates():
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv')])
+    template_file = jinjaxcat_cli.CustomUploadedFile(get_file_path('test_data/articles.csv'))
+    template_file.name = 'template.xlsx'
+    with pytest.raises(ValueError):
+        procesor.generate_output_stream(input_files, template_file, key_mapping={})
+
+
+# This test ensures that the preview is rendered from the first records only and stops at the character limit, and that
+# a preview without limits is the whole output
+def test_generate_preview_samples_and_truncates_output():
+    input_files, template_file = _prepare_test_files()
+    expected_output = procesor.generate_output(input_files, template_file, key_mapping={})
+    input_files, template_file = _prepare_test_files()
+    preview, complete = procesor.generate_preview(input_files, template_file, {}, max_chars=len(expected_output) + 1,
+                                                  max_records=len(expected_output))
+    assert complete and preview == expected_output
+
+    input_files, template_file = _prepare_test_files()
+    preview, complete = procesor.generate_preview(input_files, template_file, {}, max_chars=100)
+    assert not complete and preview == expected_output[:100]
+
+    input_files, template_file = _prepare_test_files()
+    preview, complete = procesor.generate_preview(input_files, template_file, {}, max_chars=len(expected_output),
+                                                  max_records=1)
+    assert not complete and len(preview) < len(expected_output)
+
+
+# This test ensures that only the data sources the template loops over (also through filters and variables set from
+# them) are sampled and read up to the first records, while the lookup tables are complete
+def test_generate_preview_samples_looped_sources_only(tmp_path, mocker):
+    template_path = tmp_path / 'template.txt'
+    template_path.write_text("{% set items = articles|sort(attribute='SUPPLIER_AID') %}{% for article in items %}"
+                             "{{ article['SUPPLIER_AID'] }};{% endfor %}{{ groups_csv|length }}")
+    input_files, _ = _prepare_test_files()
+    template_file = jinjaxcat_cli.CustomUploadedFile(str(template_path))
+    data = procesor.load_data(input_files)
+    max_rows = procesor.get_preview_max_rows(template_file, {'articles_csv': 'articles'}, 1)
+    assert max_rows['articles_csv'] == 2 and 'groups_csv' not in max_rows
+
+    load_data = mocker.spy(procesor, 'load_data')
+    input_files, _ = _prepare_test_files()
+    preview, complete = procesor.generate_preview(input_files, template_file, {'articles_csv': 'articles'},
+                                                  max_chars=1000, max_records=1)
+    assert load_data.call_args.kwargs['max_rows'] == max_rows
+    assert not complete and preview.count(';') == 1 and preview.endswith(f";{len(data['groups_csv'])}")
+
+
+# This test checks that every sheet of an Excel input is loaded under its own key, opening the workbook only once
+def test_load_data_reads_all_excel_sheets_in_one_pass(tmp_path, mocker):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    workbook.active.title = 'products'
+    workbook.active.append(['ID', 'Price'])
+    workbook.active.append([1, 9.5])
+    prices = workbook.create_sheet('prices')
+    prices.append(['ID', 'Currency'])
+    prices.append([1, None])
+    workbook.save(tmp_path / 'supplier.xlsx')
+
+    load_workbook = mocker.spy(openpyxl, 'load_workbook')
+    input_files = jinjaxcat_cli.prepare_files([str(tmp_path / 'supplier.xlsx')])
+    data_dict = procesor.load_data(input_files)
+
+    assert data_dict == {
+        'products_supplier_xlsx': [{'ID': '1', 'Price': '9.5'}],
+        'prices_supplier_xlsx': [{'ID': '1', 'Currency': ''}],
+    }
+    assert load_workbook.call_count == 1
+
+
+# Helper that writes the given input files to a temporary directory and prepares them
+def _prepare_tmp_files(tmp_path, files):
+    for name, content in files.items():
+        (tmp_path / name).write_text(content)
+    return jinjaxcat_cli.prepare_files([str(tmp_path / name) for name in files])
+
+
+# This test ensures that loading the input files concurrently gives the same data as loading them one by one
+@pytest.mark.parametrize('use_processes', [False, True])
+def test_load_data_concurrently_matches_sequential_load(monkeypatch, use_processes):
+    if use_processes:
+        monkeypatch.setattr(procesor, 'PROCESS_POOL_MIN_BYTES', 0)
+        monkeypatch.setenv(procesor.LOAD_PROCESSES_ENV, '2')
+    paths = [get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')]
+    expected = procesor.load_data(jinjaxcat_cli.prepare_files(paths), max_workers=1)
+    assert procesor.load_data(jinjaxcat_cli.prepare_files(paths)) == expected
+    assert list(procesor.load_data(jinjaxcat_cli.prepare_files(paths))) == ['articles_csv', 'groups_csv']
+    assert not use_processes or 2 in procesor._process_pools  # The worker processes are kept for the next loads
+
+
+# This test checks that duplicates and loading errors are reported in the order of the input files
+@pytest.mark.parametrize('max_workers', [1, None])
+def test_load_data_reports_errors_in_input_order(tmp_path, max_workers):
+    input_files = _prepare_tmp_files(tmp_path, {'a.json': '[]', 'b.json': '[', 'c.json': '{}'})
+    with pytest.raises(ValueError):  # The broken JSON file is reported
+        procesor.load_data(input_files + input_files[:1], max_workers=max_workers)
+    with pytest.raises(Exception, match="Duplicate Detected: The file 'a_json'"):  # The duplicate comes first
+        procesor.load_data(input_files[:1] + input_files, max_workers=max_workers)
@@ -0,0 +1,92 @@
+import json
+import uuid
+
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import jinja_environment, procesor, profiler
+from .helpers import get_file_path
+
+
+# Helper that returns the configuration of a job rendering the test template into the temporary directory
+def _get_test_config(tmp_path, **options):
+    return {'input_files': [get_file_path('test_data/articles.csv'), get_file_path('test_data/groups.csv')],
+            'template_file': get_file_path('test_data/template.xml'), 'output_file': str(tmp_path / 'output.xml'),
+            **options}
+
+
+# Parametrized test case for the profile of a job. It checks that the phases are recorded for every input file and
+# nested in the phases running them, also for the chunks of a streamed output, and that the report is written
+@pytest.mark.parametrize('stream_output, expected_phases', [
+    (False, [(0, 'load inputs'), (1, 'parse input'), (1, 'parse input'), (0, 'render'), (0, 'prettify'),
+             (0, 'write')]),
+    (True, [(0, 'load inputs'), (1, 'parse input'), (1, 'parse input'), (0, 'write'), (1, 'prettify'),
+            (2, 'render')]),
+])
+def test_profiler_records_phases_of_job(tmp_path, stream_output, expected_phases):
+    config = _get_test_config(tmp_path, beautify_output=True, stream_output=stream_output)
+    with profiler.Profiler() as job_profiler:
+        jinjaxcat_cli.run_job(config)
+
+    records = [record for record in job_profiler.records if record.phase in {phase for _, phase in expected_phases}]
+    assert [(record.depth, record.phase) for record in records] == expected_phases
+    assert [record.file for record in records if record.phase == 'parse input'] == ['articles.csv', 'groups.csv']
+    assert all(record.wall_seconds >= 0 and record.peak_memory_bytes > 0 for record in records)
+    render = next(record for record in records if record.phase == 'render')
+    assert render.calls > 1 if stream_output else render.calls == 1  # A stream is profiled chunk by chunk
+
+    job_profiler.write_report(tmp_path / 'profile.json')
+    report = json.loads((tmp_path / 'profile.json').read_text())
+    assert report['version'] == profiler.PROFILE_REPORT_VERSION
+    assert len(report['phases']) == len(job_profiler.records) and report['wall_seconds'] > 0
+    assert 'articles.csv' in job_profiler.format_table().splitlines()[3]
+
+
+# This test ensures that the phases are not recorded without an active profiler, and that the input files are loaded
+# one by one while profiling, so every file is measured on its own
+def test_profiler_is_inactive_by_default(mocker):
+    assert not profiler.is_profiling()
+    with profiler.profile_phase('render'):
+        pass
+    chunks = ['a', 'b']
+    assert profiler.profile_stream('render', chunks) is chunks
+
+    submit_input_files = mocker.spy(procesor, '_submit_input_files')
+    input_files = jinjaxcat_cli.prepare_files([get_file_path('test_data/articles.csv'),
+                                               get_file_path('test_data/groups.csv')])
+    with profiler.Profiler() as load_profiler:
+        procesor.load_data(input_files)
+    assert not profiler.is_profiling() and submit_input_files.call_count == 0
+    assert [record.phase for record in load_profiler.records if record.depth == 0] == ['parse input', 'parse input']
+
+
+# This test ensures that the calls of a phase are summed up in one record per parent phase and file, and that the
+# records are listed below the phases they are nested in
+def test_profiler_aggregates_calls_by_parent_phase():
+    with profiler.Profiler() as phase_profiler:
+        for file in ['a.csv', 'b.csv', 'a.csv']:
+            with profiler.profile_phase('load inputs'):
+                with profiler.profile_phase('parse input', file):
+                    pass
+        with profiler.profile_phase('render'):
+            with profiler.profile_phase('parse input', 'a.csv'):
+                pass
+
+    records = [(record.depth, record.phase, record.file, record.calls) for record in phase_profiler.records]
+    assert records == [(0, 'load inputs', None, 3), (1, 'parse input', 'a.csv', 2), (1, 'parse input', 'b.csv', 1),
+                       (0, 'render', None, 1), (1, 'parse input', 'a.csv', 1)]
+
+
+# This test checks that the compilation of a template is recorded only when the template is compiled, not when it is
+# taken from the cache, and that the input files are loaded by the rendering when the job is not profiled
+def test_profiler_records_compilation_only_once(tmp_path, mocker):
+    source = f"{{{{ '{uuid.uuid4()}' }}}}"  # A new template, not in the caches yet
+    with profiler.Profiler() as compile_profiler:
+        jinja_environment.get_template(source)
+        jinja_environment.get_template(source)
+    assert [(record.phase, record.calls) for record in compile_profiler.records
+            if record.phase == 'compile template'] == [('compile template', 1)]
+
+    load_data = mocker.spy(jinjaxcat_cli, 'load_data')
+    timings = jinjaxcat_cli.run_job(_get_test_config(tmp_path))
+    assert load_data.call_count == 0 and 'load' not in timings
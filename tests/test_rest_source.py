@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from ..app.utils import rest_source
+
+ITEMS = [{'ID': str(i)} for i in range(23)]  # Items served by the test API, 10 per page
+
+
+# Handler of the test API, serving ITEMS with different kinds of pagination
+class ApiHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa: N802
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.requests.append(self.path)
+        try:
+            time.sleep(0.05)  # Lets the concurrent requests overlap
+            self._respond()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _respond(self):
+        url = urlsplit(self.path)
+        query = {key: int(values[0]) for key, values in parse_qs(url.query).items()}
+        headers = {}
+        if url.path == '/flaky' and self.server.requests.count(self.path) == 1:
+            self._send(503, None)
+            return
+        if url.path in ('/page', '/flaky'):
+            start = (query.get('page', 1) - 1) * 10
+            body = {'data': ITEMS[start:start + 10]}
+        elif url.path == '/offset':
+            body = ITEMS[query['offset']:query['offset'] + query['limit']]
+        elif url.path == '/cursor':
+            start = query.get('cursor', 0)
+            body = {'data': ITEMS[start:start + 10], 'meta': {'next': start + 10 if start + 10 < len(ITEMS) else None}}
+        elif url.path in ('/etag', '/modified'):
+            headers = {'ETag': '"v1"'} if url.path == '/etag' else {'Last-Modified': 'Mon, 02 Oct 2023 10:00:00 GMT'}
+            validators = {self.headers['If-None-Match'], self.headers['If-Modified-Since']}
+            if validators & {headers.get('ETag'), headers.get('Last-Modified')} - {None}:
+                self._send(304, None, headers)
+                return
+            body = ITEMS
+        elif url.path == '/link':
+            start = query.get('start', 0)
+            body = ITEMS[start:start + 10]
+            if start + 10 < len(ITEMS):
+                headers['Link'] = f'<http://{self.headers["Host"]}/link?start={start + 10}>; rel="next"'
+        else:
+            body = {'data': ITEMS, 'accept': self.headers['Accept']}
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers=None):
+        content = json.dumps(body).encode() if status != 304 else b''
+        self.send_response(status)
+        for key, value in {'Content-Type': 'application/json', **(headers or {})}.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+# Fixture that stores the response cache in a temporary directory
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('JINJAXCAT_CACHE_DIR', str(tmp_path))
+    rest_source.get_response_cache.cache_clear()
+    yield tmp_path
+    rest_source.get_response_cache.cache_clear()
+
+
+# Fixture that starts the test API on a free local port
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ApiHandler)
+    server.lock, server.active, server.max_active, server.requests = threading.Lock(), 0, 0, []
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# This test checks that a request without pagination returns the JSON response, sending the declared headers
+def test_load_rest_without_pagination(api):
+    data = rest_source.load_rest(f"GET {api.url}/all\nAccept: application/json\n")
+    assert data == {'data': ITEMS, 'accept': 'application/json'}
+
+
+# This test checks that the pages of all kinds of pagination are merged into one list of items
+@pytest.mark.parametrize('path, options', [
+    ('page?page=1', '# @pagination page\n# @items data\n# @page_size 10'),
+    ('offset', '# @pagination offset\n# @page_size 10'),
+    ('cursor', '# @pagination cursor\n# @items data\n# @next_cursor meta.next'),
+    ('link', '# @pagination link'),
+])
+def test_load_rest_merges_pages(api, path, options):
+    assert rest_source.load_rest(f"GET {api.url}/{path}\n{options}\n") == ITEMS
+
+
+# This test ensures that the pages are fetched concurrently, but never more of them than allowed
+def test_load_rest_limits_concurrent_requests(api):
+    data = rest_source.load_rest(f"GET {api.url}/page\n# @pagination page\n# @items data\n# @concurrency 2\n")
+    assert data == ITEMS
+    assert api.max_active == 2
+    assert len(api.requests) == 4  # The 4th page is requested together with the 3rd (the last non-empty) page
+
+
+# This test checks that the requests failing with a retryable status code are retried
+def test_load_rest_retries_failed_requests(api, caplog):
+    data = rest_source.load_rest(f"GET {api.url}/flaky\n# @items data\n# @backoff 0\n")
+    assert data == ITEMS[:10]
+    assert len(api.requests) == 2
+    assert 'status code 503' in caplog.text
+
+
+# This test checks that the options of REST files are validated
+@pytest.mark.parametrize('content', [
+    "POST http://localhost/items",
+    "GET http://localhost/items\n# @pagination pages",
+    "GET http://localhost/items\n# @pagination offset",
+    "GET http://localhost/items\n# @unknown 1",
+])
+def test_parse_rest_file_rejects_invalid_requests(content):
+    with pytest.raises(ValueError):
+        rest_source.parse_rest_file(content)
+
+
+# This test checks that the cached responses are revalidated, an unchanged response is not downloaded again
+@pytest.mark.parametrize('path', ['etag', 'modified'])
+def test_load_rest_revalidates_cached_responses(api, caplog, path):
+    assert rest_source.load_rest(f"GET {api.url}/{path}\n") == ITEMS
+    caplog.set_level('INFO')
+    assert rest_source.load_rest(f"GET {api.url}/{path}\n") == ITEMS
+    assert len(api.requests) == 2
+    assert 'not modified' in caplog.text
+
+
+# This test ensures that a cached response is used without any request within its maximum age
+def test_load_rest_uses_fresh_cached_responses(api):
+    content = f"GET {api.url}/all\nAccept: application/json\n# @cache_max_age 60\n"
+    assert rest_source.load_rest(content) == rest_source.load_rest(content)
+    assert len(api.requests) == 1
+    rest_source.load_rest(content + "# @cache false\n")  # The cache can be disabled
+    assert len(api.requests) == 2
@@ -0,0 +1,57 @@
+import os
+import threading
+
+from ..app.utils import schema_cache
+from ..app.utils.xml_validation import validate_xml
+
+# A schema including the declaration of its item values from another schema file
+MAIN_SCHEMA = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:include schemaLocation="types.xsd"/>
+  <xs:element name="item" type="value"/>
+</xs:schema>"""
+TYPES_SCHEMA = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:simpleType name="value"><xs:restriction base="xs:{}"/></xs:simpleType>
+</xs:schema>"""
+
+
+# Helper that writes the schema files into a directory and returns the path of the main schema
+def _write_schema(directory, value_type='int'):
+    directory.mkdir(exist_ok=True)
+    (directory / 'main.xsd').write_text(MAIN_SCHEMA)
+    (directory / 'types.xsd').write_text(TYPES_SCHEMA.format(value_type))
+    return str(directory / 'main.xsd')
+
+
+# This test checks that a schema is compiled once for the same content, even at another path, and compiled again
+# when the schema or an included schema file changes
+def test_get_schema_is_cached_by_content(tmp_path, mocker):
+    schema_cache._schemas.clear()
+    compile_schema = mocker.spy(schema_cache, '_compile_schema')
+    schema_path = _write_schema(tmp_path / 'session1')
+    assert validate_xml(b'<item>1</item>', schema_path).type == 'OK'
+    assert validate_xml(b'<item>x</item>', _write_schema(tmp_path / 'session2')).type == 'KO'
+    assert compile_schema.call_count == 1
+
+    (tmp_path / 'session1' / 'types.xsd').write_text(TYPES_SCHEMA.format('string'))
+    os.utime(tmp_path / 'session1' / 'types.xsd', ns=(0, 0))  # Make sure the modification time changes
+    assert validate_xml(b'<item>x</item>', schema_path).type == 'OK'
+    assert compile_schema.call_count == 2
+
+
+# This test ensures that the sessions validating with the same schema concurrently get the errors of their own document
+def test_get_schema_validates_concurrently(tmp_path):
+    schema = schema_cache.get_schema(_write_schema(tmp_path))
+    results = {}
+
+    def validate(value):
+        from lxml import etree
+        for _ in range(50):
+            is_valid, errors = schema.validate(etree.fromstring(f'<item>{value}</item>'))
+            results.setdefault(value, set()).add((is_valid, all(f"'{value}'" in str(error) for error in errors)))
+
+    threads = [threading.Thread(target=validate, args=(value,)) for value in ('1', 'a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'1': {(True, True)}, 'a': {(False, True)}, 'b': {(False, True)}}
@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+from ..app import jinjaxcat_cli
+from ..app.utils import procesor, record_index
+from ..app.utils.data_sources import RecordTable
+from ..app.utils.jinja_environment import create_environment
+from ..app.utils.jinja_extensions import tables
+from .helpers import get_file_path
+
+ARTICLES = RecordTable.from_dataframe(pd.DataFrame({
+    'SUPPLIER_AID': ['A1', 'A2', 'A3'],
+    'CATALOG_GROUP_ID': ['201', '202,201', '999'],
+}), fingerprint='articles')
+PRICES = RecordTable.from_dataframe(pd.DataFrame({
+    'SUPPLIER_AID': ['A1', 'A1', 'A2'],
+    'PRICE_AMOUNT': ['1.5', '1.2', '3.0'],
+}), fingerprint='prices')
+GROUPS = [{'GROUP_ID': '201', 'GROUP_NAME': 'Pens'}, {'GROUP_ID': '202', 'GROUP_NAME': 'Paper'}]
+
+
+# This test checks the lookups in the indexes of the data sources
+def test_index_by_and_lookups():
+    assert tables.index_by(GROUPS, 'GROUP_ID')['202'] == GROUPS[1]
+    assert tables.lookup(PRICES, 'SUPPLIER_AID', 'A1') == {'SUPPLIER_AID': 'A1', 'PRICE_AMOUNT': '1.5'}
+    assert tables.lookup(PRICES, 'SUPPLIER_AID', 'A3', default='') == ''
+    assert [price['PRICE_AMOUNT'] for price in tables.lookup_all(PRICES, 'SUPPLIER_AID', 'A1')] == ['1.5', '1.2']
+    assert tables.lookup_all(PRICES, 'SUPPLIER_AID', 'A3') == []
+    groups = tables.group_by(ARTICLES, 'CATALOG_GROUP_ID', ',')
+    assert {group: [article['SUPPLIER_AID'] for article in articles] for group, articles in groups.items()} == \
+           {'201': ['A1', 'A2'], '202': ['A2'], '999': ['A3']}
+
+
+# This test checks the inner and the left join of two data sources
+def test_join_sources():
+    inner = tables.join_sources(ARTICLES, PRICES, 'SUPPLIER_AID')
+    assert [(row['SUPPLIER_AID'], row['PRICE_AMOUNT']) for row in inner] == [('A1', '1.5'), ('A1', '1.2'), ('A2', '3.0')]
+    left = tables.join_sources(ARTICLES, PRICES, 'SUPPLIER_AID', how='left')
+    assert left[-1] == {'SUPPLIER_AID': 'A3', 'CATALOG_GROUP_ID': '999'}
+    renamed = [{'ID': 'A2'}]
+    assert tables.join_sources(renamed, PRICES, 'ID', right_on='SUPPLIER_AID')[0]['PRICE_AMOUNT'] == '3.0'
+
+
+# This test ensures that the indexes are built once per data source and column, and cannot be modified
+def test_indexes_are_cached(mocker):
+    record_index._indexes.clear()
+    build = mocker.spy(record_index, '_build_unique_index')
+    index = tables.index_by(PRICES, 'SUPPLIER_AID')
+    assert tables.index_by(PRICES, 'SUPPLIER_AID').positions is index.positions
+    assert tables.index_by(list(GROUPS), 'GROUP_ID').positions is tables.index_by(list(GROUPS), 'GROUP_ID').positions
+    assert build.call_count == 2  # Lists created on the fly are identified by their content
+    with pytest.raises(TypeError):
+        index['A9'] = {}
+    groups = tables.group_by(ARTICLES, 'CATALOG_GROUP_ID', ',')
+    assert isinstance(groups['201'], tuple)
+    tables.lookup_all(ARTICLES, 'CATALOG_GROUP_ID', '999').clear()
+    tables.join_sources(ARTICLES, PRICES, 'SUPPLIER_AID')[0]['PRICE_AMOUNT'] = '0'
+    assert len(tables.lookup_all(ARTICLES, 'CATALOG_GROUP_ID', '999')) == 1
+    assert tables.join_sources(ARTICLES, PRICES, 'SUPPLIER_AID')[0]['PRICE_AMOUNT'] == '1.5'
+
+
+# This test checks that the helpers are available in the templates
+def test_table_helpers_in_templates():
+    template = create_environment().from_string(
+        "{% set groups = articles|group_by('CATALOG_GROUP_ID', ',') %}"
+        "{% for group in groups_csv %}{{ group.GROUP_NAME }}:"
+        "{% for article in groups.get(group.GROUP_ID, []) %}{{ article.SUPPLIER_AID }}="
+        "{{ lookup(prices, 'SUPPLIER_AID', article.SUPPLIER_AID).PRICE_AMOUNT }};{% endfor %}{% endfor %}")
+    assert template.render(articles=ARTICLES, prices=PRICES, groups_csv=GROUPS) == 'Pens:A1=1.5;A2=3.0;Paper:A2=3.0;'
+
+
+# This test checks that the cache keeps the positions of the rows only, bound to the data source passed in, except for
+# the rows of the data sources which can not be accessed by position
+def test_indexes_do_not_keep_data_sources():
+    record_index._indexes.clear()
+    prices = RecordTable.from_dataframe(PRICES.to_dataframe(), fingerprint='prices')
+    index = tables.index_by(prices, 'SUPPLIER_AID')
+    assert index['A2'] == {'SUPPLIER_AID': 'A2', 'PRICE_AMOUNT': '3.0'} and index.rows is prices
+    joined = tables.join_sources(ARTICLES, prices, 'SUPPLIER_AID')
+    assert [(row['SUPPLIER_AID'], row['PRICE_AMOUNT']) for row in joined] == [('A1', '1.5'), ('A1', '1.2'),
+                                                                              ('A2', '3.0')]
+    cached_values = [value for entry in record_index._indexes.values() for value in entry[1]]
+    assert all(value is None for value in cached_values)
+
+
+    groups_csv = procesor.load_data(jinjaxcat_cli.prepare_files([get_file_path('test_data/groups.csv')]),
+                                    lazy=True)['groups_csv']
+    group = next(iter(groups_csv))
+    assert tables.lookup(groups_csv, 'GROUP_ID', group['GROUP_ID']) == group
+    assert any(value is not None for entry in record_index._indexes.values() for value in entry[1])
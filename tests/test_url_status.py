@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ..app.utils import url_status
+from ..app.utils.jinja_environment import create_environment
+
+
+# Handler of the test web server, every path returns the status code in its name (e.g. /404)
+class StatusHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa: N802
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        self.send_response(int(self.path.strip('/')))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# Fixture that starts the test web server and empties the status cache
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+    server.lock, server.requests = threading.Lock(), []
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    url_status._status_cache.clear()
+    url_status._failure_cache.clear()
+    yield server
+    url_status._status_cache.clear()
+    url_status._failure_cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+# This test checks that the URLs are checked once, and that failing requests have no status code
+def test_check_urls_caches_status_codes(server):
+    urls = [f'{server.url}/200', f'{server.url}/404', f'{server.url}/200', '', 'http://invalid url']
+    assert url_status.check_urls(urls) == {f'{server.url}/200': 200, f'{server.url}/404': 404, 'http://invalid url': None}
+    assert url_status.get_status_code(f'{server.url}/404') == 404
+    assert url_status.get_status_code('http://invalid url') is None
+    assert sorted(server.requests) == ['/200', '/404']
+
+
+# This test ensures that a failed request is checked again once the short time of the failure cache is over
+def test_check_urls_expires_failures(server, monkeypatch):
+    now = [0]
+    monkeypatch.setattr(url_status, '_failure_cache', url_status.cachetools.TTLCache(
+        maxsize=10, ttl=url_status.URL_FAILURE_TTL, timer=lambda: now[0]))
+    responses = iter([None, 200])  # A transient failure, then the URL is reachable again
+    monkeypatch.setattr(url_status, '_request_status_code', lambda url: next(responses))
+    assert url_status.get_status_code(f'{server.url}/200') is None
+    assert url_status.get_status_code(f'{server.url}/200') is None  # Cached for the checks of the same render
+    now[0] = url_status.URL_FAILURE_TTL + 1
+    assert url_status.get_status_code(f'{server.url}/200') == 200
+
+
+# This test ensures that the template functions check the URLs of a data column before they are used in a loop
+def test_template_prefetches_status_codes(server):
+    articles = [{'ID': str(i), 'URL': f'{server.url}/{200 + i % 2}'} for i in range(50)]
+    template = create_environment().from_string(
+        "{{ prefetch_status_codes(articles, 'URL') }}"
+        "{% for article in articles %}{{ get_status_code(article['URL']) }};{% endfor %}")
+    assert template.render(articles=articles) == '200;201;' * 25
+    assert sorted(server.requests) == ['/200', '/201']
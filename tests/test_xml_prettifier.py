@@ -0,0 +1,37 @@
+import xml.dom.minidom
+
+import pytest
+
+from ..app.utils.procesor import prettify_output
+from ..app.utils.xml_prettifier import prettify_xml, prettify_xml_stream
+from .helpers import get_file_path
+
+
+# Helper that pretty prints the content the way it was done with minidom
+def _prettify_with_minidom(content):
+    prettified_xml = xml.dom.minidom.parseString(content).toprettyxml(indent="  ", newl="\n")
+    return "\n".join(line for line in prettified_xml.split("\n") if line.strip())
+
+
+# This test ensures that the output is the same as the one of minidom, also when the content is fed in small chunks
+@pytest.mark.parametrize('content', [
+    '<a/>',
+    '<?xml version="1.0" encoding="ISO-8859-2"?><a b="&quot;1&apos;">čaj &amp; "x" &lt;&gt; &#233;</a>',
+    '<!-- c --><?pi d?><a b="1" xmlns:x="u" xmlns="v"><x:b>t<![CDATA[<cd>]]>u</x:b>mixed<c/><!--c-->\n\n  text</a>',
+    '<!DOCTYPE a PUBLIC "-//X//DTD" "a.dtd"><a><b>1</b><b> </b><b/></a>',
+    '<!DOCTYPE a [<!ENTITY e "ent"><!-- sub -->]><a>&e;<![CDATA[x]]><![CDATA[y]]></a>',
+])
+def test_prettify_xml_matches_minidom(content):
+    expected_output = _prettify_with_minidom(content)
+    assert prettify_xml(content) == expected_output
+    assert ''.join(prettify_xml_stream(content[i:i + 3] for i in range(0, len(content), 3))) == expected_output
+
+
+# This test checks the output of the test template, and that not well-formed XML is reported
+def test_prettify_output():
+    with open(get_file_path('test_data/output.xml'), encoding='utf-8') as file:
+        output = file.read()
+    assert prettify_output(output, '.xml') == _prettify_with_minidom(output)
+    assert prettify_output('a;b\n', '.csv') == 'a;b\n'
+    with pytest.raises(ValueError, match='not well-formed XML.*mismatched tag: line 1'):
+        prettify_output('<a><b></a>', '.xml')
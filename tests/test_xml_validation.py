@@ -0,0 +1,95 @@
+from ..app.utils import schema_cache
+from ..app.utils.xml_validation import StreamingXmlValidator, validate_xml
+from .helpers import get_file_path
+
+# A schema of groups of items having integer values, the items are validated one by one while streaming
+ITEMS_SCHEMA = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="items"><xs:complexType><xs:sequence>
+    <xs:element ref="group" maxOccurs="unbounded"/>
+  </xs:sequence></xs:complexType></xs:element>
+  <xs:element name="group"><xs:complexType><xs:sequence>
+    <xs:element ref="item" maxOccurs="unbounded"/>
+  </xs:sequence></xs:complexType></xs:element>
+  <xs:element name="item" type="xs:int"/>
+</xs:schema>"""
+
+
+# Helper that yields the chunks of a document of item groups, counting the yielded chunks
+def _generate_items(values, produced):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<items>\n'
+    for value in values:
+        produced.append(value)
+        yield f'  <group><item>{value}</item></group>\n'
+    yield '</items>\n'
+
+
+# This test ensures that the streamed validation gives the same result as the validation of the whole document
+def test_streaming_validation_matches_validate_xml():
+    with open(get_file_path('test_data/output.xml'), encoding='utf-8') as file:
+        output = file.read()
+    schema_path = get_file_path('test_data/schema.xsd')
+    validator = StreamingXmlValidator(schema_path)
+    chunks = [output[i:i + 1000] for i in range(0, len(output), 1000)]
+    assert list(validator.validate(chunks)) == chunks
+    result, expected_result = validator.close(), validate_xml(output.encode(), schema_path)
+    assert (result.type, result.msg, str(result.log)) == (expected_result.type, expected_result.msg,
+                                                          str(expected_result.log))
+
+
+# This test checks that the validation stops the rendering after the given number of errors
+def test_streaming_validation_fails_fast(tmp_path):
+    (tmp_path / 'items.xsd').write_text(ITEMS_SCHEMA)
+    validator = StreamingXmlValidator(str(tmp_path / 'items.xsd'), max_errors=2)
+    produced = []
+    for _ in validator.validate(_generate_items(['1', 'x', '2', 'y'] + ['3'] * 10000, produced)):
+        pass
+    result = validator.close()
+    assert result.type == 'KO' and 'stopped after 2 errors' in result.log
+    assert validator.interrupted and len(produced) < 10000
+
+
+# This test checks that a valid document passes, and that syntax errors stop the validation
+def test_streaming_validation_results(tmp_path):
+    (tmp_path / 'items.xsd').write_text(ITEMS_SCHEMA)
+    validator = StreamingXmlValidator(str(tmp_path / 'items.xsd'), max_errors=2)
+    for chunk in _generate_items(['1', '2'], []):
+        validator.feed(chunk)
+    assert validator.close().type == 'OK' and not validator.failed
+
+    validator = StreamingXmlValidator(str(tmp_path / 'items.xsd'))
+    produced = []
+    chunks = (chunk.replace('</group>', '</grp>') if len(produced) == 5 else chunk
+              for chunk in _generate_items(['1'] * 10000, produced))
+    for _ in validator.validate(chunks):
+        pass
+    assert validator.close().msg == 'XMLSyntaxError' and len(produced) < 10000
+
+
+# This test ensures that with max_errors the validated elements are cleared and only the skeleton of the document is
+# validated at the end, every error being reported once
+def test_streaming_validation_validates_skeleton_once(tmp_path, mocker):
+    (tmp_path / 'items.xsd').write_text(ITEMS_SCHEMA)
+    validate = mocker.spy(schema_cache.CompiledSchema, 'validate')
+    validator = StreamingXmlValidator(str(tmp_path / 'items.xsd'), max_errors=10)
+    chunks = list(_generate_items(['1', 'x', '2', 'y'], []))
+    for chunk in chunks[:-1] + ['<other/>\n', chunks[-1]]:
+        validator.feed(chunk)
+    result = validator.close()
+    assert result.type == 'KO' and 'Displaying 3 out of 3 errors' in result.log
+    assert "'x' is not a valid value" in result.log and "'other': This element is not expected" in result.log
+    assert validate.call_count == 5  # The 4 groups, then the skeleton
+
+
+# This test checks that the elements are not cleared if the schema has identity constraints, which check the content of
+# the elements across the whole document
+def test_streaming_validation_keeps_constrained_elements(tmp_path):
+    (tmp_path / 'items.xsd').write_text(ITEMS_SCHEMA.replace(
+        '</xs:complexType></xs:element>',
+        '</xs:complexType><xs:unique name="u"><xs:selector xpath="group/item"/><xs:field xpath="."/></xs:unique>'
+        '</xs:element>', 1))
+    assert schema_cache.get_clearable_elements(str(tmp_path / 'items.xsd')) == frozenset()
+    validator = StreamingXmlValidator(str(tmp_path / 'items.xsd'), max_errors=10)
+    output = ''.join(_generate_items(['1', '2', '1'], []))
+    validator.feed(output)
+    result, expected_result = validator.close(), validate_xml(output.encode(), str(tmp_path / 'items.xsd'))
+    assert result.type == 'KO' and (result.msg, str(result.log)) == (expected_result.msg, str(expected_result.log))